@@ -0,0 +1,391 @@
+# benchmarks/fake_fleet.py
+
+import logging
+import os
+import random
+import secrets
+import selectors
+import shutil
+import socket
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import paramiko
+
+# Clients going away mid-session are expected here, not worth a traceback
+logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench"
+
+# `crontab -l` / `crontab -` against the calling host's own crontab file
+CRONTAB_SHIM = """#!/bin/sh
+f="$FAKE_HOST_ROOT/crontab"
+case "$1" in
+  -l) [ -f "$f" ] || { echo "no crontab for $USER" >&2; exit 1; }; exec cat "$f";;
+  -) exec cat >"$f";;
+  *) echo "crontab: unsupported arguments: $*" >&2; exit 1;;
+esac
+"""
+
+# sudo that prompts on stderr and checks the -S password like the real one, then runs the
+# command as is; with FAKE_SUDO_NOPASSWD set it behaves like a NOPASSWD rule and reads nothing
+SUDO_SHIM = """#!/bin/sh
+stdin=0 nonint=0 prompt="Password: "
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -S) stdin=1;;
+    -n) nonint=1;;
+    -p) prompt="$2"; shift;;
+    -u) shift;;
+    -v) ;;
+    *) break;;
+  esac
+  shift
+done
+if [ -z "$FAKE_SUDO_NOPASSWD" ]; then
+  if [ "$nonint" -eq 1 ] || [ "$stdin" -eq 0 ]; then echo "sudo: a password is required" >&2; exit 1; fi
+  printf '%%s' "$prompt" >&2
+  read -r pw
+  if [ "$pw" != "%s" ]; then echo "Sorry, try again." >&2; exit 1; fi
+fi
+[ $# -eq 0 ] && exit 0
+exec "$@"
+""" % BENCH_PASSWORD
+
+@dataclass
+class FleetOptions:
+    """
+    Behaviour of every simulated host.
+
+    `latency` (plus or minus up to `jitter`) is slept once when a connection
+    is accepted and once per remote command, standing in for network round
+    trips and remote process start-up. `failure_rate` is the probability that
+    a connection is dropped right after it is accepted, like an unreachable
+    or flaky host. `payload_size` is the size of the large /etc stand-in file.
+    `sudo_nopasswd` makes `sudo` act as under a NOPASSWD rule: it never
+    prompts and never reads the password.
+    """
+    latency: float = 0.02
+    jitter: float = 0.01
+    failure_rate: float = 0.0
+    payload_size: int = 16 * 1024
+    cron_lines: int = 20
+    sudo_nopasswd: bool = False
+    seed: int = 0
+
+@dataclass
+class ConnectionStats:
+    host_id: str
+    started: float
+    ended: float | None = None
+    bytes_in: int = 0
+    bytes_out: int = 0
+    failed: bool = False
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.monotonic()) - self.started
+
+class _CountingSocket:
+    """Server side socket wrapper recording bytes and the end of the connection."""
+
+    def __init__(self, sock, stats: ConnectionStats):
+        self.sock = sock
+        self.stats = stats
+
+    def send(self, data) -> int:
+        sent = self.sock.send(data)
+        self.stats.bytes_out += sent
+        return sent
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+        self.stats.bytes_out += len(data)
+
+    def recv(self, size: int) -> bytes:
+        data = self.sock.recv(size)
+        self.stats.bytes_in += len(data)
+        return data
+
+    def close(self):
+        if self.stats.ended is None:
+            self.stats.ended = time.monotonic()
+        self.sock.close()
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+class _HostServer(paramiko.ServerInterface):
+    def __init__(self, fleet: "FakeFleet", host_id: str):
+        self.fleet = fleet
+        self.host_id = host_id
+
+    def get_allowed_auths(self, username):
+        return "publickey"
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(
+            target=self.fleet.run_command, args=(self.host_id, channel, command.decode()), daemon=True
+        ).start()
+        return True
+
+class FakeFleet:
+    """
+    N simulated SSH hosts served from this process on loopback ports.
+
+    Every host is a paramiko server accepting any public key. Commands run
+    through `sh` with shims for `crontab` (one crontab file per host) and
+    `sudo` (checks the password, then runs the command unprivileged); `cat`,
+    `base64` and the rest of the shell tool box are the local ones. The /etc
+    stand-ins live under the sandbox directory, never under the real /etc,
+    so restores only ever overwrite sandbox files.
+
+    Use as a context manager; the sandbox is removed on exit.
+    """
+
+    def __init__(self, size: int, options: FleetOptions | None = None):
+        self.size = size
+        self.options = options or FleetOptions()
+        self.random = random.Random(self.options.seed)
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.sandbox = os.path.join(tempfile.gettempdir(), f"vwrconf-bench-{secrets.token_hex(4)}")
+        if "_" in self.sandbox:
+            # vwrconf encodes "/" as "_" in /etc backup names, so paths must not contain one
+            raise ValueError(f"Sandbox path '{self.sandbox}' contains '_'; set TMPDIR to a path without one")
+        self.ports: dict[str, int] = {}
+        self.connections: list[ConnectionStats] = []
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+
+    # --- Setup ---
+
+    def __enter__(self) -> "FakeFleet":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def host_ids(self) -> list[str]:
+        return list(self.ports)
+
+    @property
+    def etc_paths(self) -> list[str]:
+        return [os.path.join(self.sandbox, "etc", "hosts"), os.path.join(self.sandbox, "etc", "bench.conf")]
+
+    @property
+    def home(self) -> str:
+        return os.path.join(self.sandbox, "home")
+
+    @property
+    def key_path(self) -> str:
+        return os.path.join(self.sandbox, "client_key")
+
+    def start(self):
+        self._populate()
+        for i in range(self.size):
+            host_id = f"h{i}"
+            listener = socket.socket()
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(128)
+            listener.setblocking(False)
+            self.ports[host_id] = listener.getsockname()[1]
+            self.selector.register(listener, selectors.EVENT_READ, host_id)
+        self.running = True
+        threading.Thread(target=self._accept_loop, name="fake-fleet-accept", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()
+        shutil.rmtree(self.sandbox, ignore_errors=True)
+
+    def _populate(self):
+        bin_dir = os.path.join(self.sandbox, "bin")
+        os.makedirs(bin_dir)
+        os.makedirs(os.path.join(self.sandbox, "etc"))
+        os.makedirs(self.home)
+        for name, script in (("crontab", CRONTAB_SHIM), ("sudo", SUDO_SHIM)):
+            path = os.path.join(bin_dir, name)
+            with open(path, "w") as f:
+                f.write(script)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        hosts, payload = self.etc_paths
+        with open(hosts, "w") as f:
+            f.write("127.0.0.1\tlocalhost\n::1\tlocalhost ip6-localhost ip6-loopback\n")
+        with open(payload, "w") as f:
+            written, i = 0, 0
+            while written < self.options.payload_size:
+                line = f"option{i} = {secrets.token_hex(12)}\n"
+                f.write(line)
+                written += len(line)
+                i += 1
+
+        paramiko.RSAKey.generate(2048).write_private_key_file(self.key_path)
+
+        for i in range(self.size):
+            host_root = os.path.join(self.sandbox, "hosts", f"h{i}")
+            os.makedirs(host_root)
+            with open(os.path.join(host_root, "crontab"), "w") as f:
+                for j in range(self.options.cron_lines):
+                    f.write(f"{j % 60} {j % 24} * * * /usr/local/bin/job{j} --host h{i}\n")
+
+    def write_config(
+        self, path: str, sudo: bool = True, max_workers: int | None = None,
+        compression: str | None = None, packs: bool = False
+    ):
+        """Write a vwrconf config listing every host of the fleet."""
+        lines = ["defaults:", f"  ssh_user: {BENCH_USER if sudo else 'root'}", f"  key_path: {self.key_path}"]
+        if max_workers:
+            lines.append(f"  max_workers: {max_workers}")
+        if compression:
+            lines.append(f"  backup_compression: {compression}")
+        if packs:
+            lines.append("  backup_packs: true")
+        lines.append("clients:")
+        for host_id, port in self.ports.items():
+            lines += [f"  - id: {host_id}", "    host: 127.0.0.1", f"    label: {host_id}", f"    port: {port}"]
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    # --- Serving ---
+
+    def _delay(self):
+        jitter = self.options.jitter
+        time.sleep(max(0.0, self.options.latency + self.random.uniform(-jitter, jitter)))
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                events = self.selector.select(timeout=0.2)
+            except (OSError, ValueError):
+                return
+            for key, _ in events:
+                try:
+                    conn, _ = key.fileobj.accept()
+                except OSError:
+                    continue
+                threading.Thread(target=self._serve, args=(key.data, conn), daemon=True).start()
+
+    def _serve(self, host_id: str, conn: socket.socket):
+        stats = ConnectionStats(host_id, time.monotonic())
+        with self.lock:
+            self.connections.append(stats)
+            failed = self.random.random() < self.options.failure_rate
+
+        conn.setblocking(True)
+        if failed:
+            stats.failed = True
+            stats.ended = time.monotonic()
+            conn.close()
+            return
+
+        self._delay()
+        try:
+            transport = paramiko.Transport(_CountingSocket(conn, stats))
+            transport.add_server_key(self.host_key)
+            transport.start_server(server=_HostServer(self, host_id))
+        except Exception:
+            stats.ended = time.monotonic()
+            conn.close()
+
+    def run_command(self, host_id: str, channel: paramiko.Channel, command: str):
+        self._delay()
+        env = dict(
+            os.environ,
+            PATH=os.path.join(self.sandbox, "bin") + os.pathsep + os.environ.get("PATH", ""),
+            FAKE_HOST_ROOT=os.path.join(self.sandbox, "hosts", host_id),
+            USER=BENCH_USER,
+        )
+        if self.options.sudo_nopasswd:
+            env["FAKE_SUDO_NOPASSWD"] = "1"
+        try:
+            proc = subprocess.Popen(
+                ["sh", "-c", command], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                env=env, cwd=env["FAKE_HOST_ROOT"]
+            )
+        except OSError as e:
+            channel.sendall_stderr(str(e).encode())
+            channel.send_exit_status(127)
+            channel.close()
+            return
+
+        def feed():
+            try:
+                for chunk in iter(lambda: channel.recv(65536), b""):
+                    proc.stdin.write(chunk)
+                    proc.stdin.flush()
+            except (OSError, ValueError):
+                pass
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+
+        def drain_stderr():
+            try:
+                for chunk in iter(lambda: proc.stderr.read1(65536), b""):
+                    channel.sendall_stderr(chunk)
+            except (OSError, EOFError):
+                pass
+
+        threading.Thread(target=feed, daemon=True).start()
+        err_thread = threading.Thread(target=drain_stderr, daemon=True)
+        err_thread.start()
+        try:
+            for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+                channel.sendall(chunk)
+            err_thread.join()
+            channel.send_exit_status(proc.wait())
+            channel.shutdown_write()
+            channel.close()
+        except (OSError, EOFError):
+            # The client hung up (e.g. a fleet timeout); don't leave the command behind
+            proc.kill()
+            proc.wait()
+
+    # --- Accounting ---
+
+    def reset_stats(self):
+        with self.lock:
+            self.connections = []
+
+    def host_stats(self) -> dict[str, dict]:
+        """
+        Per-host totals since the last `reset_stats`.
+
+        Returns:
+            dict[str, dict]: host id -> {"connections", "failed", "seconds", "bytes_in", "bytes_out"}.
+        """
+        totals: dict[str, dict] = {}
+        with self.lock:
+            connections = list(self.connections)
+        for conn in connections:
+            entry = totals.setdefault(
+                conn.host_id, {"connections": 0, "failed": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0}
+            )
+            entry["connections"] += 1
+            entry["failed"] += conn.failed
+            entry["seconds"] += conn.duration
+            entry["bytes_in"] += conn.bytes_in
+            entry["bytes_out"] += conn.bytes_out
+        return totals
@@ -0,0 +1,190 @@
+# benchmarks/fleet_bench.py
+"""
+Measure how vwrconf CLI commands scale on a simulated fleet.
+
+For each fleet size, N fake SSH hosts are started in this process (see
+fake_fleet.py) and every selected CLI command is run against them in a
+fresh `python -m vwrconf` process, with backups going to a throw-away
+HOME. For each command the report gives the wall time, percentiles of the
+per-host time spent connected (summed over a host's connections), the
+number of connections and the bytes that crossed the wire.
+
+Usage (from the repository root):
+
+    python benchmarks/fleet_bench.py --hosts 10,100,1000
+    python benchmarks/fleet_bench.py --hosts 100 --commands "cron view,etc backup" --latency 0.05 --jitter 0.02
+    python benchmarks/fleet_bench.py --hosts 10 --failure-rate 0.1 --json bench_output.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_fleet import BENCH_PASSWORD, FakeFleet, FleetOptions  # noqa: E402
+from vwrconf.models.SSH_Transport import format_bytes  # noqa: E402
+
+# name -> (argv template, stdin). Placeholders: {h0}, {h1}, {paths}, {cron_first},
+# {cron_last}, {etc_first}, {etc_last}. Commands run in this order, so the
+# backup commands come before those reading backups.
+COMMANDS = {
+    "cron view": ("cron view", ""),
+    "cron backup": ("cron backup", ""),
+    "cron backup --incremental": ("cron backup --incremental", ""),
+    "cron list-hosts": ("cron list-hosts", ""),
+    "cron read-dates": ("cron read-dates {h0}", ""),
+    "cron read-file": ("cron read-file {h0} {cron_last}", ""),
+    "cron diff-live": ("cron diff-live {h0}", ""),
+    "cron diff-backups": ("cron diff-backups {h0} {cron_first} {cron_last}", ""),
+    "cron diff-hosts": ("cron diff-hosts {h0} {h1}", ""),
+    "cron restore": ("cron restore {h0} {cron_last}", "yes\n"),
+    "etc view": ("etc view {paths}", "{password}\n"),
+    "etc backup": ("etc backup {paths}", "{password}\n"),
+    "etc backup --incremental": ("etc backup --incremental {paths}", "{password}\n"),
+    "etc backup --delta": ("etc backup --delta {paths}", "{password}\n"),
+    "etc list-hosts": ("etc list-hosts", ""),
+    "etc read-dates": ("etc read-dates {h0}", ""),
+    "etc read-file": ("etc read-file {h0} -t {etc_last}", ""),
+    "etc diff-live": ("etc diff-live {h0}", "{password}\n"),
+    "etc diff-backups": ("etc diff-backups {h0} {etc_first} {etc_last}", ""),
+    "etc diff-hosts": ("etc diff-hosts {paths} {h0} {h1}", "{password}\n{password}\n"),
+    "etc restore": ("etc restore {h0} {etc_last} --force", "{password}\n"),
+}
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def backup_dates(home: str, kind: str, host_id: str) -> list[str]:
+    host_dir = os.path.join(home, ".vwrconf", "backups", kind, host_id)
+    if not os.path.isdir(host_dir):
+        return []
+    # Snapshot manifests and older per-file backups all start with the timestamp
+    return sorted({f.split("__")[0].split(".")[0] for f in os.listdir(host_dir) if not f.endswith(".part")})
+
+def run_command(fleet: FakeFleet, config_path: str, name: str, sudo: bool, timeout: float) -> dict:
+    template, stdin = COMMANDS[name]
+    hosts = fleet.host_ids
+    cron_dates = backup_dates(fleet.home, "cron", hosts[0]) or ["none"]
+    etc_dates = backup_dates(fleet.home, "etc", hosts[0]) or ["none"]
+    values = {
+        "h0": hosts[0], "h1": hosts[min(1, len(hosts) - 1)], "paths": " ".join(fleet.etc_paths),
+        "cron_first": cron_dates[0], "cron_last": cron_dates[-1],
+        "etc_first": etc_dates[0], "etc_last": etc_dates[-1],
+    }
+    argv = template.format(**values).split() + ["-c", config_path]
+    env = dict(os.environ, HOME=fleet.home, VWRCONF_NO_DAEMON="1")
+
+    fleet.reset_stats()
+    started = time.monotonic()
+    try:
+        # New session: no controlling terminal, so password prompts read stdin
+        proc = subprocess.run(
+            [sys.executable, "-m", "vwrconf", *argv],
+            input=stdin.format(password=BENCH_PASSWORD if sudo else ""), capture_output=True, text=True,
+            env=env, timeout=timeout, start_new_session=True
+        )
+        returncode, output = proc.returncode, proc.stdout + proc.stderr
+    except subprocess.TimeoutExpired as e:
+        stdout = e.stdout or ""
+        returncode, output = None, stdout.decode(errors="replace") if isinstance(stdout, bytes) else stdout
+    wall = time.monotonic() - started
+
+    # Let the servers notice the client went away before reading the per-host times
+    time.sleep(0.2)
+    per_host = fleet.host_stats()
+    seconds = [h["seconds"] for h in per_host.values()]
+    return {
+        "command": name,
+        "hosts": fleet.size,
+        "returncode": returncode,
+        "errors": sum(1 for line in output.splitlines() if "ERROR" in line),
+        "wall_seconds": wall,
+        "hosts_contacted": len(per_host),
+        "connections": sum(h["connections"] for h in per_host.values()),
+        "failed_connections": sum(h["failed"] for h in per_host.values()),
+        "host_p50": percentile(seconds, 50),
+        "host_p90": percentile(seconds, 90),
+        "host_p99": percentile(seconds, 99),
+        "host_max": max(seconds, default=0.0),
+        "host_mean": statistics.fmean(seconds) if seconds else 0.0,
+        "bytes_sent": sum(h["bytes_in"] for h in per_host.values()),
+        "bytes_received": sum(h["bytes_out"] for h in per_host.values()),
+        "output": output,
+    }
+
+def print_row(row: dict):
+    status = "ok" if row["returncode"] == 0 else f"rc={row['returncode']}"
+    print(
+        f"{row['hosts']:>5} {row['command']:<26} {row['wall_seconds']:>8.2f}s "
+        f"{row['host_p50']:>7.3f} {row['host_p90']:>7.3f} {row['host_p99']:>7.3f} {row['host_max']:>7.3f} "
+        f"{row['connections']:>6} {format_bytes(row['bytes_sent']):>10} {format_bytes(row['bytes_received']):>10} "
+        f"{row['errors']:>6}  {status}",
+        flush=True
+    )
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vwrconf CLI commands against simulated SSH fleets")
+    parser.add_argument("--hosts", default="10,100,1000", help="Comma separated fleet sizes (default: 10,100,1000)")
+    parser.add_argument("--commands", default=None, help=f"Comma separated commands (default: all of {', '.join(COMMANDS)})")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added per connection and per remote command")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Random +/- seconds added to each latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a connection is dropped on accept")
+    parser.add_argument("--payload-size", type=int, default=16 * 1024, help="Bytes of the large /etc stand-in file")
+    parser.add_argument("--cron-lines", type=int, default=20, help="Crontab lines per host")
+    parser.add_argument("--workers", type=int, default=None, help="max_workers written to the benchmark config")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None, help="backup_compression written to the benchmark config")
+    parser.add_argument("--packs", action="store_true", help="Write /etc snapshots as packs (backup_packs) in the benchmark config")
+    parser.add_argument("--no-sudo", action="store_true", help="Connect as root instead of a sudo user")
+    parser.add_argument("--sudo-nopasswd", action="store_true", help="Simulate a NOPASSWD sudo rule: sudo never reads the password")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds before a command is killed")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for jitter and failures")
+    parser.add_argument("--json", metavar="FILE", help="Also write all rows as JSON to FILE")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of commands that failed")
+    args = parser.parse_args(argv)
+
+    commands = [c.strip() for c in args.commands.split(",")] if args.commands else list(COMMANDS)
+    unknown = [c for c in commands if c not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown command(s): {', '.join(unknown)}")
+    commands = [c for c in COMMANDS if c in commands]
+
+    options = FleetOptions(
+        latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+        payload_size=args.payload_size, cron_lines=args.cron_lines,
+        sudo_nopasswd=args.sudo_nopasswd, seed=args.seed
+    )
+    sudo = not args.no_sudo
+    rows = []
+    print(
+        f"{'hosts':>5} {'command':<26} {'wall':>9} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7} "
+        f"{'conns':>6} {'sent':>10} {'received':>10} {'errors':>6}"
+    )
+    for size in (int(n) for n in args.hosts.split(",")):
+        with FakeFleet(size, options) as fleet:
+            config_path = os.path.join(fleet.sandbox, "config.yml")
+            fleet.write_config(config_path, sudo=sudo, max_workers=args.workers, compression=args.compression, packs=args.packs)
+            for name in commands:
+                row = run_command(fleet, config_path, name, sudo, args.timeout)
+                print_row(row)
+                output = row.pop("output")
+                if args.verbose and (row["returncode"] != 0 or row["errors"]):
+                    print(output)
+                rows.append(row)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": vars(args), "results": rows}, f, indent=2)
+        print(f"[OK] Results written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# tests/test_line_diff.py
+
+import random
+from vwrconf.core.line_diff import _myers_blocks, matching_blocks, unified_diff
+
+def changed_lines(diff: list[str]) -> list[str]:
+    return [line for line in diff[2:] if line[0] in "+-"]
+
+def test_repetitive_file_keeps_small_diff():
+    # Regression: regions made only of popular lines used to collapse into one huge replacement
+    old = ["\n" if i % 2 == 0 else "# comment\n" for i in range(100_000)]
+    new = list(old)
+    new[40_000] = "changed\n"
+    new.insert(60_000, "inserted\n")
+
+    diff = list(unified_diff(old, new, "old", "new"))
+
+    assert changed_lines(diff) == ["-\n", "+changed\n", "+inserted\n"]
+    assert sum(line.startswith("@@") for line in diff) == 2
+
+def test_myers_blocks_find_a_longest_common_subsequence():
+    rng = random.Random(0)
+    for _ in range(500):
+        a = [rng.randint(0, 2) for _ in range(rng.randint(0, 25))]
+        b = [rng.randint(0, 2) for _ in range(rng.randint(0, 25))]
+        blocks = _myers_blocks(a, b, len(a) + len(b))
+
+        # LCS length by dynamic programming
+        lcs = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i in range(len(a) - 1, -1, -1):
+            for j in range(len(b) - 1, -1, -1):
+                lcs[i][j] = lcs[i + 1][j + 1] + 1 if a[i] == b[j] else max(lcs[i + 1][j], lcs[i][j + 1])
+
+        assert sum(n for _, _, n in blocks) == lcs[0][0]
+        previous_i = previous_j = 0
+        for i, j, n in blocks:
+            assert i >= previous_i and j >= previous_j and a[i:i + n] == b[j:j + n]
+            previous_i, previous_j = i + n, j + n
+
+def test_myers_blocks_give_up_past_max_cost():
+    assert _myers_blocks([1, 2, 3], [4, 5, 6], 5) is None
+
+def test_very_different_repetitive_regions_still_match_in_order():
+    rng = random.Random(1)
+    old = [rng.choice(["\n", "# comment\n"]) for _ in range(20_000)]
+    new = [rng.choice(["\n", "# comment\n"]) for _ in range(20_000)]
+
+    blocks = matching_blocks(old, new)
+
+    previous_i = previous_j = 0
+    for i, j, n in blocks:
+        assert i >= previous_i and j >= previous_j and old[i:i + n] == new[j:j + n]
+        previous_i, previous_j = i + n, j + n
+    assert sum(block.size for block in blocks) > 10_000
+
+def test_doubled_lines_stay_close_to_linear():
+    # Regression: every rarest-line split peeled off two lines, so this took minutes
+    old = [f"line {i % 5000}\n" for i in range(50_000)]
+    new = [line for line in old for _ in range(2)]
+
+    diff = list(unified_diff(old, new, "old", "new"))
+
+    assert all(line.startswith("+") for line in changed_lines(diff))
+    assert len(changed_lines(diff)) < 60_000
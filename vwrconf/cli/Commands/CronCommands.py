@@ -2,9 +2,11 @@
 
 from vwrconf.cli.Commands.GlobalCommand import GlobalCommand
 
+import re
 import sys
 from vwrconf.core.view_crontab import fetch_all_crontabs
 from vwrconf.core.diff import diff_crontabs
+from vwrconf.core.drift import cluster_by_content, pick_baseline
 from vwrconf.models.Backup.cron import CronBackup
 from vwrconf.models.Crontab.crontab_entry import CrontabEntry
 from vwrconf.utils.entry_parser import normalize_line
@@ -32,11 +34,10 @@ class CronCommands(GlobalCommand):
     def cmd_backup_crontabs(cls, args):
         cls.verbose_log(args, "Loading config and starting backup of live crontabs...")
         config = cls.should_filter_host(args)
-        crontabs = fetch_all_crontabs(config)
         backup = CronBackup(config)
-        for host, lines in crontabs.items():
-            cls.verbose_log(args, f"Writing backup for host '{host}'...")
-            backup.write_backup(host, lines)
+        # One pass: each crontab streams from its host into the store, no separate fetch first
+        cls.verbose_log(args, f"Backing up {len(config.clients)} host(s)...")
+        backup.backup_hosts([c.id for c in config.clients], incremental=args.incremental)
         cls.verbose_log(args, "All backups completed.")
 
     @classmethod
@@ -108,6 +109,65 @@ class CronCommands(GlobalCommand):
         else:
             print("No hosts with backups found.")
 
+    @classmethod
+    def cmd_reindex_backups(cls, args):
+        cls.verbose_log(args, "Rebuilding the crontab backup catalog...")
+        config = cls.load_config(args.config)
+        backup = CronBackup(config)
+        count = backup.reindex()
+        print(f"[OK] Indexed {count} crontab backup(s) into {backup.catalog.db_path}")
+
+    @classmethod
+    def cmd_search_backups(cls, args):
+        cls.verbose_log(args, f"Searching every crontab backup for '{args.query}'...")
+        config = cls.load_config(args.config)
+        backup = CronBackup(config)
+        try:
+            results = backup.search_history(args.query, regex=args.regex, ignore_case=args.ignore_case, host_id=args.select_host)
+        except re.error as e:
+            print(f"[ERROR] Invalid regular expression '{args.query}': {e}")
+            sys.exit(1)
+        cls.print_search_results(results, args.query, "crontab")
+
+    @classmethod
+    def cmd_blame_backup(cls, args):
+        cls.verbose_log(args, f"Blaming crontab backup of host '{args.host}'...")
+        config = cls.load_config(args.config)
+        backup = CronBackup(config)
+        results = backup.blame(args.host, args.file)
+        if not results:
+            print(f"No backups found for '{args.host}'" + (f" up to '{args.file}'." if args.file else "."))
+            sys.exit(1)
+        cls.print_blame(args.host, results)
+
+    @classmethod
+    def cmd_prune_backups(cls, args):
+        cls.verbose_log(args, "Applying retention policies to crontab backups...")
+        config = cls.load_config(args.config)
+        backup = CronBackup(config)
+        hosts = [args.select_host] if args.select_host else None
+        removed = backup.prune(hosts, dry_run=args.dry_run)
+        cls.verbose_log(args, f"{removed} snapshot(s) {'would be ' if args.dry_run else ''}pruned.")
+
+
+    @staticmethod
+    def print_structured_changes(diff: dict):
+        """Print the changed, moved and duplicated jobs of a `diff_crontabs` result."""
+        YELLOW = "\033[93m"
+        RESET = "\033[0m"
+
+        if diff["changed"]:
+            print(f"  Changed ({len(diff['changed'])}):")
+            for change in diff["changed"]:
+                print(f"    {YELLOW}~ {change.old.line.strip()}  →  {change.new.line.strip()}  ({change.field}){RESET}")
+        if diff["moved"]:
+            print(f"  Moved ({len(diff['moved'])}):")
+            for move in diff["moved"]:
+                print(f"    ↕ {move.entry.line.strip()}  (entry {move.old_position} → {move.new_position})")
+        if diff["duplicated"]:
+            print(f"  Duplicated ({len(diff['duplicated'])}):")
+            for duplicate in diff["duplicated"]:
+                print(f"    × {duplicate.entry.line.strip()}  ({duplicate.old_count} → {duplicate.new_count} copies)")
 
     @classmethod
     def cmd_diff_live_backup(cls, args):
@@ -131,25 +191,26 @@ class CronCommands(GlobalCommand):
         live_lines = crontabs[host]
         backup_lines = backup.read_backup_stored(host, latest_backup)
 
-        live_entries = {
-            CrontabEntry(line, host=host, source="live")
+        # Lists in file order, so the diff sees moved and duplicated jobs
+        live_entries = [
+            CrontabEntry(line.rstrip("\n"), host=host, source="live")
             for line in live_lines
             if line.strip() and not line.strip().startswith("#")
-        }
-        backup_entries = {
-            CrontabEntry(line, host=host, source="backup")
+        ]
+        backup_entries = [
+            CrontabEntry(line.rstrip("\n"), host=host, source="backup")
             for line in backup_lines
             if line.strip() and not line.strip().startswith("#")
-        }
+        ]
 
         pattern = cls.compile_grep_pattern(args.grep, args.ignore_case)
         if pattern:
-            live_entries = {
+            live_entries = [
                 entry for entry in live_entries if cls.grep_lines(entry.line, pattern)
-            }
-            backup_entries = {
+            ]
+            backup_entries = [
                 entry for entry in backup_entries if cls.grep_lines(entry.line, pattern)
-            }
+            ]
 
         diff = diff_crontabs(live_entries, backup_entries)
 
@@ -167,7 +228,9 @@ class CronCommands(GlobalCommand):
         for e in diff["removed"]:
             print(f"    {RED}- {e.line}{RESET}")
 
-        if not diff["added"] and not diff["removed"]:
+        cls.print_structured_changes(diff)
+
+        if not any(diff[key] for key in ("added", "removed", "changed", "moved")):
             print("  No differences found.")
 
 
@@ -190,21 +253,21 @@ class CronCommands(GlobalCommand):
 
         cls.verbose_log(args, f"Comparing '{older_file}' → '{newer_file}'...")
 
-        older_entries = {
-            CrontabEntry(line, host=host, source="backup")
+        older_entries = [
+            CrontabEntry(line.rstrip("\n"), host=host, source="backup")
             for line in older_lines
             if line.strip() and not line.strip().startswith("#")
-        }
-        newer_entries = {
-            CrontabEntry(line, host=host, source="backup")
+        ]
+        newer_entries = [
+            CrontabEntry(line.rstrip("\n"), host=host, source="backup")
             for line in newer_lines
             if line.strip() and not line.strip().startswith("#")
-        }
+        ]
 
         pattern = cls.compile_grep_pattern(args.grep, args.ignore_case)
         if pattern:
-            older_entries = {e for e in older_entries if cls.grep_lines(e.line, pattern)}
-            newer_entries = {e for e in newer_entries if cls.grep_lines(e.line, pattern)}
+            older_entries = [e for e in older_entries if cls.grep_lines(e.line, pattern)]
+            newer_entries = [e for e in newer_entries if cls.grep_lines(e.line, pattern)]
 
         diff = diff_crontabs(newer_entries, older_entries)
 
@@ -222,7 +285,9 @@ class CronCommands(GlobalCommand):
         for e in diff["removed"]:
             print(f"    {RED}- {e.line}{RESET}")
 
-        if not diff["added"] and not diff["removed"]:
+        cls.print_structured_changes(diff)
+
+        if not any(diff[key] for key in ("added", "removed", "changed", "moved")):
             print("  No differences found.")
 
 
@@ -246,12 +311,12 @@ class CronCommands(GlobalCommand):
         cls.verbose_log(args, "Parsing and normalizing crontab lines for comparison...")
 
         def parse_lines(lines, host):
-            entries = set()
+            entries = []
             for line in lines:
                 if not line.strip() or line.strip().startswith("#"):
                     continue
                 line_str = normalize_line(line) if args.normalize else line
-                entries.add(CrontabEntry(line_str, host=host, source="live"))
+                entries.append(CrontabEntry(line_str, host=host, source="live"))
             return entries
 
         entries1 = parse_lines(crontabs[host1], host1)
@@ -259,8 +324,8 @@ class CronCommands(GlobalCommand):
 
         pattern = cls.compile_grep_pattern(args.grep, args.ignore_case)
         if pattern:
-            entries1 = {e for e in entries1 if cls.grep_lines(e.line, pattern)}
-            entries2 = {e for e in entries2 if cls.grep_lines(e.line, pattern)}
+            entries1 = [e for e in entries1 if cls.grep_lines(e.line, pattern)]
+            entries2 = [e for e in entries2 if cls.grep_lines(e.line, pattern)]
 
         diff = diff_crontabs(entries2, entries1)  # new, old
 
@@ -278,5 +343,60 @@ class CronCommands(GlobalCommand):
         for e in diff["removed"]:
             print(f"    {RED}- {e.line}{RESET}")
 
-        if not diff["added"] and not diff["removed"]:
+        cls.print_structured_changes(diff)
+
+        if not any(diff[key] for key in ("added", "removed", "changed", "moved")):
             print("  No differences found.")
+
+
+    @classmethod
+    def cmd_drift_crontabs(cls, args):
+        cls.verbose_log(args, "Loading config and live crontabs of every selected host...")
+        try:
+            config = cls.select_hosts(cls.should_filter_host(args), args.hosts)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        # One fetch per host; hosts are then compared through their content hash only
+        crontabs = fetch_all_crontabs(config)
+        if not crontabs:
+            print("[ERROR] No crontab could be fetched.")
+            sys.exit(1)
+
+        def job_lines(lines):
+            return [
+                normalize_line(line) if args.normalize else line.rstrip()
+                for line in lines
+                if line.strip() and not line.strip().startswith("#")
+            ]
+
+        jobs = {host: job_lines(lines) for host, lines in crontabs.items()}
+        classes = cluster_by_content({host: "\n".join(lines) for host, lines in jobs.items()})
+        try:
+            baseline = pick_baseline(classes, args.baseline)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+
+        RED = "\033[91m"
+        GREEN = "\033[92m"
+        RESET = "\033[0m"
+
+        print(f"\n🔸 Crontab drift across {len(crontabs)} host(s): {len(classes)} variant(s)")
+        baseline_entries = [CrontabEntry(line, host=baseline.hosts[0], source="live") for line in jobs[baseline.hosts[0]]]
+        for drift_class in classes:
+            cls.print_drift_class(drift_class, baseline, args.verbose)
+            if drift_class is baseline:
+                continue
+            entries = [CrontabEntry(line, host=drift_class.hosts[0], source="live") for line in jobs[drift_class.hosts[0]]]
+            diff = diff_crontabs(entries, baseline_entries)
+            for e in diff["added"]:
+                print(f"    {GREEN}+ {e.line}{RESET}")
+            for e in diff["removed"]:
+                print(f"    {RED}- {e.line}{RESET}")
+            cls.print_structured_changes(diff)
+
+        unreachable = [c.id for c in config.clients if c.id not in crontabs]
+        if unreachable:
+            print(f"\n  Not compared (crontab could not be read): {', '.join(unreachable)}")
+
@@ -0,0 +1,62 @@
+# vwrconf/cli/Commands/DaemonCommands.py
+
+import subprocess
+import sys
+import time
+from vwrconf.cli.Commands.GlobalCommand import GlobalCommand
+from vwrconf.models.SSH_Daemon import (
+    DAEMON_SOCKET_PATH,
+    SessionDaemon,
+    daemon_is_running,
+    daemon_request,
+)
+
+class DaemonCommands(GlobalCommand):
+    @classmethod
+    def cmd_daemon_start(cls, args):
+        if daemon_is_running():
+            print(f"Session daemon already running on {DAEMON_SOCKET_PATH}.")
+            return
+
+        if args.foreground:
+            cls.verbose_log(args, f"Serving SSH sessions on {DAEMON_SOCKET_PATH} (idle timeout {args.idle_timeout}s).")
+            SessionDaemon(idle_timeout=args.idle_timeout).serve_forever()
+            return
+
+        cmd = [sys.executable, "-m", "vwrconf", "daemon", "start", "--foreground", "--idle-timeout", str(args.idle_timeout)]
+        subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+        for _ in range(50):
+            if daemon_is_running():
+                print(f"[OK] Session daemon started on {DAEMON_SOCKET_PATH}.")
+                return
+            time.sleep(0.1)
+
+        print("[ERROR] Session daemon did not come up.")
+        sys.exit(1)
+
+    @classmethod
+    def cmd_daemon_stop(cls, args):
+        if not daemon_is_running():
+            print("Session daemon is not running.")
+            return
+        daemon_request({"op": "stop"})
+        print("[OK] Session daemon stopped.")
+
+    @classmethod
+    def cmd_daemon_status(cls, args):
+        if not daemon_is_running():
+            print("Session daemon is not running.")
+            return
+
+        sessions = daemon_request({"op": "status"}).get("sessions", [])
+        print(f"Session daemon running on {DAEMON_SOCKET_PATH} with {len(sessions)} session(s):")
+        for s in sessions:
+            state = "active" if s["active"] else "closed"
+            print(f"  - {s['user']}@{s['host']}:{s['port']} ({state}, idle {s['idle']}s)")
@@ -1,12 +1,15 @@
 # vwrconf/cli/Commands/EtcCommands.py
 
+import re
 import sys
-import os
 from vwrconf.cli.Commands.GlobalCommand import GlobalCommand
 from vwrconf.models.Backup.etc import EtcBackup
-from vwrconf.core.view_etc import fetch_all_etc
+from vwrconf.core.view_etc import fetch_all_etc, fetch_host_etc
+from vwrconf.models.SSH_Broker import SSH_Broker
 from vwrconf.models.Etc.etc_entry import EtcEntry
 from vwrconf.core.diff import diff_etc_files
+from vwrconf.core.drift import cluster_by_content, pick_baseline
+from vwrconf.core.line_diff import unified_diff
 import getpass
 
 class EtcCommands(GlobalCommand):
@@ -18,7 +21,7 @@ class EtcCommands(GlobalCommand):
         sudo_needed = any(c.ssh_user != "root" for c in config.clients)
         sudo_password = getpass.getpass("Enter sudo password for remote hosts: ") if sudo_needed else None
 
-        data = fetch_all_etc(config, args.paths, sudo_password=sudo_password)
+        data = fetch_all_etc(config, args.paths, sudo_password=sudo_password, batched=not args.per_file, delta=args.delta)
 
         for host, files in data.items():
             print(f"\n🔸 /etc files on {host}:")
@@ -27,15 +30,21 @@ class EtcCommands(GlobalCommand):
 
     @classmethod
     def cmd_backup_etc(cls, args):
-        config = cls.load_config(args.config)
+        config = cls.should_filter_host(args)
         backup = EtcBackup(config)
 
         sudo_needed = any(c.ssh_user != "root" and not c.readonly for c in config.clients)
         sudo_password = getpass.getpass("Enter sudo password for remote hosts: ") if sudo_needed else None
 
-        for client in config.clients:
-            cls.verbose_log(args, f"Starting backup for {len(config.clients)} client(s).")
-            backup.write_backup(client.id, args.paths, sudo_password=sudo_password)
+        cls.verbose_log(args, f"Starting backup for {len(config.clients)} client(s).")
+        backup.write_backups(
+            [c.id for c in config.clients],
+            args.paths,
+            sudo_password=sudo_password,
+            batched=not args.per_file,
+            incremental=args.incremental,
+            delta=args.delta
+        )
 
     @classmethod
     def cmd_restore_etc(cls, args):
@@ -85,7 +94,11 @@ class EtcCommands(GlobalCommand):
                 print(line)
             sys.exit(0)
 
-        success = backup.restore_backup(args.host, args.timestamp)
+        client = next(c for c in config.clients if c.id == args.host)
+        ssh_user = client.ssh_user or config.defaults.ssh_user or "root"
+        sudo_password = getpass.getpass(f"Enter sudo password for {args.host}: ") if ssh_user != "root" else None
+
+        success = backup.restore_backup(args.host, args.timestamp, sudo_password=sudo_password)
         if success:
             print(f"[OK] Backup from {args.timestamp} restored on host '{args.host}'.")
         else:
@@ -123,7 +136,7 @@ class EtcCommands(GlobalCommand):
     @classmethod
     def cmd_list_etc_hosts(cls, args):
         config = cls.load_config(args.config)
-        cls.verbose_log(args, f"Reading backup for host '{args.host}' at '{args.timestamp}'.")
+        cls.verbose_log(args, "Listing hosts with /etc backups.")
         backup = EtcBackup(config)
         hosts = backup.read_backup_known_hosts()
         if hosts:
@@ -133,6 +146,46 @@ class EtcCommands(GlobalCommand):
         else:
             print("No /etc backups found.")
 
+    @classmethod
+    def cmd_reindex_etc(cls, args):
+        config = cls.load_config(args.config)
+        cls.verbose_log(args, "Rebuilding the /etc backup catalog...")
+        backup = EtcBackup(config)
+        count = backup.reindex()
+        print(f"[OK] Indexed {count} /etc backup file(s) into {backup.catalog.db_path}")
+
+    @classmethod
+    def cmd_search_etc(cls, args):
+        config = cls.load_config(args.config)
+        cls.verbose_log(args, f"Searching every /etc backup for '{args.query}'...")
+        backup = EtcBackup(config)
+        try:
+            results = backup.search_history(args.query, regex=args.regex, ignore_case=args.ignore_case, host_id=args.select_host)
+        except re.error as e:
+            print(f"[ERROR] Invalid regular expression '{args.query}': {e}")
+            sys.exit(1)
+        cls.print_search_results(results, args.query, "/etc")
+
+    @classmethod
+    def cmd_blame_etc(cls, args):
+        config = cls.load_config(args.config)
+        cls.verbose_log(args, f"Blaming /etc backups of host '{args.host}'...")
+        backup = EtcBackup(config)
+        results = backup.blame(args.host, args.timestamp, args.paths or None)
+        if not results:
+            print(f"[ERROR] No /etc backups found for host '{args.host}'" + (f" up to '{args.timestamp}'." if args.timestamp else "."))
+            sys.exit(1)
+        cls.print_blame(args.host, results)
+
+    @classmethod
+    def cmd_prune_etc(cls, args):
+        config = cls.load_config(args.config)
+        cls.verbose_log(args, "Applying retention policies to /etc backups...")
+        backup = EtcBackup(config)
+        hosts = [args.select_host] if args.select_host else None
+        removed = backup.prune(hosts, dry_run=args.dry_run)
+        cls.verbose_log(args, f"{removed} snapshot(s) {'would be ' if args.dry_run else ''}pruned.")
+
     @classmethod
     def diff_line_level(cls, new_files, old_files, host):
         # Parse line entries from each set
@@ -148,28 +201,28 @@ class EtcCommands(GlobalCommand):
     def cmd_diff_live_backup_etc(cls, args):
         config = cls.should_filter_host(args, is_diff=True)
         etc_backup = EtcBackup(config)
-        live_etc_data = fetch_all_etc(config, args.paths)  # {host: {path: content}}
         host = args.host
-        cls.verbose_log(args, f"Loading live /etc files for host '{host}'.")
-
-        if host not in live_etc_data:
-            print(f"Host '{host}' not found in live /etc data.")
-            sys.exit(1)
 
         latest_backup = etc_backup.latest_backup_filename(host)
         if not latest_backup:
             print(f"No /etc backups found for host '{host}'.")
             sys.exit(1)
 
-        host_dir = etc_backup._get_host_backup_dir(host)
-        backup_files = {}
         cls.verbose_log(args, f"Loading latest backup '{latest_backup}' from host '{host}'.")
-        for f in os.listdir(host_dir):
-            if f.startswith(latest_backup) and f.endswith(".etc"):
-                path_part = f.split("__",1)[-1].replace(".etc", "").replace("_", "/")
-                full_path = os.path.join(host_dir, f)
-                with open(full_path, "r") as fp:
-                    backup_files[f"/{path_part}"] = fp.read()
+        backup_files = etc_backup.read_backup_files(host, latest_backup)
+
+        # Without explicit paths, compare the files the latest backup holds
+        paths = args.paths or list(backup_files)
+        host_config = config.copy_with_clients([c for c in config.clients if c.id == host])
+        sudo_needed = any((c.ssh_user or config.defaults.ssh_user) != "root" for c in host_config.clients)
+        sudo_password = getpass.getpass(f"Enter sudo password for {host}: ") if sudo_needed else None
+
+        cls.verbose_log(args, f"Loading live /etc files for host '{host}'.")
+        live_etc_data = fetch_all_etc(host_config, paths, sudo_password=sudo_password, delta=args.delta)  # {host: {path: content}}
+
+        if host not in live_etc_data:
+            print(f"Host '{host}' not found in live /etc data.")
+            sys.exit(1)
 
         live_files = live_etc_data[host]
 
@@ -210,14 +263,7 @@ class EtcCommands(GlobalCommand):
 
         def load_backup_files(timestamp):
             cls.verbose_log(args, f"Reading backup files for host '{host}' at timestamp '{timestamp}'.")
-            host_dir = etc_backup._get_host_backup_dir(host)
-            files = [f for f in os.listdir(host_dir) if f.startswith(timestamp) and f.endswith(".etc")]
-            files_content = {}
-            for f in files:
-                path_part = f.split("__", 1)[-1].replace(".etc", "").replace("_", "/")
-                with open(os.path.join(host_dir, f), "r") as fp:
-                    files_content[f"/{path_part}"] = fp.read()
-            return files_content
+            return etc_backup.read_backup_files(host, timestamp)
 
         older_files = load_backup_files(args.file1)
         newer_files = load_backup_files(args.file2)
@@ -266,28 +312,31 @@ class EtcCommands(GlobalCommand):
                 print(f"  ✘ Missing: {host2}")
             sys.exit(1)
 
-        clients = [clients_by_id[host1], clients_by_id[host2]]
-        live_etc = {}
-
+        clients = []
+        sudo_passwords = {}
 
-        for client in clients:
+        for client in [clients_by_id[host1], clients_by_id[host2]]:
             if client.readonly:
                 print(f"[SKIP] Host '{client.id}' is marked as readonly in the config.")
                 continue
 
             if client.ssh_user != "root":
-                sudo_password = getpass.getpass(f"Enter sudo password for {client.id}: ")
-            else:
-                sudo_password = None
+                sudo_passwords[client.id] = getpass.getpass(f"Enter sudo password for {client.id}: ")
+
+            clients.append(client)
 
-            single_host_config = config.copy_with_clients([client])
-            result = fetch_all_etc(single_host_config, args.paths, sudo_password=sudo_password)
+        def fetch_host(ssh, client):
+            ssh_user = client.ssh_user or config.defaults.ssh_user or "root"
+            return fetch_host_etc(ssh, client.id, ssh_user, args.paths, sudo_passwords.get(client.id))
 
-            if client.id not in result:
-                print(f"[ERROR] Could not fetch /etc files from {client.id}. Skipping.")
+        live_etc = {}
+        outcomes = SSH_Broker().fan_out(clients, config.defaults, fetch_host)
+        for host_id, outcome in outcomes.items():
+            if not outcome.ok or not outcome.value:
+                print(f"[ERROR] Could not fetch /etc files from {host_id}. Skipping.")
                 continue
 
-            live_etc[client.id] = result[client.id]
+            live_etc[host_id] = outcome.value
 
         # Check we got both hosts' data
         if host1 not in live_etc or host2 not in live_etc:
@@ -324,6 +373,56 @@ class EtcCommands(GlobalCommand):
         if not diff_result["added"] and not diff_result["removed"] and not diff_result["changed"]:
             print("  No differences found.")
 
+    @classmethod
+    def cmd_drift_etc(cls, args):
+        try:
+            config = cls.select_hosts(cls.should_filter_host(args), args.hosts)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        cls.verbose_log(args, f"Fetching {len(args.paths)} path(s) from {len(config.clients)} host(s) for the drift report.")
+
+        sudo_needed = any((c.ssh_user or config.defaults.ssh_user) != "root" and not c.readonly for c in config.clients)
+        sudo_password = getpass.getpass("Enter sudo password for remote hosts: ") if sudo_needed else None
+
+        # One fetch per host; hosts are then compared through their content hash only
+        live_etc = fetch_all_etc(config, args.paths, sudo_password=sudo_password)
+        if not live_etc:
+            print("[ERROR] No /etc files could be fetched.")
+            sys.exit(1)
+
+        RED = "\033[91m"
+        GREEN = "\033[92m"
+        RESET = "\033[0m"
+
+        for path in args.paths:
+            classes = cluster_by_content({host: files.get(path) for host, files in live_etc.items()})
+            try:
+                baseline = pick_baseline(classes, args.baseline)
+            except ValueError as e:
+                print(f"[ERROR] {e}")
+                sys.exit(1)
+
+            print(f"\n🔸 Drift of {path} across {len(live_etc)} host(s): {len(classes)} variant(s)")
+            baseline_lines = (baseline.content or "").splitlines(keepends=True)
+            for drift_class in classes:
+                cls.print_drift_class(drift_class, baseline, args.verbose)
+                if drift_class is baseline:
+                    continue
+                diff = unified_diff(
+                    baseline_lines,
+                    (drift_class.content or "").splitlines(keepends=True),
+                    fromfile=f"{path} ({baseline.hosts[0]})",
+                    tofile=f"{path} ({drift_class.hosts[0]})"
+                )
+                for line in diff:
+                    color = GREEN if line.startswith("+") else RED if line.startswith("-") else ""
+                    print(f"    {color}{line.rstrip()}{RESET if color else ''}")
+
+        not_compared = [c.id for c in config.clients if c.id not in live_etc]
+        if not_compared:
+            print(f"\n  Not compared (readonly or unreachable): {', '.join(not_compared)}")
+
     @classmethod
     def parse_etc_entries(cls, files_dict, host, source="live"):
         entries = set()
@@ -75,16 +75,59 @@ class GlobalCommand:
             return text.splitlines()
         return [line for line in text.splitlines() if pattern.search(line)]
 
+    @staticmethod
+    def print_search_results(results: dict, query: str, what: str):
+        """
+        Print the result of a history search, one block per matching line.
+
+        Args:
+            results (dict): {line: {(host, path): [LineRange, ...]}} as returned by `Backup.search_history`.
+            query (str): Query searched, for the header.
+            what (str): Kind of backups searched, e.g. "crontab".
+        """
+        if not results:
+            print(f"No {what} backup line matches '{query}'.")
+            return
+
+        print(f"Found {len(results)} line(s) matching '{query}' in {what} backups:")
+        for text, places in results.items():
+            print(f"\n  {text}")
+            for (host, path), ranges in places.items():
+                for r in ranges:
+                    span = r.first if r.first == r.last else f"{r.first} → {r.last}"
+                    state = ", still present" if r.current else ""
+                    print(f"    {host} {path}: {span} ({r.snapshots} snapshot(s){state})")
+
+    @staticmethod
+    def print_blame(host: str, results: dict):
+        """
+        Print blamed files: each line prefixed by the snapshot it first appeared in.
+
+        Lines that went missing for a while are followed by their gaps, as
+        "last snapshot holding it → snapshot it came back in".
+
+        Args:
+            host (str): Host blamed.
+            results (dict): {path: (timestamp, [BlameLine, ...])} as returned by `Backup.blame`.
+        """
+        for path, (timestamp, lines) in results.items():
+            print(f"\n🔸 Blame of {path} on {host} as of {timestamp}:")
+            for blamed in lines:
+                gaps = ", ".join(f"{before} → {after}" for before, after in blamed.gaps)
+                print(f"  {blamed.first_seen or '':<19}  {blamed.line}" + (f"   [gaps: {gaps}]" if gaps else ""))
+
     @classmethod
     def should_filter_host(cls, args, is_diff: bool = False) -> Config:
         """
         Return a filtered config with a specific host or the full config.
 
         If `select_host` is present in args and not a diff command, returns a config with just that host.
-        Otherwise, loads and returns the full config.
+        Otherwise, loads and returns the full config. `workers` and `timeout` arguments
+        override `defaults.max_workers` and `defaults.fleet_timeout` for fleet-wide commands,
+        and `stats` turns on `defaults.transfer_stats`.
 
         Args:
-            args: Parsed CLI arguments with optional `select_host` and `config`.
+            args: Parsed CLI arguments with optional `select_host`, `workers`, `timeout`, `stats` and `config`.
             is_diff (bool): If True, skips filtering.
 
         Returns:
@@ -93,15 +136,63 @@ class GlobalCommand:
         Raises:
             ValueError: If the specified host is not found in the config.
         """
+        config = cls.load_config(getattr(args, "config", None))
+        if getattr(args, "workers", None):
+            config.defaults.max_workers = args.workers
+        if getattr(args, "timeout", None):
+            config.defaults.fleet_timeout = args.timeout
+        if getattr(args, "stats", False):
+            config.defaults.transfer_stats = True
+
         if is_diff or not hasattr(args, "select_host") or not args.select_host:
-            return cls.load_config(getattr(args, "config", None))
+            return config
 
-        config = cls.load_config(getattr(args, "config", None))
         selected = next((c for c in config.clients if c.id == args.select_host), None)
         if not selected:
             raise ValueError(f"Host '{args.select_host}' not found in config.")
         return Config(defaults=config.defaults, clients=[selected])
 
+    @staticmethod
+    def select_hosts(config: Config, hosts: str | None) -> Config:
+        """
+        Restrict a config to a comma separated list of host ids, in config order.
+
+        Args:
+            config (Config): Loaded configuration.
+            hosts (str | None): e.g. "web1,web2"; every host if None.
+
+        Returns:
+            Config: Config holding only the selected clients.
+
+        Raises:
+            ValueError: If a host is not found in the config.
+        """
+        if not hosts:
+            return config
+        wanted = [h.strip() for h in hosts.split(",") if h.strip()]
+        known = {c.id for c in config.clients}
+        unknown = [h for h in wanted if h not in known]
+        if unknown:
+            raise ValueError(f"Host(s) not found in config: {', '.join(unknown)}")
+        return config.copy_with_clients([c for c in config.clients if c.id in wanted])
+
+    @staticmethod
+    def print_drift_class(drift_class, baseline, verbose: bool = False):
+        """
+        Print the header of one class of a drift report: its hash and hosts.
+
+        Args:
+            drift_class (DriftClass): Class to print.
+            baseline (DriftClass): Baseline class of the report.
+            verbose (bool): List every host instead of the first ten.
+        """
+        hosts = drift_class.hosts if verbose or len(drift_class.hosts) <= 10 else drift_class.hosts[:10]
+        more = len(drift_class.hosts) - len(hosts)
+        host_list = ", ".join(hosts) + (f" and {more} more" if more else "")
+        label = "Baseline" if drift_class is baseline else "Variant"
+        digest = drift_class.digest[:12] if drift_class.digest else "missing"
+        print(f"\n  {label} [{digest}] {len(drift_class.hosts)} host(s): {host_list}")
+
     @staticmethod
     def verbose_log(args, message: str):
         """
@@ -4,6 +4,7 @@ import argparse
 import sys
 from vwrconf.cli.Commands.CronCommands import CronCommands
 from vwrconf.cli.Commands.EtcCommands import EtcCommands
+from vwrconf.cli.Commands.DaemonCommands import DaemonCommands
 
 
 from vwrconf.utils.yaml_path import cmd_config
@@ -27,6 +28,10 @@ def build_parser():
     etc_parser = top_level.add_parser("etc", help="Manage remote /etc file backups")
     etc_subparsers = etc_parser.add_subparsers(dest="command", required=True)
 
+    # 1.3. Subparser for "daemon" commands
+    daemon_parser = top_level.add_parser("daemon", help="Manage the local SSH session daemon")
+    daemon_subparsers = daemon_parser.add_subparsers(dest="command", required=True)
+
     # 2. Global config command
     config = top_level.add_parser("config", help="Manage vwrconf config path")
     config.add_argument("-s", "--set", metavar="PATH", help="Set default config YAML file path")
@@ -57,6 +62,23 @@ def build_parser():
             metavar="HOST",
             help="Only show output for this host"
         )
+        subparser.add_argument(
+            "-w", "--workers",
+            type=int,
+            metavar="N",
+            help="Max number of hosts contacted in parallel"
+        )
+        subparser.add_argument(
+            "--timeout",
+            type=float,
+            metavar="SECONDS",
+            help="Wall-clock budget for the whole run; unfinished hosts are reported as timed out"
+        )
+        subparser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print per-host transfer metrics (bytes on the wire, timings, transport profile)"
+        )
 
     # --- Cron subcommands ---
     # Subcommand: cron_view
@@ -69,6 +91,7 @@ def build_parser():
     # Subcommand: cron_backup
     cron_backup = cron_subparsers.add_parser("backup", help="Backup remote crontabs to local files")
     cron_backup.add_argument("-c", "--config", default=None)
+    cron_backup.add_argument("--incremental", action="store_true", help="Only transfer crontabs that changed since the latest backup")
     add_common_global_arg(cron_backup)
     cron_backup.set_defaults(func=CronCommands.cmd_backup_crontabs)
 
@@ -103,6 +126,36 @@ def build_parser():
     add_common_global_arg(cron_list_hosts)
     cron_list_hosts.set_defaults(func=CronCommands.cmd_list_backup_hosts)
 
+    # Subcommand: cron_reindex
+    cron_reindex = cron_subparsers.add_parser("reindex", help="Rebuild the backup catalog from the backup directory")
+    cron_reindex.add_argument("-c", "--config", default=None)
+    add_common_global_arg(cron_reindex)
+    cron_reindex.set_defaults(func=CronCommands.cmd_reindex_backups)
+
+    # Subcommand: cron_search
+    cron_search = cron_subparsers.add_parser("search", help="Search every crontab backup of every host for a line")
+    cron_search.add_argument("query", help="Text to look for, or a regex with --regex")
+    cron_search.add_argument("-c", "--config", default=None)
+    cron_search.add_argument("-E", "--regex", action="store_true", help="Treat the query as a regular expression")
+    cron_search.add_argument("-i", "--ignore-case", action="store_true", help="Perform case-insensitive matching")
+    add_common_global_arg(cron_search)
+    cron_search.set_defaults(func=CronCommands.cmd_search_backups)
+
+    # Subcommand: cron_blame
+    cron_blame = cron_subparsers.add_parser("blame", help="Show when each line of a crontab backup first appeared")
+    cron_blame.add_argument("host")
+    cron_blame.add_argument("file", nargs="?", default=None, help="Backup timestamp (default: latest)")
+    cron_blame.add_argument("-c", "--config", default=None)
+    add_common_global_arg(cron_blame)
+    cron_blame.set_defaults(func=CronCommands.cmd_blame_backup)
+
+    # Subcommand: cron_prune
+    cron_prune = cron_subparsers.add_parser("prune", help="Remove crontab backups outside the retention policy")
+    cron_prune.add_argument("-c", "--config", default=None)
+    cron_prune.add_argument("--dry-run", action="store_true", help="Only show what would be removed")
+    add_common_global_arg(cron_prune)
+    cron_prune.set_defaults(func=CronCommands.cmd_prune_backups)
+
     # Subcommand: cron_diff_live
     cron_diff_live = cron_subparsers.add_parser("diff-live", help="Diff between live crontab and latest backup")
     cron_diff_live.add_argument("host")
@@ -131,12 +184,22 @@ def build_parser():
     add_common_global_arg(cron_diff_hosts)
     cron_diff_hosts.set_defaults(func=CronCommands.cmd_diff_hosts)
 
+    # Subcommand: cron_drift
+    cron_drift = cron_subparsers.add_parser("drift", help="Group hosts by crontab content and diff each variant against a baseline")
+    cron_drift.add_argument("-c", "--config", default=None)
+    cron_drift.add_argument("--hosts", metavar="HOST,...", help="Comma separated hosts to compare (default: all)")
+    cron_drift.add_argument("--baseline", metavar="HOST", help="Compare against this host's crontab (default: the majority variant)")
+    cron_drift.add_argument("-n", "--normalize", action="store_true")
+    add_common_global_arg(cron_drift)
+    cron_drift.set_defaults(func=CronCommands.cmd_drift_crontabs)
 
     # --- EtcCommands ---    
     # Subcommand: view /etc files
     etc_view = etc_subparsers.add_parser("view", help="View live /etc files from hosts")
     etc_view.add_argument("paths", nargs="+", help="Paths to /etc files to fetch (e.g., /etc/hostname)")
     etc_view.add_argument("-c", "--config", default=None)
+    etc_view.add_argument("--per-file", action="store_true", help="Read each path with its own remote command instead of one batched read")
+    etc_view.add_argument("--delta", action="store_true", help="Transfer only changed blocks of large files, rebuilt from their latest backup")
     add_common_grep_arg(etc_view)
     add_common_global_arg(etc_view)
     etc_view.set_defaults(func=EtcCommands.cmd_view_etc)
@@ -145,6 +208,9 @@ def build_parser():
     etc_backup = etc_subparsers.add_parser("backup", help="Backup /etc files from all hosts")
     etc_backup.add_argument("paths", nargs="+", help="Paths to /etc files to fetch and store")
     etc_backup.add_argument("-c", "--config", default=None)
+    etc_backup.add_argument("--per-file", action="store_true", help="Read each path with its own remote command instead of one batched read")
+    etc_backup.add_argument("--incremental", action="store_true", help="Only transfer files that changed since their latest backup")
+    etc_backup.add_argument("--delta", action="store_true", help="Transfer only changed blocks of large files, rebuilt from their latest backup")
     add_common_global_arg(etc_backup)
     etc_backup.set_defaults(func=EtcCommands.cmd_backup_etc)
 
@@ -153,6 +219,8 @@ def build_parser():
     etc_restore.add_argument("host", help="Host ID")
     etc_restore.add_argument("timestamp", help="Backup timestamp to restore")
     etc_restore.add_argument("-c", "--config", default=None)
+    etc_restore.add_argument("--dry-run", action="store_true", help="Print files that would be restored")
+    etc_restore.add_argument("--force", action="store_true", help="Skip confirmation prompts")
     add_common_global_arg(etc_restore)
     etc_restore.set_defaults(func=EtcCommands.cmd_restore_etc)
 
@@ -180,10 +248,43 @@ def build_parser():
     add_common_global_arg(etc_hosts)
     etc_hosts.set_defaults(func=EtcCommands.cmd_list_etc_hosts)
 
+    # Subcommand: rebuild the backup catalog
+    etc_reindex = etc_subparsers.add_parser("reindex", help="Rebuild the /etc backup catalog from the backup directory")
+    etc_reindex.add_argument("-c", "--config", default=None)
+    add_common_global_arg(etc_reindex)
+    etc_reindex.set_defaults(func=EtcCommands.cmd_reindex_etc)
+
+    # Subcommand: search the backup history
+    etc_search = etc_subparsers.add_parser("search", help="Search every /etc backup of every host for a line")
+    etc_search.add_argument("query", help="Text to look for, or a regex with --regex")
+    etc_search.add_argument("-c", "--config", default=None)
+    etc_search.add_argument("-E", "--regex", action="store_true", help="Treat the query as a regular expression")
+    etc_search.add_argument("-i", "--ignore-case", action="store_true", help="Perform case-insensitive matching")
+    add_common_global_arg(etc_search)
+    etc_search.set_defaults(func=EtcCommands.cmd_search_etc)
+
+    # Subcommand: blame backed up files
+    etc_blame = etc_subparsers.add_parser("blame", help="Show when each line of backed up /etc files first appeared")
+    etc_blame.add_argument("host", help="Host ID")
+    etc_blame.add_argument("paths", nargs="*", help="Paths to blame (default: every backed up path)")
+    etc_blame.add_argument("-c", "--config", default=None)
+    etc_blame.add_argument("-t", "--timestamp", default=None, help="Blame the files as of this backup (default: latest)")
+    add_common_global_arg(etc_blame)
+    etc_blame.set_defaults(func=EtcCommands.cmd_blame_etc)
+
+    # Subcommand: apply retention policies
+    etc_prune = etc_subparsers.add_parser("prune", help="Remove /etc backups outside the retention policy")
+    etc_prune.add_argument("-c", "--config", default=None)
+    etc_prune.add_argument("--dry-run", action="store_true", help="Only show what would be removed")
+    add_common_global_arg(etc_prune)
+    etc_prune.set_defaults(func=EtcCommands.cmd_prune_etc)
+
     # Subcommand: diff live host
     etc_diff_live = etc_subparsers.add_parser("diff-live", help="Diff between live /etc and latest backup")
     etc_diff_live.add_argument("host")
+    etc_diff_live.add_argument("paths", nargs="*", help="Paths to compare (default: the files of the latest backup)")
     etc_diff_live.add_argument("-c", "--config", default=None)
+    etc_diff_live.add_argument("--delta", action="store_true", help="Transfer only changed blocks of large files, rebuilt from their latest backup")
     add_common_grep_arg(etc_diff_live)
     add_common_global_arg(etc_diff_live)
     etc_diff_live.set_defaults(func=EtcCommands.cmd_diff_live_backup_etc)
@@ -208,6 +309,31 @@ def build_parser():
     add_common_grep_arg(etc_diff_hosts)
     etc_diff_hosts.set_defaults(func=EtcCommands.cmd_diff_hosts_etc)
 
+    # Subcommand: drift report across hosts
+    etc_drift = etc_subparsers.add_parser("drift", help="Group hosts by /etc file content and diff each variant against a baseline")
+    etc_drift.add_argument("paths", nargs="+", help="Paths to /etc files to compare (e.g., /etc/hosts)")
+    etc_drift.add_argument("-c", "--config", default=None)
+    etc_drift.add_argument("--hosts", metavar="HOST,...", help="Comma separated hosts to compare (default: all)")
+    etc_drift.add_argument("--baseline", metavar="HOST", help="Compare against this host's files (default: the majority variant)")
+    add_common_global_arg(etc_drift)
+    etc_drift.set_defaults(func=EtcCommands.cmd_drift_etc)
+
+    # --- DaemonCommands ---
+    # Subcommand: start the session daemon
+    daemon_start = daemon_subparsers.add_parser("start", help="Start the SSH session daemon")
+    daemon_start.add_argument("--idle-timeout", type=int, default=600, help="Close sessions idle for this many seconds")
+    daemon_start.add_argument("--foreground", action="store_true", help="Run in the foreground instead of detaching")
+    daemon_start.add_argument("--verbose", action="store_true", help="Enable verbose output for debugging")
+    daemon_start.set_defaults(func=DaemonCommands.cmd_daemon_start)
+
+    # Subcommand: stop the session daemon
+    daemon_stop = daemon_subparsers.add_parser("stop", help="Stop the SSH session daemon")
+    daemon_stop.set_defaults(func=DaemonCommands.cmd_daemon_stop)
+
+    # Subcommand: show warm sessions
+    daemon_status = daemon_subparsers.add_parser("status", help="Show sessions held by the daemon")
+    daemon_status.set_defaults(func=DaemonCommands.cmd_daemon_status)
+
     return parser
 
 def run_cli():
@@ -0,0 +1,194 @@
+# vwrconf/core/batch_read.py
+
+import io
+import shlex
+from typing import IO, Callable
+from vwrconf.models.SSH_Stream import copy_exact
+
+# Reads every path given as a positional argument and emits one frame per path,
+# in argument order:
+#   "OK <size>\n" followed by <size> bytes of file content, or
+#   "ERR <size>\n" followed by <size> bytes of the error message.
+# Each file is copied to a temp file first so the announced size always
+# matches the bytes that follow, even if the file changes meanwhile.
+BATCH_READ_SCRIPT = r'''
+t=$(mktemp) || exit 1
+for p in "$@"; do
+  if cat -- "$p" >"$t" 2>"$t.err"; then
+    printf 'OK %d\n' "$(($(wc -c <"$t")))"; cat "$t"
+  else
+    printf 'ERR %d\n' "$(($(wc -c <"$t.err")))"; cat "$t.err"
+  fi
+done
+rm -f "$t" "$t.err"
+'''
+
+# Incremental variant: arguments come in (path, expected sha256) pairs. When a
+# file still hashes to the expected value only "SAME 0\n" is sent back instead
+# of its content. An empty expected hash, or a host without sha256sum, always
+# gets the full "OK" frame.
+INCREMENTAL_READ_SCRIPT = r'''
+t=$(mktemp) || exit 1
+command -v sha256sum >/dev/null 2>&1 && hashing=1 || hashing=0
+while [ $# -ge 2 ]; do
+  p=$1; want=$2; shift 2
+  if cat -- "$p" >"$t" 2>"$t.err"; then
+    h=
+    [ "$hashing" -eq 1 ] && [ -n "$want" ] && h=$(sha256sum <"$t" | cut -d' ' -f1)
+    if [ -n "$h" ] && [ "$h" = "$want" ]; then
+      printf 'SAME 0\n'
+    else
+      printf 'OK %d\n' "$(($(wc -c <"$t")))"; cat "$t"
+    fi
+  else
+    printf 'ERR %d\n' "$(($(wc -c <"$t.err")))"; cat "$t.err"
+  fi
+done
+rm -f "$t" "$t.err"
+'''
+
+def build_batch_read_command(paths: list[str]) -> str:
+    """Build a single remote command that reads all `paths` in one invocation."""
+    args = " ".join(shlex.quote(p) for p in paths)
+    return f"sh -c {shlex.quote(BATCH_READ_SCRIPT)} vwrconf {args}"
+
+def build_incremental_read_command(paths: list[str], known_hashes: dict[str, str]) -> str:
+    """Like `build_batch_read_command`, but skips content whose sha256 matches `known_hashes`."""
+    args = " ".join(f"{shlex.quote(p)} {shlex.quote(known_hashes.get(p, ''))}" for p in paths)
+    return f"sh -c {shlex.quote(INCREMENTAL_READ_SCRIPT)} vwrconf {args}"
+
+def split_batch_stream(
+    stream: IO[bytes],
+    paths: list[str],
+    open_sink: Callable[[str], IO[bytes]],
+    unchanged: list[str] | None = None
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Split the framed output of BATCH_READ_SCRIPT into per-file sinks.
+
+    Frames are matched to `paths` by position, so the remote side never has
+    to echo path names back. File contents are copied in bounded chunks into
+    `open_sink(path)`; the caller owns and closes the returned files.
+    "SAME" frames from INCREMENTAL_READ_SCRIPT are appended to `unchanged`.
+
+    Returns:
+        tuple: (paths fully written, {path: error message}). A truncated
+        stream keeps every complete frame and reports the cut one as an error.
+    """
+    written: list[str] = []
+    errors: dict[str, str] = {}
+
+    for path in paths:
+        header = stream.readline()
+        if not header.endswith(b"\n"):
+            break
+        status, _, size_str = header[:-1].decode(errors="replace").partition(" ")
+        if status == "SAME" and unchanged is not None:
+            unchanged.append(path)
+            continue
+        if status not in ("OK", "ERR") or not size_str.isdigit():
+            break
+
+        size = int(size_str)
+        if status == "OK":
+            copied = copy_exact(stream, open_sink(path), size)
+        else:
+            message = stream.read(size)
+            copied = len(message)
+        if copied < size:
+            errors[path] = "Truncated output from remote host"
+            break
+
+        if status == "OK":
+            written.append(path)
+        else:
+            errors[path] = message.decode(errors="replace").strip()
+
+    return written, errors
+
+def parse_batch_stream(data: bytes, paths: list[str]) -> tuple[dict[str, bytes], dict[str, str]]:
+    """
+    In-memory variant of `split_batch_stream`.
+
+    Returns:
+        tuple: ({path: content}, {path: error message}).
+    """
+    buffers: dict[str, io.BytesIO] = {}
+    written, errors = split_batch_stream(io.BytesIO(data), paths, lambda p: buffers.setdefault(p, io.BytesIO()))
+    return {p: buffers[p].getvalue() for p in written}, errors
+
+def read_files_batched(runner, paths: list[str]) -> tuple[dict[str, bytes], dict[str, str]]:
+    """
+    Read several remote files over a single channel round trip.
+
+    Args:
+        runner: Connected handler, or the root session returned by its
+            `elevated()`; anything exposing `run_raw`.
+        paths (list[str]): Absolute remote paths to read.
+
+    Returns:
+        tuple: ({path: content}, {path: error message}). Every requested path
+        appears in exactly one of the two dicts.
+    """
+    stdout, stderr = runner.run_raw(build_batch_read_command(paths))
+
+    files, errors = parse_batch_stream(stdout, paths)
+    stderr_text = stderr.decode(errors="replace").strip()
+    for path in paths:
+        if path not in files and path not in errors:
+            errors[path] = stderr_text or "No data received from remote host"
+    return files, errors
+
+def read_files_batched_to(runner, paths: list[str], open_sink: Callable[[str], IO[bytes]]) -> tuple[list[str], dict[str, str]]:
+    """
+    Like `read_files_batched`, but streams each file into `open_sink(path)`.
+
+    The remote output is spooled and then split frame by frame, so large
+    files go to their sink without being held in memory.
+
+    Returns:
+        tuple: (paths fully written, {path: error message}).
+    """
+    with runner.run_stream(build_batch_read_command(paths)) as result:
+        written, errors = split_batch_stream(result.stdout, paths, open_sink)
+        stderr_text = result.stderr_text().strip()
+
+    for path in paths:
+        if path not in written and path not in errors:
+            errors[path] = stderr_text or "No data received from remote host"
+    return written, errors
+
+def read_changed_files_to(
+    runner,
+    paths: list[str],
+    known_hashes: dict[str, str],
+    open_sink: Callable[[str], IO[bytes]]
+) -> tuple[list[str], list[str], dict[str, str]]:
+    """
+    Incremental `read_files_batched_to`: only files whose remote sha256 differs
+    from `known_hashes[path]` are transferred, in a single round trip.
+
+    Returns:
+        tuple: (paths written to their sink, paths unchanged, {path: error message}).
+    """
+    unchanged: list[str] = []
+    with runner.run_stream(build_incremental_read_command(paths, known_hashes)) as result:
+        written, errors = split_batch_stream(result.stdout, paths, open_sink, unchanged)
+        stderr_text = result.stderr_text().strip()
+
+    for path in paths:
+        if path not in written and path not in unchanged and path not in errors:
+            errors[path] = stderr_text or "No data received from remote host"
+    return written, unchanged, errors
+
+def read_files_per_path(runner, paths: list[str]) -> tuple[dict[str, bytes], dict[str, str]]:
+    """Same result as `read_files_batched`, with one remote `cat` per path."""
+    files: dict[str, bytes] = {}
+    errors: dict[str, str] = {}
+    for path in paths:
+        out, err = runner.run_raw(f"cat -- {shlex.quote(path)}")
+        if err.strip():
+            errors[path] = err.decode(errors="replace").strip()
+        else:
+            files[path] = out
+    return files, errors
@@ -0,0 +1,126 @@
+# vwrconf/core/batch_restore.py
+
+import io
+import shlex
+import tarfile
+from vwrconf.models.Backup.object_store import open_stored, stored_size
+
+MANIFEST_NAME = ".vwrconf-manifest"
+
+# Unpacks a tar stream from stdin into a private staging dir, then installs it
+# in two phases: every file is first copied next to its target (keeping the
+# owner and mode of the file it replaces), and only if all of them staged
+# cleanly is each one renamed over its target. Renames within a directory are
+# atomic, so readers never see a half-written file. Prints one line per target:
+#   "OK<TAB><target>" or "ERR<TAB><target><TAB><message>".
+RESTORE_SCRIPT = r'''
+stage=$(mktemp -d "${TMPDIR:-/tmp}/vwrconf-restore.XXXXXX") || exit 1
+trap 'rm -rf "$stage"' EXIT
+if ! tar -x -f - -C "$stage" 2>"$stage/.err"; then
+  printf 'ERR\t-\tcould not unpack restore stream: %s\n' "$(tr '\n' ' ' <"$stage/.err")"
+  exit 1
+fi
+failed=0
+: >"$stage/.staged"
+while IFS= read -r name && IFS= read -r target; do
+  tmp="$(dirname -- "$target")/.vwrconf-restore.$$.$(basename -- "$target")"
+  if { { [ ! -e "$target" ] || cp -p -- "$target" "$tmp"; } &&
+       cat -- "$stage/$name" >"$tmp"; } 2>"$stage/.err"; then
+    printf '%s\n%s\n' "$tmp" "$target" >>"$stage/.staged"
+  else
+    printf 'ERR\t%s\t%s\n' "$target" "$(tr '\n' ' ' <"$stage/.err")"
+    rm -f -- "$tmp"
+    failed=1
+  fi
+done <"$stage/.vwrconf-manifest"
+if [ "$failed" -ne 0 ]; then
+  while IFS= read -r tmp && IFS= read -r target; do
+    rm -f -- "$tmp"
+    printf 'ERR\t%s\tnot installed, another file failed to stage\n' "$target"
+  done <"$stage/.staged"
+  exit 1
+fi
+while IFS= read -r tmp && IFS= read -r target; do
+  if mv -f -- "$tmp" "$target" 2>"$stage/.err"; then
+    printf 'OK\t%s\n' "$target"
+  else
+    printf 'ERR\t%s\t%s\n' "$target" "$(tr '\n' ' ' <"$stage/.err")"
+    rm -f -- "$tmp"
+  fi
+done <"$stage/.staged"
+'''
+
+def build_restore_command() -> str:
+    return f"sh -c {shlex.quote(RESTORE_SCRIPT)}"
+
+def write_restore_stream(stream, files: dict[str, str]):
+    """
+    Write a tar stream of `files`, their manifest first.
+
+    Args:
+        stream: Writable binary file, e.g. the stdin of a remote channel.
+        files (dict[str, str]): Remote target path -> local file to install there.
+    """
+    manifest = "".join(f"f{i}\n{target}\n" for i, target in enumerate(files)).encode()
+
+    with tarfile.open(fileobj=stream, mode="w|") as tar:
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(manifest)
+        tar.addfile(info, io.BytesIO(manifest))
+
+        for i, local_path in enumerate(files.values()):
+            info = tarfile.TarInfo(f"f{i}")
+            info.size = stored_size(local_path)
+            info.mode = 0o600
+            with open_stored(local_path) as fp:
+                tar.addfile(info, fp)
+
+def parse_restore_output(output: bytes, targets: list[str], fallback_error: str = "") -> tuple[list[str], dict[str, str]]:
+    restored: list[str] = []
+    errors: dict[str, str] = {}
+
+    for line in output.decode(errors="replace").splitlines():
+        status, _, rest = line.partition("\t")
+        if status == "OK":
+            restored.append(rest)
+        elif status == "ERR":
+            target, _, message = rest.partition("\t")
+            errors[target] = message.strip() or "unknown error"
+
+    stream_error = errors.pop("-", None)
+    for target in targets:
+        if target not in restored and target not in errors:
+            errors[target] = stream_error or fallback_error or "No result reported by remote host"
+    return restored, errors
+
+def restore_files_streamed(
+    ssh,
+    files: dict[str, str],
+    use_sudo: bool = False,
+    sudo_password: str | None = None
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Install several local files on a remote host over a single channel.
+
+    The files are streamed as tar through stdin, so their size is bounded
+    neither by ARG_MAX nor by local memory, then staged and renamed into
+    place by RESTORE_SCRIPT.
+
+    Args:
+        ssh: Connected handler exposing `run_piped`.
+        files (dict[str, str]): Remote target path -> local file to install there.
+        use_sudo (bool): Run the install under sudo. The password is only sent
+            if sudo prompts for it, never inside the tar stream.
+        sudo_password (str | None): Password for `sudo -S`; without one, `sudo -n` is used.
+
+    Returns:
+        tuple: (restored target paths, {target: error message}).
+    """
+    stdout, stderr = ssh.run_piped(
+        build_restore_command(),
+        lambda stdin: write_restore_stream(stdin, files),
+        use_sudo=use_sudo,
+        sudo_password=sudo_password
+    )
+
+    return parse_restore_output(stdout, list(files), stderr.decode(errors="replace").strip())
@@ -1,34 +1,116 @@
 # vwrconf/core/diff.py
 
 from vwrconf.models.Crontab.crontab_entry import CrontabEntry
-import difflib
-from typing import Dict
+from vwrconf.core.line_diff import longest_increasing_run, unified_diff
+from collections import Counter, defaultdict, deque
+from typing import Dict, Iterable, NamedTuple
+
+class CronChange(NamedTuple):
+    old: CrontabEntry
+    new: CrontabEntry
+    field: str  # "schedule" or "command"
+
+class CronMove(NamedTuple):
+    entry: CrontabEntry
+    old_position: int  # 1-based, among the entries compared
+    new_position: int
+
+class CronDuplicate(NamedTuple):
+    entry: CrontabEntry
+    old_count: int
+    new_count: int
+
+def _pairing_key(entry: CrontabEntry, field: str) -> tuple[str, str] | None:
+    """Key pairing an entry with its previous version when `field` is what changed; None if it cannot be paired."""
+    schedule, command = entry.fields()
+    if field == "schedule":
+        return ("", command) if schedule and command else None
+    return (schedule, command.split(" ", 1)[0]) if schedule and command else None
 
 def diff_crontabs(
-    live_entries: set[CrontabEntry],
-    backup_entries: set[CrontabEntry]
+    live_entries: Iterable[CrontabEntry],
+    backup_entries: Iterable[CrontabEntry]
 ) -> dict:
     """
-    Normalized diff format:
-    {
-        added: [entry1, entry2],
-        removed: [entry3],
-        changed: {}  # empty, crontabs don't use unified diffs
-    }
+    Structured diff of two crontabs, in time close to linear in their length.
+
+    Entries are compared as sequences, in file order and with duplicates:
+    identical entries are paired first, then leftover entries with the
+    same command (a rescheduled job), then leftover entries with the same
+    schedule and program (a job whose arguments changed). Pairs out of
+    their relative order are moved jobs.
+
+    Args:
+        live_entries (Iterable[CrontabEntry]): New side, in file order.
+        backup_entries (Iterable[CrontabEntry]): Old side, in file order.
+
+    Returns:
+        dict: {
+            added: [entry, ...],
+            removed: [entry, ...],
+            changed: [CronChange, ...],     # paired entries, by field that changed
+            moved: [CronMove, ...],
+            duplicated: [CronDuplicate, ...]  # entries on either side more than once, copies count changed
+        }
     """
-    live_hashes = {entry.hash(): entry for entry in live_entries}
-    backup_hashes = {entry.hash(): entry for entry in backup_entries}
+    new = list(live_entries)
+    old = list(backup_entries)
+    new_hashes = [entry.hash() for entry in new]
+    old_hashes = [entry.hash() for entry in old]
+
+    # 1. Identical entries, paired in order of appearance
+    positions: dict[str, deque[int]] = defaultdict(deque)
+    for i, h in enumerate(old_hashes):
+        positions[h].append(i)
+    pairs, new_left = [], []
+    for j, h in enumerate(new_hashes):
+        if positions.get(h):
+            pairs.append((positions[h].popleft(), j))
+        else:
+            new_left.append(j)
+    old_left = sorted(i for queue in positions.values() for i in queue)
+
+    # Pairs are in new order; those out of the longest run in old order too are moves
+    stable = {(i, j) for j, i in longest_increasing_run([(j, i) for i, j in pairs])}
+    moved = [CronMove(new[j], i + 1, j + 1) for i, j in pairs if (i, j) not in stable]
 
-    live_keys = set(live_hashes.keys())
-    backup_keys = set(backup_hashes.keys())
+    # 2. Same command: rescheduled job; 3. same schedule and program: its command changed
+    changed = []
+    for field in ("schedule", "command"):
+        candidates: dict[tuple[str, str], deque[int]] = defaultdict(deque)
+        for i in old_left:
+            candidates[_pairing_key(old[i], field)].append(i)
+        paired_old, still_new = set(), []
+        for j in new_left:
+            key = _pairing_key(new[j], field)
+            if key is not None and candidates.get(key):
+                i = candidates[key].popleft()
+                paired_old.add(i)
+                # Same command and schedule once whitespace is collapsed: counts as a command change
+                what = "schedule" if old[i].fields()[0] != new[j].fields()[0] else "command"
+                changed.append(CronChange(old[i], new[j], what))
+            else:
+                still_new.append(j)
+        new_left = still_new
+        old_left = [i for i in old_left if i not in paired_old]
 
-    added = [live_hashes[h] for h in live_keys - backup_keys]
-    removed = [backup_hashes[h] for h in backup_keys - live_keys]
+    new_counts, old_counts = Counter(new_hashes), Counter(old_hashes)
+    # New side first, so a job still present is reported as it is now
+    first_seen = {}
+    for entry, h in zip(new + old, new_hashes + old_hashes):
+        first_seen.setdefault(h, entry)
+    duplicated = [
+        CronDuplicate(entry, old_counts[h], new_counts[h])
+        for h, entry in first_seen.items()
+        if max(new_counts[h], old_counts[h]) > 1 and new_counts[h] != old_counts[h]
+    ]
 
     return {
-        "added": added,
-        "removed": removed,
-        "changed": {},  # optional; reserved for detailed diffs
+        "added": [new[j] for j in new_left],
+        "removed": [old[i] for i in old_left],
+        "changed": changed,
+        "moved": moved,
+        "duplicated": duplicated,
     }
 
 
@@ -42,6 +124,10 @@ def diff_etc_files(live_files: Dict[str, str], backup_files: Dict[str, str]) ->
             "/etc/foo": "<unified diff text>"
         }
     }
+
+    Identical contents are skipped before any line splitting, and changed
+    ones go through the patience diff of `line_diff`, so large generated
+    files diff in linear-ish time; very large hunks are cut.
     """
     added = []
     removed = []
@@ -51,16 +137,17 @@ def diff_etc_files(live_files: Dict[str, str], backup_files: Dict[str, str]) ->
         if path not in backup_files:
             added.append(path)
             continue
+        if live_files[path] == backup_files[path]:
+            continue
 
         live_lines = live_files[path].splitlines(keepends=True)
         backup_lines = backup_files[path].splitlines(keepends=True)
 
-        diff = difflib.unified_diff(
+        diff = unified_diff(
             backup_lines,
             live_lines,
             fromfile=f"{path} (backup)",
-            tofile=f"{path} (live)",
-            lineterm=""
+            tofile=f"{path} (live)"
         )
         diff_output = ''.join(diff)
         if diff_output:
@@ -75,4 +162,3 @@ def diff_etc_files(live_files: Dict[str, str], backup_files: Dict[str, str]) ->
         "removed": sorted(removed),
         "changed": changed,
     }
-
@@ -0,0 +1,50 @@
+# vwrconf/core/drift.py
+
+import hashlib
+from typing import NamedTuple
+
+class DriftClass(NamedTuple):
+    """Hosts holding the same content of a file, or all lacking it."""
+    digest: str | None  # sha256 of the content, None for hosts without the file
+    content: str | None
+    hosts: list[str]
+
+def cluster_by_content(contents: dict[str, str | None]) -> list[DriftClass]:
+    """
+    Group hosts into equivalence classes by the sha256 of their content.
+
+    Each content is hashed once, so grouping is linear in the hosts and
+    the size of their files, whatever the number of variants.
+
+    Args:
+        contents (dict[str, str | None]): {host: content}, None for hosts without the file.
+
+    Returns:
+        list[DriftClass]: Largest class first; ties keep the order hosts were given in.
+    """
+    classes: dict[str | None, DriftClass] = {}
+    for host, content in contents.items():
+        digest = hashlib.sha256(content.encode()).hexdigest() if content is not None else None
+        if digest not in classes:
+            classes[digest] = DriftClass(digest, content, [])
+        classes[digest].hosts.append(host)
+    return sorted(classes.values(), key=lambda c: -len(c.hosts))
+
+def pick_baseline(classes: list[DriftClass], baseline_host: str | None = None) -> DriftClass:
+    """
+    Return the class every other class is compared against.
+
+    Args:
+        classes (list[DriftClass]): Classes from `cluster_by_content`.
+        baseline_host (str | None): Host whose class is the baseline; the majority
+            class (the largest holding the file) if None.
+
+    Raises:
+        ValueError: If `baseline_host` is in no class.
+    """
+    if baseline_host is not None:
+        for drift_class in classes:
+            if baseline_host in drift_class.hosts:
+                return drift_class
+        raise ValueError(f"Baseline host '{baseline_host}' has no data in this report.")
+    return next((c for c in classes if c.digest is not None), classes[0])
@@ -0,0 +1,278 @@
+# vwrconf/core/line_diff.py
+
+import bisect
+import difflib
+from collections import Counter
+from typing import Iterator
+
+# Regions at most this large (lines of a x lines of b) without a unique common line go to difflib
+SMALL_REGION = 250_000
+# Lines more frequent than this never anchor a histogram split (as in git), which bounds the work;
+# larger regions made only of such lines get a shortest edit script instead
+HISTOGRAM_MAX_OCCURRENCES = 64
+# Edits (inserted plus deleted lines) the shortest edit script looks for before giving up
+MYERS_MAX_COST = 200
+# Lines per side of the aligned windows given their own edit script when a region needs more edits than that
+FALLBACK_WINDOW = 64
+# Edits a window's edit script looks for before the window goes to difflib
+WINDOW_MAX_COST = 48
+# Lines the splits (anchors or rarest line) may count, per line of the two files, before the regions left are
+# handed to the edit script; splits peeling off a few lines at a time would otherwise be quadratic
+SPLIT_WORK_FACTOR = 4
+# Changed lines printed per hunk; the rest of a hunk is summarized
+MAX_HUNK_LINES = 2000
+
+def _intern(a: list[str], b: list[str]) -> tuple[list[int], list[int]]:
+    """Replace each line by a small int, equal lines by the same int, so comparisons and hashing are cheap."""
+    ids: dict[str, int] = {}
+    return [ids.setdefault(line, len(ids)) for line in a], [ids.setdefault(line, len(ids)) for line in b]
+
+def longest_increasing_run(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Longest subsequence of `pairs` (sorted by their first position) whose second positions increase.
+
+    Longest increasing subsequence by patience sorting, O(n log n).
+    """
+    if all(first[1] < second[1] for first, second in zip(pairs, pairs[1:])):
+        # Nothing moved, the usual case
+        return pairs
+    tails: list[int] = []
+    tail_index: list[int] = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        length = bisect.bisect_left(tails, j)
+        if length == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[length] = j
+            tail_index[length] = k
+        previous[k] = tail_index[length - 1] if length else -1
+
+    run = []
+    k = tail_index[-1] if tail_index else -1
+    while k != -1:
+        run.append(pairs[k])
+        k = previous[k]
+    return run[::-1]
+
+def _myers_blocks(a: list[int], b: list[int], max_cost: int) -> list[tuple[int, int, int]] | None:
+    """
+    Matching blocks of a shortest edit script of `a` into `b` (Myers' O(ND) greedy algorithm).
+
+    Unlike difflib, no line is too popular to match, so large regions of
+    blank or boilerplate lines keep their few real changes.
+
+    Returns:
+        list[tuple[int, int, int]] | None: (i, j, n) blocks in order, or None if
+        more than `max_cost` edits are needed.
+    """
+    n, m = len(a), len(b)
+    # Furthest x reached on each diagonal k = x - y, kept for every cost d to walk back
+    v = {1: 0}
+    trace = []
+    for d in range(max_cost + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            x = v[k + 1] if k == -d or (k != d and v[k - 1] < v[k + 1]) else v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_walk_back(trace, n, m)
+    return None
+
+def _myers_walk_back(trace: list[dict[int, int]], n: int, m: int) -> list[tuple[int, int, int]]:
+    """Matching blocks along the path found by `_myers_blocks`, from its end back to (0, 0)."""
+    blocks = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if d == 0:
+            previous_x = previous_y = start_x = start_y = 0
+        elif k == -d or (k != d and v[k - 1] < v[k + 1]):
+            # Came down from diagonal k + 1: b[previous_y] was inserted
+            previous_x = v[k + 1]
+            previous_y = previous_x - (k + 1)
+            start_x, start_y = previous_x, previous_y + 1
+        else:
+            # Came right from diagonal k - 1: a[previous_x] was deleted
+            previous_x = v[k - 1]
+            previous_y = previous_x - (k - 1)
+            start_x, start_y = previous_x + 1, previous_y
+        if x > start_x:
+            blocks.append((start_x, start_y, x - start_x))
+        x, y = previous_x, previous_y
+    return blocks[::-1]
+
+def _edit_script_blocks(a_ids: list[int], b_ids: list[int], alo: int, ahi: int, blo: int, bhi: int) -> list[tuple[int, int, int]]:
+    """
+    Matching blocks of a region that is not split any further.
+
+    Small regions go to difflib. Larger ones get a shortest edit script,
+    cheap when the sides are close, or else aligned windows matched one
+    by one, each small enough to be cheap whatever it holds.
+    """
+    if (ahi - alo) * (bhi - blo) <= SMALL_REGION:
+        matcher = difflib.SequenceMatcher(None, a_ids[alo:ahi], b_ids[blo:bhi], autojunk=False)
+        return [(alo + i, blo + j, n) for i, j, n in matcher.get_matching_blocks() if n]
+    # Lines only one side has left are edits too, so past the cap the search is not even started
+    if abs((ahi - alo) - (bhi - blo)) <= MYERS_MAX_COST:
+        script = _myers_blocks(a_ids[alo:ahi], b_ids[blo:bhi], MYERS_MAX_COST)
+        if script is not None:
+            return [(alo + i, blo + j, n) for i, j, n in script]
+    blocks = []
+    windows = -(-max(ahi - alo, bhi - blo) // FALLBACK_WINDOW)
+    for w in range(windows):
+        wa, wb = alo + (ahi - alo) * w // windows, blo + (bhi - blo) * w // windows
+        window_a = a_ids[wa:alo + (ahi - alo) * (w + 1) // windows]
+        window_b = b_ids[wb:blo + (bhi - blo) * (w + 1) // windows]
+        script = _myers_blocks(window_a, window_b, WINDOW_MAX_COST)
+        if script is None:
+            matcher = difflib.SequenceMatcher(None, window_a, window_b, autojunk=False)
+            script = [(i, j, n) for i, j, n in matcher.get_matching_blocks() if n]
+        blocks.extend((wa + i, wb + j, n) for i, j, n in script)
+    return blocks
+
+def matching_blocks(a: list[str], b: list[str]) -> list[difflib.Match]:
+    """
+    Matching blocks of two line lists, in the format of `SequenceMatcher.get_matching_blocks`.
+
+    Patience diff: common prefix and suffix are matched first, then the
+    lines occurring exactly once on each side anchor the rest, found as
+    the longest increasing run, and the regions between anchors are
+    diffed the same way. Regions without such lines are split on their
+    rarest common line (histogram diff), or left to difflib when small.
+    Large regions made only of frequent lines (blank lines, comment
+    banners) get a shortest edit script, which no line is too popular for,
+    and so does what is left once splitting used up its budget
+    (SPLIT_WORK_FACTOR).
+    Close to linear on configuration files.
+    """
+    a_ids, b_ids = _intern(a, b)
+    blocks = []
+    stack = [(0, len(a_ids), 0, len(b_ids))]
+    budget = SPLIT_WORK_FACTOR * (len(a_ids) + len(b_ids))
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        # Common prefix and suffix
+        start = 0
+        while alo + start < ahi and blo + start < bhi and a_ids[alo + start] == b_ids[blo + start]:
+            start += 1
+        if start:
+            blocks.append((alo, blo, start))
+            alo, blo = alo + start, blo + start
+        end = 0
+        while ahi - end > alo and bhi - end > blo and a_ids[ahi - end - 1] == b_ids[bhi - end - 1]:
+            end += 1
+        if end:
+            blocks.append((ahi - end, bhi - end, end))
+            ahi, bhi = ahi - end, bhi - end
+        if alo == ahi or blo == bhi:
+            continue
+        budget -= (ahi - alo) + (bhi - blo)
+        if budget < 0:
+            blocks.extend(_edit_script_blocks(a_ids, b_ids, alo, ahi, blo, bhi))
+            continue
+
+        a_counts = Counter(a_ids[alo:ahi])
+        b_counts = Counter(b_ids[blo:bhi])
+        b_unique = {line: j for j, line in enumerate(b_ids[blo:bhi], blo) if b_counts[line] == 1}
+        anchors = longest_increasing_run([
+            (i, b_unique[line]) for i, line in enumerate(a_ids[alo:ahi], alo)
+            if a_counts[line] == 1 and line in b_unique
+        ])
+        if anchors:
+            previous_i, previous_j = alo, blo
+            for i, j in anchors:
+                blocks.append((i, j, 1))
+                if i > previous_i or j > previous_j:
+                    stack.append((previous_i, i, previous_j, j))
+                previous_i, previous_j = i + 1, j + 1
+            stack.append((previous_i, ahi, previous_j, bhi))
+            continue
+
+        common = [line for line in a_counts if line in b_counts]
+        if not common:
+            continue
+        rarest = min(common, key=lambda line: a_counts[line] + b_counts[line])
+        if (ahi - alo) * (bhi - blo) <= SMALL_REGION or a_counts[rarest] + b_counts[rarest] > HISTOGRAM_MAX_OCCURRENCES:
+            # Small, or only frequent lines (blank, boilerplate)
+            blocks.extend(_edit_script_blocks(a_ids, b_ids, alo, ahi, blo, bhi))
+            continue
+
+        # Split on the first occurrence of the rarest line present on both sides
+        i = a_ids.index(rarest, alo, ahi)
+        j = b_ids.index(rarest, blo, bhi)
+        blocks.append((i, j, 1))
+        stack.append((alo, i, blo, j))
+        stack.append((i + 1, ahi, j + 1, bhi))
+
+    blocks.sort()
+    # Merge adjacent blocks, as difflib does, then close with its sentinel
+    merged: list[list[int]] = []
+    for i, j, n in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1][2] += n
+        else:
+            merged.append([i, j, n])
+    return [difflib.Match(i, j, n) for i, j, n in merged] + [difflib.Match(len(a), len(b), 0)]
+
+class _PrecomputedMatcher(difflib.SequenceMatcher):
+    """SequenceMatcher over blocks computed by `matching_blocks`, for its opcode grouping."""
+
+    def __init__(self, a: list[str], b: list[str]):
+        super().__init__(None, [], [], autojunk=False)
+        self.a, self.b = a, b
+        self.matching_blocks = matching_blocks(a, b)
+        self.opcodes = None
+
+def _format_range(start: int, length: int) -> str:
+    # Same as difflib's unified ranges: 1-based start, length omitted when 1
+    beginning = start + 1
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+def unified_diff(
+    a: list[str],
+    b: list[str],
+    fromfile: str = "",
+    tofile: str = "",
+    n: int = 3,
+    max_hunk_lines: int = MAX_HUNK_LINES
+) -> Iterator[str]:
+    """
+    Yield a unified diff of two lists of lines (with their line endings), like `difflib.unified_diff`.
+
+    Hunks with more than `max_hunk_lines` changed lines are cut, followed
+    by a line telling how many were left out, so a regenerated file does
+    not produce a diff as large as itself.
+    """
+    started = False
+    for group in _PrecomputedMatcher(a, b).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}\n"
+            yield f"+++ {tofile}\n"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_format_range(first[1], last[2] - first[1])} +{_format_range(first[3], last[4] - first[3])} @@\n"
+        printed, skipped = 0, 0
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                lines = [(" ", line) for line in a[i1:i2]]
+            else:
+                lines = [("-", line) for line in a[i1:i2]] + [("+", line) for line in b[j1:j2]]
+            for prefix, line in lines:
+                if printed >= max_hunk_lines:
+                    skipped += prefix != " "
+                    continue
+                printed += prefix != " "
+                yield prefix + (line if line.endswith("\n") else line + "\n")
+        if skipped:
+            yield f"... {skipped} more changed line(s) in this hunk not shown\n"
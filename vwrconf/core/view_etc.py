@@ -1,54 +1,89 @@
 from typing import Dict
-from vwrconf.models.config_model import Config
-from vwrconf.models.SSH_Broker import SSHConnectionHandler
+from vwrconf.core.batch_read import read_files_batched, read_files_per_path
+from vwrconf.core.delta_read import DELTA_MIN_SIZE, read_files_delta
+from vwrconf.models.Backup.etc import EtcBackup
+from vwrconf.models.config_model import Client, Config
+from vwrconf.models.SSH_Broker import SSH_Broker, SSHConnectionHandler
 
-def fetch_all_etc(config: Config, etc_paths: list[str], sudo_password: str | None = None) -> Dict[str, Dict[str, str]]:
+def fetch_all_etc(
+    config: Config,
+    etc_paths: list[str],
+    sudo_password: str | None = None,
+    batched: bool = True,
+    delta: bool = False
+) -> Dict[str, Dict[str, str]]:
     """
-    Connects to all non-readonly hosts and fetches specified /etc files.
+    Connects to all non-readonly hosts in parallel and fetches specified /etc files.
     Returns a nested dict: {host_id: {etc_path: content}}.
 
-    Uses sudo with password if necessary, via stdin (no prompt).
+    Uses sudo with password if necessary, via stdin (no prompt). With `batched`,
+    all paths of a host are read in a single remote invocation. With `delta`,
+    large files that were backed up before only transfer their changed blocks.
     """
     results: Dict[str, Dict[str, str]] = {}
+    clients = [c for c in config.clients if not c.readonly]
 
-    for client in config.clients:
-        if client.readonly:
-            continue
-
+    def fetch_host(ssh: SSHConnectionHandler, client: Client) -> Dict[str, str]:
         ssh_user = client.ssh_user or config.defaults.ssh_user or "root"
-        ssh = SSHConnectionHandler(client, config.defaults)
-        if not ssh.connect():
-            print(f"[SKIP] Could not connect to {client.id}")
-            continue
+        delta_bases = None
+        if delta:
+            delta_bases = EtcBackup(config).latest_stored_paths(client.id, etc_paths, min_size=DELTA_MIN_SIZE)
+        return fetch_host_etc(ssh, client.id, ssh_user, etc_paths, sudo_password, batched=batched, delta_bases=delta_bases)
 
-        host_data = {}
-        for path in etc_paths:
-            if ssh_user != "root":
-                if sudo_password is None:
-                    print(f"[ERROR] Missing sudo password for host {client.id}.")
-                    continue
-                cmd = f"sudo -S cat {path}"
-                stdout, stderr = ssh.run(cmd, input_data=sudo_password + "\n", use_pty=True)
-            else:
-                cmd = f"cat {path}"
-                stdout, stderr = ssh.run(cmd)
-
-            if stderr.strip():
-                print(f"[WARN] Error fetching {path} from {client.id}: {stderr.strip()}")
-                continue
-
-            # Clean sudo prompt + echoed password
-            cleaned_lines = [
-                line for line in stdout.splitlines()
-                if line.strip() not in ("Password:", (sudo_password or "").strip()) and
-                not line.lower().startswith("[sudo] password")
-            ]
-            host_data[path] = "\n".join(cleaned_lines)
-
-        ssh.close()
-
-        if host_data:
-            results[client.id] = host_data
+    outcomes = SSH_Broker().fan_out(clients, config.defaults, fetch_host)
+    for host_id, outcome in outcomes.items():
+        if not outcome.ok:
+            print(f"[SKIP] Could not fetch /etc files from {host_id}: {outcome.error}")
+            continue
+        if outcome.value:
+            results[host_id] = outcome.value
 
     return results
 
+def fetch_host_etc(
+    ssh: SSHConnectionHandler,
+    host_id: str,
+    ssh_user: str,
+    etc_paths: list[str],
+    sudo_password: str | None = None,
+    batched: bool = True,
+    delta_bases: Dict[str, str] | None = None
+) -> Dict[str, str]:
+    """
+    Reads the given /etc files over an already connected handler.
+    Returns {etc_path: content} for every file that could be read.
+
+    Non-root users go through the connection's sudo session, so sudo is
+    authenticated once per host rather than once per file. Paths in
+    `delta_bases` ({etc_path: local copy}) are first fetched as block deltas
+    against that copy; any that fail are read in full.
+    """
+    if ssh_user != "root":
+        if sudo_password is None:
+            print(f"[ERROR] Missing sudo password for host {host_id}.")
+            return {}
+        try:
+            runner = ssh.elevated(sudo_password)
+        except PermissionError as e:
+            print(f"[ERROR] {e} on host {host_id}.")
+            return {}
+    else:
+        runner = ssh
+
+    files = {}
+    if delta_bases:
+        files, _ = read_files_delta(runner, delta_bases)
+
+    remaining = [p for p in etc_paths if p not in files]
+    if not remaining:
+        errors = {}
+    elif batched:
+        more_files, errors = read_files_batched(runner, remaining)
+        files.update(more_files)
+    else:
+        more_files, errors = read_files_per_path(runner, remaining)
+        files.update(more_files)
+
+    for path, error in errors.items():
+        print(f"[WARN] Error fetching {path} from {host_id}: {error}")
+    return {path: content.decode(errors="replace") for path, content in files.items()}
@@ -1,11 +1,41 @@
 # vwrconf/models/Backup/base.py
+import os
 from abc import ABC, abstractmethod
 
 from vwrconf.models.config_model import Config
+from vwrconf.models.Backup.backup_entry_base import BackupEntry
+from vwrconf.models.Backup.blame import BlameLine, LineHasher, blame_paths, update_lifetimes
+from vwrconf.models.Backup.catalog import Catalog, CatalogEntry
+from vwrconf.models.Backup.history import LineRange, index_contents, line_history
+from vwrconf.models.Backup.manifest import MANIFEST_SUFFIX, read_manifest
+from vwrconf.models.Backup.object_store import (
+    Location, ObjectStore, file_sha256, stored_exists, stored_size, zstd_available
+)
+from vwrconf.models.Backup.pack import PACK_SUFFIX, PackEntry, PackMember, PackWriter, read_pack_index
+from vwrconf.models.Backup.prune import prune_backups
+
+REF_SUFFIX = ".ref"
 
 class Backup(ABC):
+    BASE_BACKUP_DIR: str
+    KIND: str
+
     def __init__(self, config: Config):
         self.config = config
+        # Shared by all backup kinds: ~/.vwrconf/backups/objects and ~/.vwrconf/backups/catalog.db
+        backups_root = os.path.dirname(self.BASE_BACKUP_DIR)
+        compression = config.defaults.backup_compression
+        if compression == "zstd" and not zstd_available():
+            print("[WARN] backup_compression is zstd but the 'zstandard' package is not installed, using gzip")
+            compression = "gzip"
+        self.objects = ObjectStore(os.path.join(backups_root, "objects"), compression)
+        self.catalog = Catalog(os.path.join(backups_root, "catalog.db"))
+        self._pack_indexes: dict[str, dict[str, PackEntry]] = {}
+        if not self.catalog.is_indexed(self.KIND):
+            # First run against a tree written before the catalog existed
+            count = self.reindex()
+            if count:
+                print(f"[INFO] Indexed {count} stored {self.KIND} backup file(s) into {self.catalog.db_path}")
 
     @abstractmethod
     def write_backup(self, host_id: str, lines: list[str]):
@@ -30,3 +60,234 @@ class Backup(ABC):
     @abstractmethod
     def latest_backup_filename(self, host_id: str) -> str:
         pass
+
+    @abstractmethod
+    def _get_host_backup_dir(self, host_id: str) -> str:
+        pass
+
+    @abstractmethod
+    def _make_entry(self, host_id: str, path: str, line: str) -> BackupEntry:
+        """Build the entry of a stored line, whose hash identifies it across snapshots."""
+        pass
+
+    @abstractmethod
+    def _scan_host(self, host_id: str) -> dict[str, dict[str, tuple[str, Location, str | None]]]:
+        """
+        Read the stored backups of a host from its directory, for reindexing.
+
+        Returns:
+            dict: {timestamp: {path: (stored file name, content location, sha256 if known)}}.
+        """
+        pass
+
+    # --- Catalog ---
+
+    def reindex(self) -> int:
+        """
+        Rebuild the catalog entries of this backup kind from the backup tree, in one pass.
+
+        Returns:
+            int: Number of files indexed.
+        """
+        rows = []
+        hosts = os.listdir(self.BASE_BACKUP_DIR) if os.path.isdir(self.BASE_BACKUP_DIR) else []
+        for host_id in sorted(hosts):
+            if not os.path.isdir(self._get_host_backup_dir(host_id)):
+                continue
+            for timestamp, entries in self._scan_host(host_id).items():
+                for path, (stored, local_path, sha256) in entries.items():
+                    size = None
+                    if stored_exists(local_path):
+                        size = stored_size(local_path)
+                        sha256 = sha256 or self._file_sha256(local_path)
+                    rows.append((host_id, CatalogEntry(timestamp, path, stored, size, sha256)))
+        return self.catalog.replace_kind(self.KIND, rows)
+
+    def _locate_entry(self, host_id: str, entry: CatalogEntry) -> tuple[Location, str | None]:
+        """Return (location of the content, sha256 if known) of a catalog entry."""
+        if entry.stored.endswith(MANIFEST_SUFFIX):
+            return self.objects.path(entry.sha256), entry.sha256
+        if entry.stored.endswith(PACK_SUFFIX):
+            pack_path = os.path.join(self._get_host_backup_dir(host_id), entry.stored)
+            return self._pack_locations(pack_path).get(entry.path, (self.objects.path(entry.sha256), entry.sha256))
+        local_path, sha256 = self._resolve_stored(self._get_host_backup_dir(host_id), entry.stored)
+        return local_path, sha256 or entry.sha256
+
+    # --- Storage layout ---
+    # A snapshot is "<host dir>/<timestamp>.manifest", one "<sha256> <path>"
+    # line per stored file, where the content lives in the shared object
+    # store. Unchanged files simply list the hash they had before.
+    #
+    # Backups written before the object store keep working read-only: full
+    # content files in the host directory, and "<name>.ref" files holding
+    # "<sha256> <name of the stored file with the content>". References always
+    # point at a real content file, so resolving one is a single read.
+
+    @staticmethod
+    def _file_sha256(path: str) -> str:
+        return file_sha256(path)
+
+    @staticmethod
+    def _read_manifest(manifest_path: str) -> dict[str, str]:
+        return read_manifest(manifest_path)
+
+    def _write_manifest(self, host_id: str, timestamp: str, entries: dict[str, str], merge: bool = True) -> str:
+        """
+        Atomically write the manifest of a snapshot, after its objects are stored, and catalog it.
+
+        Callers storing the objects hold `objects.lock` shared until this
+        returns, so garbage collection cannot remove them in between.
+
+        With `merge`, entries of an existing manifest with the same timestamp
+        are kept unless overwritten, as separate files of the same second
+        used to be; without it the snapshot is replaced.
+
+        Returns:
+            str: Path of the manifest.
+        """
+        manifest_name = timestamp + MANIFEST_SUFFIX
+        manifest_path = os.path.join(self._get_host_backup_dir(host_id), manifest_name)
+        with self.objects.lock.shared():
+            if merge and os.path.exists(manifest_path):
+                entries = {**self._read_manifest(manifest_path), **entries}
+            with open(manifest_path + ".part", "w") as f:
+                for path, sha256 in entries.items():
+                    f.write(f"{sha256} {path}\n")
+            os.replace(manifest_path + ".part", manifest_path)
+
+        self.catalog.replace_snapshot(self.KIND, host_id, timestamp, [
+            CatalogEntry(timestamp, path, manifest_name, self.objects.size(sha256), sha256)
+            for path, sha256 in entries.items()
+        ])
+        return manifest_path
+
+    def _pack_locations(self, pack_path: str) -> dict[str, tuple[Location, str]]:
+        """Return {path: (location, sha256)} of every file of a snapshot pack."""
+        if pack_path not in self._pack_indexes:
+            self._pack_indexes[pack_path] = read_pack_index(pack_path)
+        return {
+            path: (self.objects.path(e.sha256) if e.offset is None else PackMember(pack_path, e.offset, e.length), e.sha256)
+            for path, e in self._pack_indexes[pack_path].items()
+        }
+
+    def _write_pack(self, host_id: str, timestamp: str, pack: PackWriter, entries: dict[str, str]) -> str:
+        """
+        Finish the pack of a snapshot and catalog it.
+
+        Files written into the pack are indexed at their offset; the others
+        (unchanged files) point at their object, which must be stored already.
+
+        Returns:
+            str: Path of the pack.
+        """
+        index = {}
+        for path, sha256 in entries.items():
+            member = pack.members.get(path)
+            index[path] = member if member is not None and member.sha256 == sha256 else PackEntry(sha256, None, self.objects.size(sha256))
+        with self.objects.lock.shared():
+            pack_path = pack.finish(index)
+
+        pack_name = os.path.basename(pack_path)
+        self.catalog.replace_snapshot(self.KIND, host_id, timestamp, [
+            CatalogEntry(timestamp, path, pack_name, entry.length, entry.sha256) for path, entry in index.items()
+        ])
+        return pack_path
+
+    @classmethod
+    def _resolve_stored(cls, host_dir: str, name: str) -> tuple[str, str | None]:
+        """
+        Return (path of the file holding the content, its sha256 if already known).
+
+        `name` is a pre-store file name, either a content file or a reference.
+        """
+        if not name.endswith(REF_SUFFIX):
+            return os.path.join(host_dir, name), None
+        with open(os.path.join(host_dir, name)) as f:
+            sha256, _, target = f.readline().strip().partition(" ")
+        return os.path.join(host_dir, target), sha256
+
+    # --- History search ---
+
+    def update_line_index(self) -> int:
+        """
+        Index the lines of the contents of this kind stored since the last update.
+
+        Returns:
+            int: Number of contents indexed.
+        """
+        return index_contents(self.catalog, self.KIND, self._locate_entry)
+
+    def search_history(
+        self,
+        query: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        host_id: str | None = None
+    ) -> dict[str, dict[tuple[str, str], list[LineRange]]]:
+        """
+        Search every line ever backed up, across all hosts and snapshots of this kind.
+
+        Contents stored since the previous search are indexed first, so a
+        search only reads backups that are new to the index. See
+        `history.line_history`.
+
+        Raises:
+            re.error: If `query` is not a valid regular expression.
+        """
+        self.update_line_index()
+        return line_history(self.catalog, self.KIND, query, regex, ignore_case, host_id)
+
+    # --- Blame ---
+
+    def _line_hash(self, host_id: str) -> LineHasher:
+        return lambda path, line: self._make_entry(host_id, path, line).hash()
+
+    def update_lifetimes(self, host_id: str, paths: list[str] | None = None) -> int:
+        """
+        Bring the line lifetimes of a host up to date with its snapshots, see `blame.update_lifetimes`.
+
+        Returns:
+            int: Number of snapshots processed.
+        """
+        return update_lifetimes(self.catalog, self.KIND, host_id, paths, self._locate_entry, self._line_hash(host_id))
+
+    def blame(
+        self,
+        host_id: str,
+        timestamp: str | None = None,
+        paths: list[str] | None = None
+    ) -> dict[str, tuple[str, list[BlameLine]]]:
+        """
+        Tell, for each line of a host's stored files, when it first appeared and when it was missing.
+
+        Lifetimes are brought up to date first. See `blame.blame_paths`.
+
+        Args:
+            host_id (str): Host to blame.
+            timestamp (str | None): Snapshot (or prefix) to blame, the latest if None.
+            paths (list[str] | None): Paths to blame, every path of the host if None.
+
+        Returns:
+            dict: {path: (timestamp of the copy blamed, [BlameLine, ...] in file order)}.
+        """
+        timestamp = timestamp or self.latest_backup_filename(host_id)
+        paths = paths if paths is not None else self.catalog.paths(self.KIND, host_id)
+        self.update_lifetimes(host_id, paths)
+        return blame_paths(self.catalog, self.KIND, host_id, timestamp, paths, self._locate_entry, self._line_hash(host_id))
+
+    # --- Retention ---
+
+    def prune(self, host_ids: list[str] | None = None, dry_run: bool = False) -> int:
+        """
+        Apply the retention policies of the config, then drop objects no snapshot uses anymore.
+
+        See `prune.prune_backups`.
+
+        Args:
+            host_ids (list[str] | None): Hosts to prune, every host with backups if None.
+            dry_run (bool): Only report what would be removed.
+
+        Returns:
+            int: Number of snapshots removed, or that would be.
+        """
+        return prune_backups(self, host_ids, dry_run)
@@ -0,0 +1,114 @@
+# vwrconf/models/Backup/blame.py
+
+from typing import Callable, NamedTuple
+from vwrconf.models.Backup.catalog import Catalog
+from vwrconf.models.Backup.history import Locator, content_lines
+from vwrconf.models.Backup.object_store import read_lines, stored_exists
+
+# (path, line) -> hash identifying the line across snapshots, e.g. that of its BackupEntry
+LineHasher = Callable[[str, str], str]
+
+class BlameLine(NamedTuple):
+    line: str
+    first_seen: str | None  # None for blank lines
+    gaps: list[tuple[str, str]]  # (last snapshot before the line went missing, snapshot it came back in)
+
+def update_lifetimes(
+    catalog: Catalog,
+    kind: str,
+    host_id: str,
+    paths: list[str] | None,
+    locate: Locator,
+    line_hash: LineHasher
+) -> int:
+    """
+    Bring the line lifetimes of a host up to date with its snapshots.
+
+    Each snapshot is processed once, against the one before it: only
+    snapshots stored since the previous update are read, and those
+    with the same content as their predecessor are not read at all.
+    A path whose history changed since (pruned or reindexed
+    snapshots) is rebuilt from its first snapshot.
+
+    Args:
+        catalog (Catalog): Catalog holding the lifetimes.
+        kind (str): Backup kind, e.g. "cron".
+        host_id (str): Host whose lifetimes to update.
+        paths (list[str] | None): Paths to update, every path of the host if None.
+        locate (Locator): Finds the stored content of a catalog entry.
+        line_hash (LineHasher): Identifies a line of a path across snapshots.
+
+    Returns:
+        int: Number of snapshots processed.
+    """
+    count = 0
+    for path in paths if paths is not None else catalog.paths(kind, host_id):
+        entries = catalog.path_entries(kind, host_id, path)
+        progress = catalog.lifetime_progress(kind, host_id, path)
+        if progress and (progress[1] > len(entries) or entries[progress[1] - 1].timestamp != progress[0]):
+            catalog.reset_lifetimes(kind, host_id, path)
+            progress = None
+
+        done = progress[1] if progress else 0
+        previous = entries[done - 1] if done else None
+        for i, entry in enumerate(entries[done:], start=done + 1):
+            if previous is not None and entry.sha256 and entry.sha256 == previous.sha256:
+                hashes = None
+            else:
+                location, _ = locate(host_id, entry)
+                lines = content_lines(location) if stored_exists(location) else set()
+                hashes = {line_hash(path, line) for line in lines}
+            previous_timestamp = previous.timestamp if previous is not None else None
+            catalog.extend_lifetimes(kind, host_id, path, previous_timestamp, entry.timestamp, hashes, i)
+            previous = entry
+            count += 1
+    return count
+
+def blame_paths(
+    catalog: Catalog,
+    kind: str,
+    host_id: str,
+    timestamp: str,
+    paths: list[str],
+    locate: Locator,
+    line_hash: LineHasher
+) -> dict[str, tuple[str, list[BlameLine]]]:
+    """
+    Tell, for each line of a host's stored files, when it first appeared and when it was missing.
+
+    A file is taken as of its newest copy in the snapshots up to
+    `timestamp`. Lifetimes must be up to date, see `update_lifetimes`.
+
+    Args:
+        catalog (Catalog): Catalog holding the lifetimes.
+        kind (str): Backup kind, e.g. "cron".
+        host_id (str): Host to blame.
+        timestamp (str): Snapshot (or prefix) to blame.
+        paths (list[str]): Paths to blame.
+        locate (Locator): Finds the stored content of a catalog entry.
+        line_hash (LineHasher): Identifies a line of a path across snapshots.
+
+    Returns:
+        dict: {path: (timestamp of the copy blamed, [BlameLine, ...] in file order)}.
+    """
+    results = {}
+    for path in paths:
+        entry = catalog.entry_at(kind, host_id, path, timestamp)
+        if entry is None:
+            continue
+        location, _ = locate(host_id, entry)
+        lines = read_lines(location) if stored_exists(location) else None
+        if lines is None:
+            continue
+
+        lifetimes = catalog.lifetimes(kind, host_id, path, entry.timestamp)
+        blamed = []
+        for line in lines:
+            runs = lifetimes.get(line_hash(path, line)) if line.strip() else None
+            if not runs:
+                blamed.append(BlameLine(line, None, []))
+                continue
+            gaps = [(before.last_seen, after.first_seen) for before, after in zip(runs, runs[1:])]
+            blamed.append(BlameLine(line, runs[0].first_seen, gaps))
+        results[path] = (entry.timestamp, blamed)
+    return results
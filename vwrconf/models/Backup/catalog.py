@@ -0,0 +1,457 @@
+# vwrconf/models/Backup/catalog.py
+
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Iterable, NamedTuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    kind TEXT NOT NULL,
+    host TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    path TEXT NOT NULL,
+    stored TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT,
+    PRIMARY KEY (kind, host, timestamp, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_by_path ON files (kind, host, path, timestamp);
+CREATE TABLE IF NOT EXISTS indexed (kind TEXT PRIMARY KEY);
+CREATE INDEX IF NOT EXISTS files_by_sha256 ON files (sha256, kind);
+CREATE TABLE IF NOT EXISTS lines (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5(text, content='lines', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS lines_fts_insert AFTER INSERT ON lines BEGIN
+    INSERT INTO lines_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_fts_delete AFTER DELETE ON lines BEGIN
+    INSERT INTO lines_fts (lines_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TABLE IF NOT EXISTS content_lines (
+    line_id INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (line_id, sha256)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kind_contents (
+    kind TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (kind, sha256)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kind_lines (
+    kind TEXT NOT NULL,
+    line_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, line_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lifetimes (
+    kind TEXT NOT NULL,
+    host TEXT NOT NULL,
+    path TEXT NOT NULL,
+    entry_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (kind, host, path, entry_hash, first_seen)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lifetimes_by_end ON lifetimes (kind, host, path, last_seen);
+CREATE TABLE IF NOT EXISTS lifetime_progress (
+    kind TEXT NOT NULL,
+    host TEXT NOT NULL,
+    path TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    snapshots INTEGER NOT NULL,
+    PRIMARY KEY (kind, host, path)
+) WITHOUT ROWID;
+"""
+
+# PRAGMA user_version of the current schema. Version 0 had a line index without
+# kinds or trigrams; it is dropped and rebuilt by the next search.
+SCHEMA_VERSION = 1
+LEGACY_LINE_INDEX = """
+DROP TABLE IF EXISTS indexed_contents;
+DROP TABLE IF EXISTS content_lines;
+DROP TABLE IF EXISTS lines;
+"""
+
+# Trigram index lookups need at least this many characters
+TRIGRAM = 3
+
+# Runs of consecutive snapshots of a path holding each matching line (gaps and islands)
+LINE_RANGES_SQL = """
+WITH matched AS MATERIALIZED ({matched}),
+hit_files AS MATERIALIZED (
+    SELECT m.text, f.host, f.path, f.timestamp FROM matched m
+    CROSS JOIN content_lines c ON c.line_id = m.id
+    CROSS JOIN files f INDEXED BY files_by_sha256 ON f.sha256 = c.sha256 AND f.kind = :kind {host_filter}
+),
+positioned AS (
+    SELECT host, path, timestamp,
+        ROW_NUMBER() OVER (PARTITION BY host, path ORDER BY timestamp) AS pos,
+        COUNT(*) OVER (PARTITION BY host, path) AS total
+    FROM files WHERE kind = :kind AND (host, path) IN (SELECT host, path FROM hit_files)
+),
+runs AS (
+    SELECT h.text, h.host, h.path, h.timestamp, p.pos, p.total,
+        p.pos - ROW_NUMBER() OVER (PARTITION BY h.text, h.host, h.path ORDER BY p.pos) AS run
+    FROM hit_files h JOIN positioned p USING (host, path, timestamp)
+)
+SELECT text, host, path, MIN(timestamp), MAX(timestamp), COUNT(*), MAX(pos) = MAX(total)
+FROM runs GROUP BY text, host, path, run ORDER BY text, host, path, MIN(timestamp)
+"""
+
+@lru_cache(maxsize=32)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+def _regexp(pattern: str, text: str) -> bool:
+    """REGEXP operator of the catalog connection: `text REGEXP pattern`."""
+    return _compile(pattern).search(text) is not None
+
+class CatalogEntry(NamedTuple):
+    timestamp: str
+    path: str
+    stored: str  # manifest or pre-store file name in the host backup directory
+    size: int | None
+    sha256: str | None
+
+class LineRange(NamedTuple):
+    """Run of consecutive snapshots of a host path holding a line."""
+    first: str
+    last: str
+    snapshots: int
+    current: bool  # the run reaches the newest snapshot of the path
+
+class LineLifetime(NamedTuple):
+    """Run of consecutive snapshots of a host path holding an entry."""
+    first_seen: str
+    last_seen: str
+
+class Catalog:
+    """
+    SQLite index of every stored backup file: kind, host, timestamp, path, size and hash.
+
+    Listings and latest-snapshot lookups are answered from B-tree indexes
+    instead of listing and parsing host directories. Writers record each
+    snapshot right after its manifest; `replace_kind` rebuilds one backup
+    kind from a directory scan in a single transaction.
+
+    The catalog also holds an inverted line index for history searches:
+    every distinct line ever backed up, mapped to the contents (by sha256)
+    holding it and to the backup kinds it was seen in. Contents are
+    immutable, so each is indexed once per kind whatever the number of
+    hosts and snapshots sharing it, and the `files` table maps them back
+    to hosts, paths and timestamps. A trigram index over the lines answers
+    literal searches without reading every line.
+
+    Blame uses per-host line lifetimes instead: for each host path, the
+    runs of consecutive snapshots holding each entry (by `BackupEntry.hash`),
+    extended one snapshot at a time as backups come in.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            # One connection shared by the fan-out workers, serialized by self.lock
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.create_function("regexp", 2, _regexp, deterministic=True)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                conn.executescript(LEGACY_LINE_INDEX)
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql: str, params: tuple | dict = ()) -> list[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def is_indexed(self, kind: str) -> bool:
+        return bool(self._query("SELECT 1 FROM indexed WHERE kind = ?", (kind,)))
+
+    def record(self, kind: str, host: str, entries: Iterable[CatalogEntry]):
+        """Add or update the files of a snapshot."""
+        rows = [(kind, host, *entry) for entry in entries]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def replace_snapshot(self, kind: str, host: str, timestamp: str, entries: Iterable[CatalogEntry]):
+        """Replace the files of a snapshot; no entries removes it."""
+        rows = [(kind, host, *entry) for entry in entries]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM files WHERE kind = ? AND host = ? AND timestamp = ?", (kind, host, timestamp))
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def replace_kind(self, kind: str, rows: Iterable[tuple[str, CatalogEntry]]) -> int:
+        """
+        Replace everything known about a backup kind with `(host, entry)` rows.
+
+        Returns:
+            int: Number of files indexed.
+        """
+        rows = [(kind, host, *entry) for host, entry in rows]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM files WHERE kind = ?", (kind,))
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR IGNORE INTO indexed VALUES (?)", (kind,))
+        return len(rows)
+
+    def hosts(self, kind: str) -> list[str]:
+        return [r[0] for r in self._query("SELECT DISTINCT host FROM files WHERE kind = ? ORDER BY host", (kind,))]
+
+    def dates(self, kind: str, host: str) -> list[str]:
+        sql = "SELECT DISTINCT timestamp FROM files WHERE kind = ? AND host = ? ORDER BY timestamp"
+        return [r[0] for r in self._query(sql, (kind, host))]
+
+    def latest(self, kind: str, host: str) -> str:
+        rows = self._query("SELECT MAX(timestamp) FROM files WHERE kind = ? AND host = ?", (kind, host))
+        return rows[0][0] or ""
+
+    def snapshot(self, kind: str, host: str, timestamp: str) -> list[CatalogEntry]:
+        """Files of every snapshot whose timestamp starts with `timestamp`, oldest first."""
+        sql = (
+            "SELECT timestamp, path, stored, size, sha256 FROM files "
+            "WHERE kind = ? AND host = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp"
+        )
+        # Prefix match as a range, so it stays an index seek
+        return [CatalogEntry(*r) for r in self._query(sql, (kind, host, timestamp, timestamp + "￿"))]
+
+    def latest_entries(self, kind: str, host: str, paths: list[str]) -> dict[str, CatalogEntry]:
+        """Most recent stored file of each of `paths`, for paths backed up before."""
+        sql = (
+            "SELECT timestamp, path, stored, size, sha256 FROM files "
+            "WHERE kind = ? AND host = ? AND path = ? ORDER BY timestamp DESC LIMIT 1"
+        )
+        found = {}
+        for path in dict.fromkeys(paths):
+            rows = self._query(sql, (kind, host, path))
+            if rows:
+                found[path] = CatalogEntry(*rows[0])
+        return found
+
+    # --- Line index ---
+
+    def unindexed_contents(self, kind: str) -> dict[str, tuple[str, CatalogEntry]]:
+        """Return {sha256: (host, one entry holding it)} of the contents of a kind whose lines are not indexed yet."""
+        sql = (
+            "SELECT sha256, host, timestamp, path, stored, size, sha256 FROM files "
+            "WHERE kind = ? AND sha256 IS NOT NULL "
+            "AND sha256 NOT IN (SELECT sha256 FROM kind_contents WHERE kind = ?) "
+            "GROUP BY sha256"
+        )
+        return {r[0]: (r[1], CatalogEntry(*r[2:])) for r in self._query(sql, (kind, kind))}
+
+    def index_content(self, kind: str, sha256: str, lines: Iterable[str]):
+        """Record the distinct lines of a content of a kind; an empty set still marks it as indexed."""
+        lines = list(lines)
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO lines (text) VALUES (?)", ((line,) for line in lines))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO content_lines (line_id, sha256) SELECT id, ? FROM lines WHERE text = ?",
+                ((sha256, line) for line in lines)
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO kind_lines (kind, line_id) SELECT ?, id FROM lines WHERE text = ?",
+                ((kind, line) for line in lines)
+            )
+            self.conn.execute("INSERT OR IGNORE INTO kind_contents VALUES (?, ?)", (kind, sha256))
+
+    def search_lines(
+        self,
+        kind: str,
+        query: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        host: str | None = None
+    ) -> dict[str, dict[tuple[str, str], list[LineRange]]]:
+        """
+        Find every line of a kind matching `query`, with the snapshot ranges of each host path holding it.
+
+        Literal queries of at least three characters are looked up in the
+        trigram index, then checked exactly. Regular expressions and shorter
+        literals are matched against the lines seen in this kind only. The
+        backups themselves are never read, and hits are collapsed into
+        ranges of consecutive snapshots in the query itself.
+
+        Args:
+            kind (str): Backup kind.
+            query (str): Substring, or Python regular expression with `regex`.
+            regex (bool): Treat `query` as a regular expression.
+            ignore_case (bool): Case-insensitive matching.
+            host (str | None): Only search the backups of this host.
+
+        Returns:
+            dict: {line: {(host, path): [LineRange, ...]}}, lines in sorted order.
+
+        Raises:
+            re.error: If `query` is not a valid regular expression.
+        """
+        if regex or ignore_case:
+            # SQLite's lower() only folds ASCII, so case-insensitive literals go through re as well
+            pattern = ("(?i)" if ignore_case else "") + (query if regex else re.escape(query))
+            _compile(pattern)
+            condition, param = "l.text REGEXP :pattern", pattern
+        else:
+            condition, param = "instr(l.text, :pattern) > 0", query
+
+        # The trigram index folds case, so it only narrows the lines down; `condition` decides.
+        # Its folding of non-ASCII text may differ from re's, such literals are scanned instead.
+        if not regex and len(query) >= TRIGRAM and (query.isascii() or not ignore_case):
+            matched = (
+                # CROSS JOIN keeps the index lookup as the outer loop
+                "SELECT l.id, l.text FROM lines_fts CROSS JOIN lines l ON l.id = lines_fts.rowid "
+                "CROSS JOIN kind_lines k ON k.kind = :kind AND k.line_id = l.id "
+                f"WHERE lines_fts MATCH :phrase AND {condition}"
+            )
+        else:
+            matched = (
+                "SELECT l.id, l.text FROM kind_lines k JOIN lines l ON l.id = k.line_id "
+                f"WHERE k.kind = :kind AND {condition}"
+            )
+        sql = LINE_RANGES_SQL.format(matched=matched, host_filter="AND f.host = :host" if host else "")
+        params = {"kind": kind, "pattern": param, "phrase": '"' + query.replace('"', '""') + '"', "host": host}
+
+        results: dict[str, dict[tuple[str, str], list[LineRange]]] = {}
+        for text, host_id, path, first, last, snapshots, current in self._query(sql, params):
+            results.setdefault(text, {}).setdefault((host_id, path), []).append(
+                LineRange(first, last, snapshots, bool(current))
+            )
+        return results
+
+    def paths(self, kind: str, host: str) -> list[str]:
+        sql = "SELECT DISTINCT path FROM files WHERE kind = ? AND host = ? ORDER BY path"
+        return [r[0] for r in self._query(sql, (kind, host))]
+
+    def path_entries(self, kind: str, host: str, path: str) -> list[CatalogEntry]:
+        """Every stored copy of `path` on a host, oldest first."""
+        sql = (
+            "SELECT timestamp, path, stored, size, sha256 FROM files "
+            "WHERE kind = ? AND host = ? AND path = ? ORDER BY timestamp"
+        )
+        return [CatalogEntry(*r) for r in self._query(sql, (kind, host, path))]
+
+    def entry_at(self, kind: str, host: str, path: str, timestamp: str) -> CatalogEntry | None:
+        """Newest stored copy of `path` in the snapshots up to `timestamp` (or a prefix of it)."""
+        sql = (
+            "SELECT timestamp, path, stored, size, sha256 FROM files "
+            "WHERE kind = ? AND host = ? AND path = ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 1"
+        )
+        rows = self._query(sql, (kind, host, path, timestamp + "￿"))
+        return CatalogEntry(*rows[0]) if rows else None
+
+    def path_dates(self, kind: str, host: str, path: str) -> list[str]:
+        """Timestamps of every snapshot of a host holding `path`, oldest first."""
+        sql = "SELECT timestamp FROM files WHERE kind = ? AND host = ? AND path = ? ORDER BY timestamp"
+        return [r[0] for r in self._query(sql, (kind, host, path))]
+
+    def forget_unused_contents(self) -> int:
+        """
+        Drop the line index of contents no stored file of their kind holds anymore, e.g. after a prune.
+
+        Returns:
+            int: Number of (kind, content) pairs forgotten.
+        """
+        with self.lock, self.conn:
+            unused = (
+                "NOT EXISTS (SELECT 1 FROM files f "
+                "WHERE f.sha256 = kind_contents.sha256 AND f.kind = kind_contents.kind)"
+            )
+            count = self.conn.execute(f"SELECT COUNT(*) FROM kind_contents WHERE {unused}").fetchone()[0]
+            if count:
+                self.conn.execute(f"DELETE FROM kind_contents WHERE {unused}")
+                self.conn.execute("DELETE FROM content_lines WHERE sha256 NOT IN (SELECT sha256 FROM kind_contents)")
+                self.conn.execute(
+                    "DELETE FROM kind_lines WHERE NOT EXISTS (SELECT 1 FROM content_lines c "
+                    "JOIN kind_contents k ON k.kind = kind_lines.kind AND k.sha256 = c.sha256 "
+                    "WHERE c.line_id = kind_lines.line_id)"
+                )
+                self.conn.execute("DELETE FROM lines WHERE id NOT IN (SELECT line_id FROM content_lines)")
+        return count
+
+    # --- Line lifetimes ---
+
+    def lifetime_progress(self, kind: str, host: str, path: str) -> tuple[str, int] | None:
+        """Return (last snapshot processed, number of snapshots processed) for a host path."""
+        sql = "SELECT timestamp, snapshots FROM lifetime_progress WHERE kind = ? AND host = ? AND path = ?"
+        rows = self._query(sql, (kind, host, path))
+        return rows[0] if rows else None
+
+    def reset_lifetimes(self, kind: str, host: str, path: str):
+        with self.lock, self.conn:
+            for table in ("lifetimes", "lifetime_progress"):
+                self.conn.execute(f"DELETE FROM {table} WHERE kind = ? AND host = ? AND path = ?", (kind, host, path))
+
+    def extend_lifetimes(
+        self,
+        kind: str,
+        host: str,
+        path: str,
+        previous: str | None,
+        timestamp: str,
+        hashes: set[str] | None,
+        snapshots: int
+    ):
+        """
+        Add the next snapshot of a host path to its line lifetimes.
+
+        Runs that reached `previous` and whose entry is still there are
+        extended to `timestamp`, entries without such a run start a new one,
+        and runs of entries now missing end at `previous`.
+
+        Args:
+            kind (str): Backup kind.
+            host (str): Host id.
+            path (str): Path in the snapshots.
+            previous (str | None): Snapshot of the path processed last, None for its first one.
+            timestamp (str): Snapshot to add.
+            hashes (set[str] | None): Entry hashes of the snapshot; None when its content
+                is the same as that of `previous`.
+            snapshots (int): Number of snapshots of the path processed once this one is.
+        """
+        key = (kind, host, path)
+        with self.lock, self.conn:
+            if hashes is None:
+                self.conn.execute(
+                    "UPDATE lifetimes SET last_seen = ? WHERE kind = ? AND host = ? AND path = ? AND last_seen = ?",
+                    (timestamp, *key, previous)
+                )
+            else:
+                open_runs = {
+                    r[0] for r in self.conn.execute(
+                        "SELECT entry_hash FROM lifetimes WHERE kind = ? AND host = ? AND path = ? AND last_seen = ?",
+                        (*key, previous)
+                    )
+                } if previous else set()
+                self.conn.executemany(
+                    "UPDATE lifetimes SET last_seen = ? "
+                    "WHERE kind = ? AND host = ? AND path = ? AND entry_hash = ? AND last_seen = ?",
+                    ((timestamp, *key, h, previous) for h in hashes & open_runs)
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO lifetimes VALUES (?, ?, ?, ?, ?, ?)",
+                    ((*key, h, timestamp, timestamp) for h in hashes - open_runs)
+                )
+            self.conn.execute("INSERT OR REPLACE INTO lifetime_progress VALUES (?, ?, ?, ?, ?)", (*key, timestamp, snapshots))
+
+    def lifetimes(self, kind: str, host: str, path: str, until: str) -> dict[str, list[LineLifetime]]:
+        """Return {entry hash: runs, oldest first} of a host path, for runs starting up to `until`."""
+        sql = (
+            "SELECT entry_hash, first_seen, last_seen FROM lifetimes "
+            "WHERE kind = ? AND host = ? AND path = ? AND first_seen <= ? ORDER BY entry_hash, first_seen"
+        )
+        runs: dict[str, list[LineLifetime]] = {}
+        for entry_hash, first_seen, last_seen in self._query(sql, (kind, host, path, until)):
+            runs.setdefault(entry_hash, []).append(LineLifetime(first_seen, last_seen))
+        return runs
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,13 +1,33 @@
 # vwrconf/models/Backup/cron.py
 
 import os
+import shlex
 from datetime import datetime
 from typing import List
-from vwrconf.models.SSH_Broker import SSHConnectionHandler
-from .base import Backup as BaseBackup
+from vwrconf.models.Crontab.crontab_entry import CrontabEntry
+from vwrconf.models.SSH_Broker import SSH_Broker, SSHConnectionHandler, open_handler
+from .base import Backup as BaseBackup, MANIFEST_SUFFIX, REF_SUFFIX
+from .object_store import open_stored
+
+# Exit status of CRONTAB_IF_CHANGED_SCRIPT when the crontab still hashes to $1
+CRONTAB_UNCHANGED_STATUS = 3
+
+# Prints the crontab only if its sha256 differs from the one given as $1, so an
+# unchanged crontab costs an exit status instead of its content.
+CRONTAB_IF_CHANGED_SCRIPT = r'''
+t=$(mktemp) || exit 1
+if ! crontab -l >"$t"; then rm -f "$t"; exit 1; fi
+h=$(sha256sum <"$t" 2>/dev/null | cut -d' ' -f1)
+if [ -n "$h" ] && [ "$h" = "$1" ]; then rm -f "$t"; exit 3; fi
+cat "$t"; rm -f "$t"
+'''
+
+# Path of the crontab in a snapshot manifest
+CRONTAB_ENTRY = "crontab"
 
 class CronBackup(BaseBackup):
     BASE_BACKUP_DIR = os.path.expanduser("~/.vwrconf/backups/cron")
+    KIND = "cron"
 
     def _is_readonly(self, host_id: str) -> bool:
         cli = next((c for c in self.config.clients if c.id == host_id), None)
@@ -18,7 +38,18 @@ class CronBackup(BaseBackup):
     def _get_host_backup_dir(self, host_id: str) -> str:
         return os.path.join(self.BASE_BACKUP_DIR, host_id)
 
-    def write_backup(self, host_id: str, lines: list[str]):
+    def write_backup(self, host_id: str, lines: list[str], incremental: bool = False):
+        """
+        Back up the crontab of one host over a new connection.
+
+        The crontab is streamed from the host like in `backup_hosts`, so the
+        stored bytes and their sha256 are the host's own; `lines` is unused.
+
+        Args:
+            host_id (str): Host to back up.
+            lines (list[str]): Unused, kept for the `Backup` interface.
+            incremental (bool): Only transfer the crontab if it differs from the latest backup.
+        """
         if self._is_readonly(host_id):
             print(f"[SKIP] Host '{host_id}' is readonly. Write not allowed.")
             return
@@ -30,27 +61,88 @@ class CronBackup(BaseBackup):
 
         print(f"[INFO] Connecting to host '{host_id}' to fetch crontab...")
 
-        ssh = SSHConnectionHandler(client, self.config.defaults)
+        ssh = open_handler(client, self.config.defaults)
         if not ssh.connect():
             print(f"[SKIP] Could not connect to host '{host_id}'.")
             return
 
-        stdout, stderr = ssh.run("crontab -l")
-        ssh.close()
+        try:
+            self._write_backup_from(ssh, host_id, incremental)
+        finally:
+            ssh.close()
+
+    def backup_hosts(self, host_ids: list[str], incremental: bool = False):
+        """
+        Back up several hosts in parallel through the broker fan-out, in one pass.
+
+        Each crontab is streamed from its host straight into the object
+        store, over a single connection per host.
+
+        Args:
+            host_ids (list[str]): Hosts to back up.
+            incremental (bool): Only transfer crontabs whose remote sha256 differs from
+                the latest backup; unchanged ones are stored as references.
+        """
+        clients = []
+        for host_id in host_ids:
+            if self._is_readonly(host_id):
+                print(f"[SKIP] Host '{host_id}' is readonly. Write not allowed.")
+                continue
+            clients.append(next(c for c in self.config.clients if c.id == host_id))
+
+        outcomes = SSH_Broker().fan_out(
+            clients,
+            self.config.defaults,
+            lambda ssh, client: self._write_backup_from(ssh, client.id, incremental)
+        )
+        for host_id, outcome in outcomes.items():
+            if not outcome.ok:
+                print(f"[SKIP] Could not back up host '{host_id}': {outcome.error}")
+
+    def _latest_sha256(self, host_id: str) -> tuple[str, str, str] | None:
+        """Return (timestamp, content path, sha256) of the latest backup of a host, if any."""
+        latest = self.latest_backup_filename(host_id)
+        if not latest:
+            return None
+        latest_path, sha256 = self._locate(self._get_host_backup_dir(host_id), latest)
+        return latest, latest_path, sha256 or self._file_sha256(latest_path)
+
+    def _write_backup_from(self, ssh: SSHConnectionHandler, host_id: str, incremental: bool = False):
+        timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+        host_dir = self._get_host_backup_dir(host_id)
+        os.makedirs(host_dir, exist_ok=True)
 
+        command = "crontab -l"
+        latest = self._latest_sha256(host_id) if incremental else None
+        if latest:
+            command = f"sh -c {shlex.quote(CRONTAB_IF_CHANGED_SCRIPT)} vwrconf {latest[2]}"
+
+        # Stream the crontab straight to disk (compressed if configured); the .part
+        # file only enters the store if the read succeeded
+        part_path = os.path.join(host_dir, f"{timestamp}.cron.part")
+        with self.objects.open_writer(part_path) as writer:
+            with ssh.run_stream(command, stdout_sink=writer) as result:
+                stderr = result.stderr_text()
+                unchanged = latest is not None and result.exit_status == CRONTAB_UNCHANGED_STATUS
+
+        if stderr.strip() or unchanged:
+            os.remove(part_path)
         if stderr.strip():
             print(f"[SKIP] Error retrieving crontab from '{host_id}': {stderr.strip()}")
             return
 
-        timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-        host_dir = self._get_host_backup_dir(host_id)
-        os.makedirs(host_dir, exist_ok=True)
-
-        file_path = os.path.join(host_dir, f"{timestamp}.cron")
-        with open(file_path, "w") as f:
-            f.write(stdout)
+        # Stored object and manifest listing it, with no garbage collection in between
+        with self.objects.lock.shared():
+            if unchanged:
+                latest_timestamp, latest_path, sha256 = latest
+                self.objects.import_file(latest_path, sha256)
+                self._write_manifest(host_id, timestamp, {CRONTAB_ENTRY: sha256})
+                print(f"[OK] Crontab of '{host_id}' unchanged since {latest_timestamp}, stored as reference")
+                return
 
-        print(f"[OK] Backup for host '{host_id}' written to: {file_path}")
+            sha256 = self.objects.commit(writer)
+            manifest_path = self._write_manifest(host_id, timestamp, {CRONTAB_ENTRY: sha256})
+        print(f"[OK] Backup for host '{host_id}' written to: {manifest_path}")
 
 
     def restore_backup(self, host_id: str, timestamp: str):
@@ -58,20 +150,18 @@ class CronBackup(BaseBackup):
             print(f"[SKIP] Host '{host_id}' is readonly. Restore not allowed.")
             return False
 
-        backup_path = os.path.join(self._get_host_backup_dir(host_id), f"{timestamp}.cron")
-        if not os.path.exists(backup_path):
-            print(f"[ERROR] Backup not found at: {backup_path}")
+        try:
+            content = "".join(self.read_backup_stored(host_id, timestamp))
+        except FileNotFoundError as e:
+            print(f"[ERROR] {e}")
             return False
 
-        with open(backup_path, "r") as f:
-            content = f.read()
-
         client = next((c for c in self.config.clients if c.id == host_id), None)
         if not client:
             print(f"[ERROR] Unknown host '{host_id}'.")
             return False
 
-        ssh = SSHConnectionHandler(client, self.config.defaults)
+        ssh = open_handler(client, self.config.defaults)
         if not ssh.connect():
             print(f"[ERROR] Could not connect to host '{host_id}'.")
             return False
@@ -89,28 +179,55 @@ class CronBackup(BaseBackup):
         return True
 
 
+    def _locate(self, host_dir: str, timestamp: str) -> tuple[str, str | None]:
+        """
+        Return (file holding the crontab of a backup, its sha256 if known).
+
+        Looks up the snapshot manifest first, then the .cron file or its
+        reference left by backups older than the object store.
+        """
+        timestamp = timestamp.removesuffix(".cron")
+        manifest_path = os.path.join(host_dir, timestamp + MANIFEST_SUFFIX)
+        if os.path.exists(manifest_path):
+            sha256 = self._read_manifest(manifest_path).get(CRONTAB_ENTRY)
+            if sha256:
+                return self.objects.path(sha256), sha256
+
+        name = f"{timestamp}.cron"
+        if not os.path.exists(os.path.join(host_dir, name)) and os.path.exists(os.path.join(host_dir, name + REF_SUFFIX)):
+            name += REF_SUFFIX
+        return self._resolve_stored(host_dir, name)
+
     def read_backup_stored(self, host_id: str, timestamp: str) -> list[str]:
-        file_path = os.path.join(self._get_host_backup_dir(host_id), timestamp)
+        file_path, _ = self._locate(self._get_host_backup_dir(host_id), timestamp)
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"No backup found at {file_path}")
-        with open(file_path, "r") as f:
+        with open_stored(file_path, "r") as f:
             return f.readlines()
 
 
-    def read_backup_stored_dates(self, host_id: str) -> List[str]:
+    def _make_entry(self, host_id: str, path: str, line: str) -> CrontabEntry:
+        return CrontabEntry(line, host=host_id, source="backup")
+
+    def _scan_host(self, host_id: str) -> dict[str, dict[str, tuple[str, str, str | None]]]:
         host_dir = self._get_host_backup_dir(host_id)
-        if not os.path.isdir(host_dir):
-            return []
-        return sorted(f[:-5] for f in os.listdir(host_dir) if f.endswith(".cron"))
+        snapshots = {}
+        for f in sorted(os.listdir(host_dir)):
+            if f.endswith(MANIFEST_SUFFIX):
+                sha256 = self._read_manifest(os.path.join(host_dir, f)).get(CRONTAB_ENTRY)
+                if sha256:
+                    snapshots[f.removesuffix(MANIFEST_SUFFIX)] = {CRONTAB_ENTRY: (f, self.objects.path(sha256), sha256)}
+            elif f.endswith(".cron") or f.endswith(".cron" + REF_SUFFIX):
+                timestamp = f.removesuffix(REF_SUFFIX)[:-5]
+                # A manifest of the same second wins over a pre-store file
+                snapshots.setdefault(timestamp, {CRONTAB_ENTRY: (f, *self._resolve_stored(host_dir, f))})
+        return snapshots
+
+    def read_backup_stored_dates(self, host_id: str) -> List[str]:
+        return self.catalog.dates(self.KIND, host_id)
 
     def read_backup_known_hosts(self) -> List[str]:
-        if not os.path.isdir(self.BASE_BACKUP_DIR):
-            return []
-        return sorted(d for d in os.listdir(self.BASE_BACKUP_DIR) if os.path.isdir(os.path.join(self.BASE_BACKUP_DIR, d)))
+        return self.catalog.hosts(self.KIND)
 
     def latest_backup_filename(self, host_id: str) -> str:
-        dates = self.read_backup_stored_dates(host_id)
-        if not dates:
-            return ""
-        return dates[-1]
-
+        return self.catalog.latest(self.KIND, host_id)
@@ -1,14 +1,21 @@
 #vwrconf/models/Backup/etc.py
 
 import os
-from vwrconf.models.Backup.base import Backup
-from vwrconf.models.SSH_Broker import SSHConnectionHandler
+from vwrconf.models.Backup.base import Backup, MANIFEST_SUFFIX, REF_SUFFIX
+from vwrconf.models.Backup.object_store import Location, open_stored, stored_exists, stored_size
+from vwrconf.models.Backup.pack import PACK_SUFFIX, PackWriter
+from vwrconf.models.SSH_Broker import SSH_Broker, SSHConnectionHandler, open_handler
+from vwrconf.models.config_model import Client
+from vwrconf.models.Etc.etc_entry import EtcEntry
+from vwrconf.core.batch_read import read_changed_files_to, read_files_batched_to, read_files_per_path
+from vwrconf.core.batch_restore import restore_files_streamed
+from vwrconf.core.delta_read import DELTA_MIN_SIZE, read_files_delta_to
 from datetime import datetime
-import base64
 from typing import List
 
 class EtcBackup(Backup):
     BASE_BACKUP_DIR = os.path.expanduser("~/.vwrconf/backups/etc")
+    KIND = "etc"
 
     def _is_readonly(self, host_id: str) -> bool:
         cli = next((c for c in self.config.clients if c.id == host_id), None)
@@ -19,7 +26,15 @@ class EtcBackup(Backup):
     def _get_host_backup_dir(self, host_id: str) -> str:
         return os.path.join(self.BASE_BACKUP_DIR, host_id)
 
-    def write_backup(self, host_id: str, lines: list[str], sudo_password: str | None = None):
+    def write_backup(
+        self,
+        host_id: str,
+        lines: list[str],
+        sudo_password: str | None = None,
+        batched: bool = True,
+        incremental: bool = False,
+        delta: bool = False
+    ):
         if self._is_readonly(host_id):
             print(f"[SKIP] readonly host {host_id}: write not allowed.")
             return
@@ -31,43 +46,175 @@ class EtcBackup(Backup):
 
         print(f"[INFO] Connecting to host {host_id} to fetch /etc files...")
 
-        ssh = SSHConnectionHandler(cli, self.config.defaults)
+        ssh = open_handler(cli, self.config.defaults)
         if not ssh.connect():
             print(f"[SKIP] Could not connect to host {host_id}.")
             return
 
+        self._write_backup_from(ssh, cli, lines, sudo_password, batched, incremental, delta)
+        ssh.close()
+
+    def write_backups(
+        self,
+        host_ids: list[str],
+        lines: list[str],
+        sudo_password: str | None = None,
+        batched: bool = True,
+        incremental: bool = False,
+        delta: bool = False
+    ):
+        """
+        Back up the same /etc paths from several hosts in parallel through the broker fan-out.
+
+        Args:
+            host_ids (list[str]): Hosts to back up.
+            lines (list[str]): /etc paths to fetch from every host.
+            sudo_password (str | None): Password for non-root users.
+            batched (bool): Read all paths of a host in a single remote invocation.
+            incremental (bool): Only transfer files whose remote sha256 differs from
+                their latest stored copy; unchanged files are stored as references.
+            delta (bool): Transfer only the changed blocks of large files, rebuilt
+                locally from their latest stored copy.
+        """
+        clients = []
+        for host_id in host_ids:
+            if self._is_readonly(host_id):
+                print(f"[SKIP] readonly host {host_id}: write not allowed.")
+                continue
+            clients.append(next(c for c in self.config.clients if c.id == host_id))
+
+        outcomes = SSH_Broker().fan_out(
+            clients,
+            self.config.defaults,
+            lambda ssh, cli: self._write_backup_from(ssh, cli, lines, sudo_password, batched, incremental, delta)
+        )
+        for host_id, outcome in outcomes.items():
+            if not outcome.ok:
+                print(f"[SKIP] Could not back up host {host_id}: {outcome.error}")
+
+    def _write_backup_from(
+        self,
+        ssh: SSHConnectionHandler,
+        cli: Client,
+        lines: list[str],
+        sudo_password: str | None,
+        batched: bool = True,
+        incremental: bool = False,
+        delta: bool = False
+    ):
+        host_id = cli.id
         timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
         host_dir = self._get_host_backup_dir(host_id)
         os.makedirs(host_dir, exist_ok=True)
 
         ssh_user = cli.ssh_user or self.config.defaults.ssh_user or "root"
-
-        for etc_path in lines:
-            if ssh_user != "root":
-                if sudo_password is None:
-                    print(f"[ERROR] Missing sudo password for host {host_id}.")
-                    continue
-                cmd = f"sudo -S cat {etc_path}"
-                out, err = ssh.run(cmd, input_data=sudo_password + "\n", use_pty=True)
+        if ssh_user != "root":
+            if sudo_password is None:
+                print(f"[ERROR] Missing sudo password for host {host_id}.")
+                return
+            try:
+                runner = ssh.elevated(sudo_password)
+            except PermissionError as e:
+                print(f"[ERROR] {e} on host {host_id}.")
+                return
+        else:
+            runner = ssh
+
+        file_paths = {}
+        sinks = {}
+        known = self._latest_stored_hashes(host_id, lines) if incremental or delta else {}
+        delta_bases = self.latest_stored_paths(host_id, lines, min_size=DELTA_MIN_SIZE) if delta else {}
+
+        # One pack per snapshot instead of one object per new file, unless one exists for this second
+        pack_path = os.path.join(host_dir, timestamp + PACK_SUFFIX)
+        pack = PackWriter(pack_path) if self.config.defaults.backup_packs and not os.path.exists(pack_path) else None
+
+        def open_sink(etc_path):
+            if pack is not None:
+                sinks[etc_path] = pack.open_member(etc_path)
+                return sinks[etc_path]
+            file_paths[etc_path] = os.path.join(host_dir, f"{timestamp}__{etc_path.strip('/').replace('/', '_')}.etc.part")
+            sinks[etc_path] = self.objects.open_writer(file_paths[etc_path])
+            return sinks[etc_path]
+
+        written, unchanged, errors = [], [], {}
+        remaining = lines
+        try:
+            if delta_bases:
+                written, unchanged, _ = read_files_delta_to(runner, delta_bases, open_sink)
+                # Whatever the delta transfer could not deliver is read in full
+                remaining = [p for p in lines if p not in written and p not in unchanged]
+
+            if remaining:
+                hashes = {etc_path: sha256 for etc_path, (_, sha256) in known.items()} if incremental else None
+                more_written, more_unchanged, errors = self._read_files(runner, remaining, open_sink, batched, hashes)
+                written += more_written
+                unchanged += more_unchanged
+        except BaseException:
+            if pack is not None:
+                pack.abort()
+            raise
+        finally:
+            for sink in sinks.values():
+                sink.close()
+
+        for etc_path, error in errors.items():
+            print(f"[WARN] Error reading {etc_path} from {host_id}: {error}")
+
+        # Objects first, manifest or pack index last: a snapshot never lists content that is not stored,
+        # nor one that garbage collection removed in between
+        with self.objects.lock.shared():
+            entries = {}
+            for etc_path in lines:
+                if etc_path in unchanged and etc_path in known:
+                    local_path, sha256 = known[etc_path]
+                    entries[etc_path] = self.objects.import_file(local_path, sha256)
+                    print(f"[OK] {etc_path} on {host_id} unchanged, stored as reference to {sha256[:12]}")
+                elif etc_path in written:
+                    entries[etc_path] = pack.members[etc_path].sha256 if pack is not None else self.objects.commit(sinks[etc_path])
+                    print(f"[OK] Backed up {etc_path} from {host_id} as {entries[etc_path][:12]}")
+                elif etc_path in file_paths and os.path.exists(file_paths[etc_path]):
+                    os.remove(file_paths[etc_path])
+
+            if not entries:
+                if pack is not None:
+                    pack.abort()
+                return
+            if pack is not None:
+                snapshot_path = self._write_pack(host_id, timestamp, pack, entries)
             else:
-                cmd = f"cat {etc_path}"
-                out, err = ssh.run(cmd)
-
-            if err.strip():
-                print(f"[WARN] Error reading {etc_path} from {host_id}: {err.strip()}")
-                continue
-
-            sanitized = etc_path.strip("/").replace("/", "_")
-            file_path = os.path.join(host_dir, f"{timestamp}__{sanitized}.etc")
-            with open(file_path, "w") as f:
-                f.write(out)
-
-            print(f"[OK] Backed up {etc_path} to {file_path}")
-
-        ssh.close()
-
-
-    def restore_backup(self, host_id: str, timestamp: str) -> bool:
+                snapshot_path = self._write_manifest(host_id, timestamp, entries)
+        print(f"[OK] Snapshot of {host_id} written to {snapshot_path}")
+
+    @staticmethod
+    def _read_files(runner, paths: list[str], open_sink, batched: bool, known_hashes: dict[str, str] | None):
+        """
+        Read `paths` in full into their sinks, or only the changed ones when `known_hashes` is given.
+
+        Returns:
+            tuple: (paths written, paths unchanged, {path: error message}).
+        """
+        if known_hashes is not None:
+            # One path per invocation when batching is off, so both modes compare hashes remotely
+            groups = [paths] if batched else [[etc_path] for etc_path in paths]
+            written, unchanged, errors = [], [], {}
+            for group in groups:
+                group_written, group_unchanged, group_errors = read_changed_files_to(runner, group, known_hashes, open_sink)
+                written += group_written
+                unchanged += group_unchanged
+                errors.update(group_errors)
+            return written, unchanged, errors
+
+        if batched:
+            written, errors = read_files_batched_to(runner, paths, open_sink)
+            return written, [], errors
+
+        files, errors = read_files_per_path(runner, paths)
+        for etc_path, content in files.items():
+            open_sink(etc_path).write(content)
+        return list(files), [], errors
+
+    def restore_backup(self, host_id: str, timestamp: str, sudo_password: str | None = None) -> bool:
         if self._is_readonly(host_id):
             print(f"Skipping readonly host {host_id}: restore not allowed.")
             return False
@@ -77,69 +224,129 @@ class EtcBackup(Backup):
             print(f"Skipping unknown host {host_id}.")
             return False
 
-        host_dir = self._get_host_backup_dir(host_id)
-        files = [f for f in os.listdir(host_dir) if f.startswith(timestamp) and f.endswith(".etc")]
-
-        if not files:
+        targets = self.read_backup_paths(host_id, timestamp)
+        if not targets:
             print(f"No backup files found for timestamp '{timestamp}' on host '{host_id}'")
             return False
 
-        ssh = SSHConnectionHandler(client, self.config.defaults)
+        ssh = open_handler(client, self.config.defaults)
         if not ssh.connect():
             print(f"Skipping {host_id}: SSH connection failed.")
             return False
 
-        success = True
-
-        for f in files:
-            filename = f.split("__", 1)[-1].replace(".etc", "")
-            full_path = os.path.join(host_dir, f)
-
-            with open(full_path, "rb") as fp:
-                raw = fp.read()
-            encoded = base64.b64encode(raw).decode("utf-8")
+        # All files of the snapshot travel over one channel and are renamed into place remotely
+        ssh_user = client.ssh_user or self.config.defaults.ssh_user or "root"
+        restored, errors = restore_files_streamed(
+            ssh,
+            targets,
+            use_sudo=ssh_user != "root",
+            sudo_password=sudo_password
+        )
+        ssh.close()
 
-            target_path = f"/etc/{filename}"
-            cmd = f"echo '{encoded}' | base64 -d | sudo -S -p '' tee {target_path} > /dev/null"
-            _, stderr = ssh.run(cmd, use_pty=True)
+        for target_path in restored:
+            print(f"[OK] Restored {target_path} on {host_id}")
+        for target_path, error in errors.items():
+            print(f"[WARN] Failed to restore {target_path} on {host_id}: {error}")
 
-            if stderr.strip():
-                print(f"[WARN] Failed to restore {target_path} on {host_id}: {stderr.strip()}")
-                success = False
-            else:
-                print(f"[OK] Restored {target_path} on {host_id}")
+        return not errors
 
-        ssh.close()
-        return success
+    @staticmethod
+    def _backup_name_to_path(filename: str) -> str:
+        name = filename.split("__", 1)[-1].removesuffix(REF_SUFFIX).removesuffix(".etc")
+        return "/" + name.replace("_", "/")
 
+    def _make_entry(self, host_id: str, path: str, line: str) -> EtcEntry:
+        return EtcEntry(line, host=host_id, path=path, source="backup")
 
+    def _scan_host(self, host_id: str) -> dict[str, dict[str, tuple[str, Location, str | None]]]:
+        host_dir = self._get_host_backup_dir(host_id)
+        snapshots: dict[str, dict[str, tuple[str, Location, str | None]]] = {}
+        for f in sorted(os.listdir(host_dir)):
+            if f.endswith(MANIFEST_SUFFIX):
+                entries = snapshots.setdefault(f.removesuffix(MANIFEST_SUFFIX), {})
+                for etc_path, sha256 in self._read_manifest(os.path.join(host_dir, f)).items():
+                    entries[etc_path] = (f, self.objects.path(sha256), sha256)
+            elif f.endswith(PACK_SUFFIX):
+                entries = snapshots.setdefault(f.removesuffix(PACK_SUFFIX), {})
+                for etc_path, (location, sha256) in self._pack_locations(os.path.join(host_dir, f)).items():
+                    entries[etc_path] = (f, location, sha256)
+            elif f.endswith(".etc") or f.endswith(".etc" + REF_SUFFIX):
+                entries = snapshots.setdefault(f.split("__")[0], {})
+                entries.setdefault(self._backup_name_to_path(f), (f, *self._resolve_stored(host_dir, f)))
+        return snapshots
+
+    def _snapshot_files(self, host_id: str, timestamp: str) -> dict[str, tuple[Location, str | None]]:
+        # Oldest first, so a path present in several matching snapshots resolves to the newest
+        return {
+            entry.path: self._locate_entry(host_id, entry)
+            for entry in self.catalog.snapshot(self.KIND, host_id, timestamp)
+        }
+
+    def _latest_stored_entries(self, host_id: str, etc_paths: list[str]) -> dict[str, tuple[Location, str | None]]:
+        """Return {etc path: (content location, sha256 if known)} of the most recent backup of each path."""
+        return {
+            etc_path: self._locate_entry(host_id, entry)
+            for etc_path, entry in self.catalog.latest_entries(self.KIND, host_id, etc_paths).items()
+        }
+
+    def _latest_stored_hashes(self, host_id: str, etc_paths: list[str]) -> dict[str, tuple[Location, str]]:
+        """
+        Find the most recent stored copy of each path.
+
+        Returns:
+            dict: {etc path: (content location, sha256)} for paths backed up before.
+        """
+        known = {}
+        for etc_path, (local_path, sha256) in self._latest_stored_entries(host_id, etc_paths).items():
+            try:
+                known[etc_path] = (local_path, sha256 or self._file_sha256(local_path))
+            except OSError:
+                continue
+        return known
+
+    def latest_stored_paths(self, host_id: str, etc_paths: list[str], min_size: int = 0) -> dict[str, Location]:
+        """
+        Map each path to the location of its most recent backed up content.
+
+        Paths never backed up, or whose copy is smaller than `min_size` bytes, are left out.
+        """
+        paths = {}
+        for etc_path, entry in self.catalog.latest_entries(self.KIND, host_id, etc_paths).items():
+            local_path, _ = self._locate_entry(host_id, entry)
+            if not stored_exists(local_path):
+                continue
+            # The catalog knows the uncompressed size, so compressed copies need not be read
+            size = entry.size if entry.size is not None else stored_size(local_path)
+            if size >= min_size:
+                paths[etc_path] = local_path
+        return paths
+
+    def read_backup_paths(self, host_id: str, timestamp: str) -> dict[str, Location]:
+        """
+        Map each /etc path of a snapshot to the location of its content.
+
+        Manifests, packs and references are followed, so callers only see content
+        files or pack members, both readable with `open_stored`.
+        """
+        return {etc_path: local_path for etc_path, (local_path, _) in self._snapshot_files(host_id, timestamp).items()}
+
+    def read_backup_files(self, host_id: str, timestamp: str) -> dict[str, str]:
+        """Return {etc path: content} for a stored snapshot."""
+        files = {}
+        for etc_path, local_path in self.read_backup_paths(host_id, timestamp).items():
+            with open_stored(local_path, "r") as fp:
+                files[etc_path] = fp.read()
+        return files
 
     def read_backup_stored(self, host_id: str, timestamp: str) -> list[str]:
-        host_dir = self._get_host_backup_dir(host_id)
-        files = sorted(
-            f for f in os.listdir(host_dir)
-            if f.startswith(timestamp) and f.endswith(".etc")
-        )
-        output = []
-        for f in files:
-            with open(os.path.join(host_dir, f), "r") as fp:
-                output.append(fp.read())
-        return output
+        return list(self.read_backup_files(host_id, timestamp).values())
 
     def read_backup_stored_dates(self, host_id: str) -> List[str]:
-        host_dir = self._get_host_backup_dir(host_id)
-        if not os.path.isdir(host_dir):
-            return []
-        timestamps = set(f.split("__")[0] for f in os.listdir(host_dir) if f.endswith(".etc"))
-        return sorted(timestamps)
+        return self.catalog.dates(self.KIND, host_id)
 
     def read_backup_known_hosts(self) -> List[str]:
-        if not os.path.isdir(self.BASE_BACKUP_DIR):
-            return []
-        return sorted(d for d in os.listdir(self.BASE_BACKUP_DIR) if os.path.isdir(os.path.join(self.BASE_BACKUP_DIR, d)))
+        return self.catalog.hosts(self.KIND)
 
     def latest_backup_filename(self, host_id: str) -> str:
-        dates = self.read_backup_stored_dates(host_id)
-        if not dates:
-            return ""
-        return dates[-1]
+        return self.catalog.latest(self.KIND, host_id)
@@ -0,0 +1,64 @@
+# vwrconf/models/Backup/history.py
+
+from typing import Callable
+from vwrconf.models.Backup.catalog import Catalog, CatalogEntry, LineRange
+from vwrconf.models.Backup.object_store import Location, read_lines, stored_exists
+
+# (host id, catalog entry) -> (location of the content, sha256 if known), e.g. Backup._locate_entry
+Locator = Callable[[str, CatalogEntry], tuple[Location, str | None]]
+
+def content_lines(location: Location) -> set[str]:
+    """Distinct non-blank lines of a stored file, none for binary content."""
+    return {line for line in read_lines(location) or [] if line.strip()}
+
+def index_contents(catalog: Catalog, kind: str, locate: Locator) -> int:
+    """
+    Index the lines of the contents of a backup kind stored since the last update.
+
+    Args:
+        catalog (Catalog): Catalog holding the line index.
+        kind (str): Backup kind, e.g. "cron".
+        locate (Locator): Finds the stored content of a catalog entry.
+
+    Returns:
+        int: Number of contents indexed.
+    """
+    count = 0
+    for sha256, (host_id, entry) in catalog.unindexed_contents(kind).items():
+        location, _ = locate(host_id, entry)
+        if not stored_exists(location):
+            continue
+        catalog.index_content(kind, sha256, content_lines(location))
+        count += 1
+    return count
+
+def line_history(
+    catalog: Catalog,
+    kind: str,
+    query: str,
+    regex: bool = False,
+    ignore_case: bool = False,
+    host_id: str | None = None
+) -> dict[str, dict[tuple[str, str], list[LineRange]]]:
+    """
+    Search the line index for every line ever backed up, across all hosts and snapshots of a kind.
+
+    Only indexed contents are searched, see `index_contents`. Lines are
+    looked up and collapsed into snapshot ranges by the catalog, see
+    `Catalog.search_lines`.
+
+    Args:
+        catalog (Catalog): Catalog holding the line index.
+        kind (str): Backup kind, e.g. "cron".
+        query (str): Substring to look for, or regular expression with `regex`.
+        regex (bool): Treat `query` as a regular expression.
+        ignore_case (bool): Case-insensitive matching.
+        host_id (str | None): Only search the backups of this host.
+
+    Returns:
+        dict: {line: {(host, path): [LineRange, ...]}}, lines in sorted order.
+
+    Raises:
+        re.error: If `query` is not a valid regular expression.
+    """
+    return catalog.search_lines(kind, query, regex, ignore_case, host_id)
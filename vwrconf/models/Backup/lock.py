@@ -0,0 +1,86 @@
+# vwrconf/models/Backup/lock.py
+
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+# Lock file in the backup root, next to the object store and the catalog
+LOCK_NAME = ".lock"
+
+_LOCKS: dict[str, "BackupLock"] = {}
+_LOCKS_GUARD = threading.Lock()
+
+class BackupLock:
+    """
+    Lock of a backup root, between backups and garbage collection.
+
+    Backups hold it shared from storing their objects until the snapshot
+    listing them is written; collecting garbage holds it exclusive, so it
+    never sees an object that is being reused as unreferenced. It is an
+    `flock` on a file of the root, taken once per process: threads and
+    nested calls share it, and shared sections inside the exclusive one
+    (pruning rewrites manifests) run without waiting for themselves.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._condition = threading.Condition()
+        self._fd: int | None = None
+        self._shared = 0
+        self._owner: int | None = None
+
+    def _acquire(self, operation: int):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, operation)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _release(self):
+        os.close(self._fd)
+        self._fd = None
+        self._condition.notify_all()
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Hold the lock shared, waiting for a garbage collection to finish."""
+        with self._condition:
+            nested = self._owner == threading.get_ident()
+            if not nested:
+                self._condition.wait_for(lambda: self._owner is None)
+                if not self._shared:
+                    self._acquire(fcntl.LOCK_SH)
+                self._shared += 1
+        try:
+            yield
+        finally:
+            if not nested:
+                with self._condition:
+                    self._shared -= 1
+                    if not self._shared:
+                        self._release()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the lock exclusive, waiting for backups in progress to finish."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._owner is None and not self._shared)
+            self._acquire(fcntl.LOCK_EX)
+            self._owner = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._owner = None
+                self._release()
+
+def backup_lock(backups_root: str) -> BackupLock:
+    """Return the lock of a backup root, the same object for every store of this process using it."""
+    path = os.path.join(os.path.abspath(backups_root), LOCK_NAME)
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(path, BackupLock(path))
@@ -0,0 +1,18 @@
+# vwrconf/models/Backup/manifest.py
+
+MANIFEST_SUFFIX = ".manifest"
+
+def read_manifest(manifest_path: str) -> dict[str, str]:
+    """
+    Return {path: sha256} of a snapshot manifest.
+
+    A manifest holds one "<sha256> <path>" line per file of the snapshot;
+    the content of each file lives in the object store under its hash.
+    """
+    entries = {}
+    with open(manifest_path) as f:
+        for line in f:
+            sha256, _, path = line.rstrip("\n").partition(" ")
+            if path:
+                entries[path] = sha256
+    return entries
@@ -0,0 +1,254 @@
+# vwrconf/models/Backup/object_store.py
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import struct
+from typing import IO
+from vwrconf.models.Backup.lock import backup_lock
+from vwrconf.models.Backup.pack import PackMember, open_member
+
+# A stored file: a path, or a file inside a snapshot pack
+Location = str | PackMember
+
+# Storage format of an object, recorded as the suffix of its file name
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+CHUNK_SIZE = 65536
+
+def _zstd():
+    """Import the optional `zstandard` package, only needed for zstd objects."""
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd backup compression needs the 'zstandard' package: pip install zstandard") from None
+    return zstandard
+
+def zstd_available() -> bool:
+    try:
+        _zstd()
+    except RuntimeError:
+        return False
+    return True
+
+def stored_compression(path: Location) -> str | None:
+    """Return the compression of a stored file from its name, None for plain files and pack members."""
+    if isinstance(path, PackMember):
+        return None
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and path.endswith(suffix):
+            return compression
+    return None
+
+def stored_exists(path: Location) -> bool:
+    return os.path.isfile(path.pack_path if isinstance(path, PackMember) else path)
+
+def open_stored(path: Location, mode: str = "rb") -> IO:
+    """
+    Open a stored file for reading, decompressing it as it is read.
+
+    Plain files (every backup written before compression existed) open as
+    they are, and pack members are read from a memory map of their pack,
+    so callers never need to know how a file was stored.
+
+    Args:
+        path (Location): Object, pre-store backup file or pack member.
+        mode (str): "rb" for bytes or "r" for text.
+    """
+    if isinstance(path, PackMember):
+        stream = open_member(path)
+        return io.TextIOWrapper(stream) if mode == "r" else stream
+    compression = stored_compression(path)
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        stream = gzip.open(path, "rb")
+    else:
+        stream = io.BufferedReader(_zstd().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return io.TextIOWrapper(stream) if mode == "r" else stream
+
+def stored_size(path: Location) -> int:
+    """Size of the content of a stored file, once decompressed."""
+    if isinstance(path, PackMember):
+        return path.length
+    compression = stored_compression(path)
+    if compression is None:
+        return os.path.getsize(path)
+    if compression == "gzip":
+        # Trailer of the (single member) gzip file: uncompressed size mod 2^32
+        with open(path, "rb") as f:
+            f.seek(-4, io.SEEK_END)
+            return struct.unpack("<I", f.read(4))[0]
+    size = 0
+    with open_stored(path) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            size += len(chunk)
+    return size
+
+def read_lines(path: Location) -> list[str] | None:
+    """Lines of a stored file without their line breaks, None for binary content."""
+    lines = []
+    with open_stored(path) as f:
+        for raw in f:
+            if b"\0" in raw:
+                return None
+            lines.append(raw.rstrip(b"\r\n").decode(errors="replace"))
+    return lines
+
+def file_sha256(path: Location) -> str:
+    digest = hashlib.sha256()
+    with open_stored(path) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ObjectWriter:
+    """
+    Binary sink that hashes content and compresses it on its way to disk.
+
+    Handed out by `ObjectStore.open_writer` wherever a download used to be
+    written to a plain `.part` file; `ObjectStore.commit` then moves it into
+    the store under its sha256, so content is written once, compressed.
+    """
+
+    def __init__(self, path: str, compression: str | None):
+        self.path = path
+        self.compression = compression
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.raw = open(path, "wb")
+        if compression == "gzip":
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=6, mtime=0)
+        elif compression == "zstd":
+            self.stream = _zstd().ZstdCompressor(level=3).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+
+    @property
+    def sha256(self) -> str:
+        return self.digest.hexdigest()
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        self.stream.write(data)
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        if self.raw.closed:
+            return
+        if self.stream is not self.raw:
+            self.stream.close()
+        self.raw.close()
+
+    def __enter__(self) -> "ObjectWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ObjectStore:
+    """
+    Content-addressed blob store shared by every host, snapshot and backup kind.
+
+    Each distinct content is stored once, as `<root>/<sha256[:2]>/<sha256>`
+    plus `.gz` or `.zst` when compressed; the hash is always that of the
+    uncompressed content. Blobs are immutable: a snapshot references them by
+    hash from its manifest, so identical files across hosts and over time
+    cost one copy. `compression` only applies to new objects, objects of any
+    format read the same. Storing holds the lock of the backup root
+    (`lock`) shared, so garbage collection never runs in between.
+    """
+
+    def __init__(self, root: str, compression: str | None = None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown backup compression '{compression}'")
+        self.root = root
+        self.compression = compression
+        self.lock = backup_lock(os.path.dirname(root))
+        # Content sizes of objects written by this process, so cataloging them needs no decompression
+        self.sizes: dict[str, int] = {}
+
+    def _base_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def path(self, sha256: str) -> str:
+        """Return the file of an object, whatever its format; the plain path if it is not stored."""
+        base = self._base_path(sha256)
+        for suffix in COMPRESSION_SUFFIXES.values():
+            if os.path.exists(base + suffix):
+                return base + suffix
+        return base
+
+    def has(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def size(self, sha256: str) -> int:
+        if sha256 not in self.sizes:
+            self.sizes[sha256] = stored_size(self.path(sha256))
+        return self.sizes[sha256]
+
+    def open_writer(self, part_path: str) -> ObjectWriter:
+        """Open a `.part` file to stream new content into, in the store's compression."""
+        return ObjectWriter(part_path, self.compression)
+
+    def commit(self, writer: ObjectWriter) -> str:
+        """
+        Move the content of a closed writer into the store, or drop it if already there.
+
+        Returns:
+            str: sha256 of the content.
+        """
+        writer.close()
+        self.sizes[writer.sha256] = writer.size
+        with self.lock.shared():
+            return self._store(writer.path, writer.sha256, writer.compression)
+
+    def add_file(self, src_path: str, sha256: str | None = None) -> str:
+        """
+        Move a freshly written plain file into the store, or drop it if its content is already there.
+
+        The source is consumed either way. Without compression moving is a
+        rename within the backup tree, so new content is written to disk
+        exactly once.
+
+        Args:
+            src_path (str): File to store, e.g. a completed `.part` download.
+            sha256 (str | None): Its hash if already known.
+
+        Returns:
+            str: sha256 of the content.
+        """
+        sha256 = sha256 or file_sha256(src_path)
+        with self.lock.shared():
+            if self.compression is None or self.has(sha256):
+                return self._store(src_path, sha256, None)
+        with open(src_path, "rb") as src, self.open_writer(src_path + ".z") as writer:
+            shutil.copyfileobj(src, writer, CHUNK_SIZE)
+        os.remove(src_path)
+        return self.commit(writer)
+
+    def _store(self, src_path: str, sha256: str, compression: str | None) -> str:
+        if self.has(sha256):
+            os.remove(src_path)
+            return sha256
+        target = self._base_path(sha256) + COMPRESSION_SUFFIXES[compression]
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Concurrent writers of the same content replace each other with identical bytes
+        os.replace(src_path, target)
+        return sha256
+
+    def import_file(self, src_path: Location, sha256: str) -> str:
+        """Copy content kept outside the store (a pre-store backup or pack member) into it, leaving the source alone."""
+        with self.lock.shared():
+            if self.has(sha256):
+                return sha256
+            part_path = self._base_path(sha256) + ".part"
+            os.makedirs(os.path.dirname(part_path), exist_ok=True)
+            with open_stored(src_path) as src, self.open_writer(part_path) as writer:
+                shutil.copyfileobj(src, writer, CHUNK_SIZE)
+            return self.commit(writer)
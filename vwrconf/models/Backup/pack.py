@@ -0,0 +1,165 @@
+# vwrconf/models/Backup/pack.py
+
+import hashlib
+import io
+import mmap
+import os
+import struct
+from typing import IO, NamedTuple
+
+PACK_SUFFIX = ".pack"
+PACK_MAGIC = b"VWRPACK1"
+# Last bytes of a pack: offset of its index, then the magic
+TRAILER = struct.Struct(">Q8s")
+
+class PackEntry(NamedTuple):
+    sha256: str
+    offset: int | None  # None when the content lives in the object store
+    length: int
+
+class PackMember(NamedTuple):
+    """Location of a file stored inside a pack, accepted wherever a stored file path is."""
+    pack_path: str
+    offset: int
+    length: int
+
+def read_pack_index(pack_path: str) -> dict[str, PackEntry]:
+    """
+    Read the index of a pack without touching its data.
+
+    Pack layout: the content of every member back to back, then one
+    "<sha256> <offset> <length> <path>" line per file ("-" as offset for
+    files kept in the object store), then TRAILER.
+
+    Returns:
+        dict[str, PackEntry]: {path: entry} of every file of the snapshot.
+
+    Raises:
+        ValueError: If the file is not a pack.
+    """
+    with open(pack_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < TRAILER.size:
+            raise ValueError(f"Not a vwrconf pack: {pack_path}")
+        index_offset, magic = TRAILER.unpack(mapped[-TRAILER.size:])
+        if magic != PACK_MAGIC:
+            raise ValueError(f"Not a vwrconf pack: {pack_path}")
+        index = mapped[index_offset:len(mapped) - TRAILER.size].decode()
+
+    entries = {}
+    for line in index.splitlines():
+        sha256, offset, length, path = line.split(" ", 3)
+        entries[path] = PackEntry(sha256, None if offset == "-" else int(offset), int(length))
+    return entries
+
+class _MemberReader(io.RawIOBase):
+    """Seekable reader over one member of a memory-mapped pack; only the pages read are loaded."""
+
+    def __init__(self, member: PackMember):
+        self._file = open(member.pack_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._start = member.offset
+        self._end = member.offset + member.length
+        self._pos = self._start
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self._end - self._pos)
+        buffer[:count] = self._map[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: self._start, io.SEEK_CUR: self._pos, io.SEEK_END: self._end}[whence]
+        self._pos = min(max(self._start, base + offset), self._end)
+        return self._pos - self._start
+
+    def tell(self) -> int:
+        return self._pos - self._start
+
+    def close(self):
+        if not self.closed:
+            self._map.close()
+            self._file.close()
+        super().close()
+
+def open_member(member: PackMember) -> IO[bytes]:
+    return io.BufferedReader(_MemberReader(member))
+
+class _MemberWriter:
+    """Sink of the member being written; the pack records its entry on close."""
+
+    def __init__(self, pack: "PackWriter", path: str):
+        self.pack = pack
+        self.path = path
+        self.offset = pack.file.tell()
+        self.length = 0
+        self.digest = hashlib.sha256()
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        if self.closed or self.pack.current is not self:
+            raise ValueError(f"Pack member {self.path} written after the next member was opened")
+        self.digest.update(data)
+        self.length += len(data)
+        self.pack.file.write(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.pack.members[self.path] = PackEntry(self.digest.hexdigest(), self.offset, self.length)
+
+class PackWriter:
+    """
+    Writes the new files of one snapshot into a single pack, member after member.
+
+    Members stream straight into `<pack>.part` and are hashed on the way;
+    the index goes last, so the pack is written in one pass. Members are
+    kept uncompressed, so readers can slice them out of a memory map.
+    """
+
+    def __init__(self, pack_path: str):
+        self.pack_path = pack_path
+        self.part_path = pack_path + ".part"
+        self.file = open(self.part_path, "wb")
+        self.members: dict[str, PackEntry] = {}
+        self.current: _MemberWriter | None = None
+
+    def open_member(self, path: str) -> _MemberWriter:
+        if self.current is not None:
+            self.current.close()
+        self.current = _MemberWriter(self, path)
+        return self.current
+
+    def finish(self, entries: dict[str, PackEntry]) -> str:
+        """
+        Write the index of `entries` and move the pack into place.
+
+        Members left out (e.g. reads that failed halfway) stay as dead bytes.
+
+        Returns:
+            str: Path of the pack.
+        """
+        if self.current is not None:
+            self.current.close()
+        index_offset = self.file.tell()
+        for path, entry in entries.items():
+            offset = "-" if entry.offset is None else entry.offset
+            self.file.write(f"{entry.sha256} {offset} {entry.length} {path}\n".encode())
+        self.file.write(TRAILER.pack(index_offset, PACK_MAGIC))
+        self.file.close()
+        os.replace(self.part_path, self.pack_path)
+        return self.pack_path
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
@@ -0,0 +1,209 @@
+# vwrconf/models/Backup/prune.py
+
+import os
+import time
+from vwrconf.models.config_model import RetentionPolicy
+from vwrconf.models.SSH_Transport import format_bytes
+from vwrconf.models.Backup.catalog import CatalogEntry
+from vwrconf.models.Backup.manifest import MANIFEST_SUFFIX, read_manifest
+from vwrconf.models.Backup.object_store import COMPRESSION_SUFFIXES, ObjectStore, file_sha256, stored_exists
+from vwrconf.models.Backup.pack import PACK_SUFFIX, read_pack_index
+from vwrconf.models.Backup.retention import select_snapshots
+
+# .part files older than this are leftovers of interrupted runs
+STALE_PART_SECONDS = 24 * 3600
+
+def prune_backups(backup, host_ids: list[str] | None = None, dry_run: bool = False) -> int:
+    """
+    Apply the retention policies of the config to a backup kind, then drop objects no snapshot uses anymore.
+
+    Hosts are compacted first: backups written before the object store
+    are merged into one manifest per snapshot, so pruning never breaks a
+    `.ref` pointing into a pruned snapshot. The newest copy of every path
+    is kept even when its snapshot is pruned, by cutting that snapshot
+    down to those paths. Hosts without a policy are left alone. Runs
+    under the exclusive lock of the backup root, see `collect_garbage`.
+
+    Args:
+        backup (Backup): Backup kind to prune.
+        host_ids (list[str] | None): Hosts to prune, every host with backups if None.
+        dry_run (bool): Only report what would be removed.
+
+    Returns:
+        int: Number of snapshots removed, or that would be.
+    """
+    clients = {c.id: c for c in backup.config.clients}
+    removed = 0
+    # Snapshot path without suffix -> entries it will have, None once deleted; lets a dry run count garbage
+    planned: dict[str, dict[str, str] | None] = {}
+    # Backups in progress finish first, new ones wait until the garbage is gone
+    with backup.objects.lock.exclusive():
+        for host_id in host_ids if host_ids is not None else backup.read_backup_known_hosts():
+            policy = backup.config.defaults.retention_policy(clients.get(host_id))
+            if policy is None:
+                print(f"[SKIP] No retention policy for host '{host_id}'")
+                continue
+            compact_host(backup, host_id, dry_run)
+            removed += prune_host(backup, host_id, policy, dry_run, planned)
+        collect_garbage(os.path.dirname(backup.BASE_BACKUP_DIR), backup.objects, planned, dry_run)
+        if not dry_run:
+            backup.catalog.forget_unused_contents()
+    return removed
+
+def prune_host(backup, host_id: str, policy: RetentionPolicy, dry_run: bool, planned: dict) -> int:
+    """
+    Remove the snapshots of a host its retention policy does not keep.
+
+    Args:
+        backup (Backup): Backup kind holding the snapshots.
+        host_id (str): Host to prune.
+        policy (RetentionPolicy): Rules to apply.
+        dry_run (bool): Only report what would be removed.
+        planned (dict): Filled with {snapshot path without suffix: entries it keeps, None if removed}.
+
+    Returns:
+        int: Number of snapshots removed, or that would be.
+    """
+    catalog, kind = backup.catalog, backup.KIND
+    snapshots: dict[str, dict[str, str | None]] = {}
+    catalog_entries: dict[str, dict[str, CatalogEntry]] = {}
+    for entry in catalog.snapshot(kind, host_id, ""):
+        snapshots.setdefault(entry.timestamp, {})[entry.path] = entry.sha256
+        catalog_entries.setdefault(entry.timestamp, {})[entry.path] = entry
+    kept = select_snapshots(snapshots, policy)
+
+    # Newest snapshot holding each path; sparse /etc histories keep their last copy
+    newest = {}
+    for timestamp in sorted(snapshots):
+        for path in snapshots[timestamp]:
+            newest[path] = timestamp
+
+    host_dir = backup._get_host_backup_dir(host_id)
+    removed, trimmed = 0, 0
+    for timestamp in sorted(set(snapshots) - set(kept)):
+        last_copies = {p: sha for p, sha in snapshots[timestamp].items() if newest[p] == timestamp}
+        if last_copies == snapshots[timestamp]:
+            # Already holds nothing but last copies
+            continue
+        snapshot_base = os.path.join(host_dir, timestamp)
+        planned[snapshot_base] = last_copies or None
+        if last_copies:
+            trimmed += 1
+            if dry_run:
+                print(f"  ~ {timestamp} (kept for the last copy of {', '.join(sorted(last_copies))})")
+                continue
+            # Contents kept from a pack move to the object store, the cut down snapshot is a manifest
+            for path in last_copies:
+                backup.objects.import_file(*backup._locate_entry(host_id, catalog_entries[timestamp][path]))
+            backup._write_manifest(host_id, timestamp, last_copies, merge=False)
+            if os.path.exists(snapshot_base + PACK_SUFFIX):
+                os.remove(snapshot_base + PACK_SUFFIX)
+            continue
+
+        removed += 1
+        if dry_run:
+            print(f"  - {timestamp}")
+            continue
+        for suffix in (MANIFEST_SUFFIX, PACK_SUFFIX):
+            if os.path.exists(snapshot_base + suffix):
+                os.remove(snapshot_base + suffix)
+        catalog.replace_snapshot(kind, host_id, timestamp, [])
+
+    verb = "Would prune" if dry_run else "Pruned"
+    print(
+        f"[{'DRY-RUN' if dry_run else 'OK'}] {verb} {removed} of {len(snapshots)} {kind} snapshot(s) "
+        f"of '{host_id}'" + (f", {trimmed} cut down to their last copies" if trimmed else "")
+    )
+    return removed
+
+def compact_host(backup, host_id: str, dry_run: bool):
+    """Merge the pre-store files of a host into manifests and objects, and drop stale .part files."""
+    host_dir = backup._get_host_backup_dir(host_id)
+    if not dry_run and os.path.isdir(host_dir):
+        cutoff = time.time() - STALE_PART_SECONDS
+        for f in os.listdir(host_dir):
+            if f.endswith(".part") and os.path.getmtime(os.path.join(host_dir, f)) < cutoff:
+                os.remove(os.path.join(host_dir, f))
+
+    legacy = [
+        e for e in backup.catalog.snapshot(backup.KIND, host_id, "")
+        if not e.stored.endswith((MANIFEST_SUFFIX, PACK_SUFFIX))
+    ]
+    if not legacy:
+        return
+    timestamps = {e.timestamp for e in legacy}
+    if dry_run:
+        print(f"[DRY-RUN] Would merge {len(legacy)} pre-store file(s) of '{host_id}' into {len(timestamps)} manifest(s)")
+        return
+
+    snapshots: dict[str, dict[str, str]] = {}
+    for entry in legacy:
+        local_path, sha256 = backup._locate_entry(host_id, entry)
+        if not stored_exists(local_path):
+            print(f"[WARN] Missing content {local_path} of {entry.path} in snapshot {entry.timestamp} of '{host_id}'")
+            continue
+        sha256 = sha256 or file_sha256(local_path)
+        snapshots.setdefault(entry.timestamp, {})[entry.path] = backup.objects.import_file(local_path, sha256)
+    for timestamp, entries in snapshots.items():
+        backup._write_manifest(host_id, timestamp, entries)
+    # Only once every snapshot is in the store: references point across snapshots
+    for name in {e.stored for e in legacy}:
+        if os.path.exists(os.path.join(host_dir, name)):
+            os.remove(os.path.join(host_dir, name))
+    print(f"[OK] Merged {len(legacy)} pre-store file(s) of '{host_id}' into {len(snapshots)} manifest(s)")
+
+def collect_garbage(backups_root: str, objects: ObjectStore, planned: dict[str, dict[str, str] | None], dry_run: bool):
+    """
+    Remove objects no manifest or pack of any backup kind references.
+
+    Snapshots on disk are the source of truth here, not the catalog, so
+    a backup kind that was never indexed cannot lose its objects. The
+    caller holds `objects.lock` exclusive, as `prune_backups` does: a
+    backup reusing an object this pass is about to remove would be left
+    pointing at nothing.
+
+    Args:
+        backups_root (str): Directory holding one directory per backup kind and the object store.
+        objects (ObjectStore): Store to collect.
+        planned (dict): Snapshots a dry run would change, see `prune_host`.
+        dry_run (bool): Only report what would be removed.
+    """
+    objects_root = objects.root
+    referenced = set()
+    for kind in os.listdir(backups_root) if os.path.isdir(backups_root) else []:
+        kind_dir = os.path.join(backups_root, kind)
+        if kind_dir == objects_root or not os.path.isdir(kind_dir):
+            continue
+        for host_id in os.listdir(kind_dir):
+            host_dir = os.path.join(kind_dir, host_id)
+            if not os.path.isdir(host_dir):
+                continue
+            for f in os.listdir(host_dir):
+                snapshot_path = os.path.join(host_dir, f)
+                snapshot_base = os.path.join(host_dir, f.split(".")[0])
+                if snapshot_base in planned:
+                    referenced.update((planned[snapshot_base] or {}).values())
+                elif f.endswith(MANIFEST_SUFFIX):
+                    referenced.update(read_manifest(snapshot_path).values())
+                elif f.endswith(PACK_SUFFIX):
+                    # Files inside the pack are not objects; unchanged files it lists are
+                    referenced.update(e.sha256 for e in read_pack_index(snapshot_path).values() if e.offset is None)
+
+    count, freed = 0, 0
+    for prefix in os.listdir(objects_root) if os.path.isdir(objects_root) else []:
+        prefix_dir = os.path.join(objects_root, prefix)
+        for name in os.listdir(prefix_dir):
+            sha256 = name
+            for suffix in COMPRESSION_SUFFIXES.values():
+                if suffix and name.endswith(suffix):
+                    sha256 = name.removesuffix(suffix)
+            if name.endswith(".part") or sha256 in referenced:
+                continue
+            object_path = os.path.join(prefix_dir, name)
+            count += 1
+            freed += os.path.getsize(object_path)
+            if not dry_run:
+                os.remove(object_path)
+
+    verb = "Would remove" if dry_run else "Removed"
+    print(f"[{'DRY-RUN' if dry_run else 'OK'}] {verb} {count} unreferenced object(s), {format_bytes(freed)}")
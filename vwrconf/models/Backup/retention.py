@@ -0,0 +1,75 @@
+# vwrconf/models/Backup/retention.py
+
+from datetime import datetime
+from vwrconf.models.config_model import RetentionPolicy
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H-%M-%S"
+
+# Calendar period of each grandfather-father-son rule
+GFS_PERIODS = {
+    "keep_daily": lambda when: when.strftime("%Y-%m-%d"),
+    "keep_weekly": lambda when: "%d-W%02d" % when.isocalendar()[:2],
+    "keep_monthly": lambda when: when.strftime("%Y-%m"),
+    "keep_yearly": lambda when: when.strftime("%Y"),
+}
+
+def parse_timestamp(timestamp: str) -> datetime | None:
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+def select_snapshots(snapshots: dict[str, dict[str, str | None]], policy: RetentionPolicy) -> dict[str, list[str]]:
+    """
+    Decide which snapshots of a host a retention policy keeps.
+
+    Rules add up: a snapshot is kept if any rule selects it, and the latest
+    snapshot is always kept. A policy without any rule keeps everything.
+
+    Args:
+        snapshots (dict): {timestamp: {path: sha256}} of every snapshot of the host.
+        policy (RetentionPolicy): Rules to apply.
+
+    Returns:
+        dict[str, list[str]]: {timestamp: names of the rules keeping it}; snapshots
+        left out may be pruned.
+    """
+    newest_first = sorted(snapshots, reverse=True)
+    kept: dict[str, list[str]] = {}
+
+    def keep(timestamp: str, reason: str):
+        kept.setdefault(timestamp, []).append(reason)
+
+    rules = [policy.keep_last, *(getattr(policy, rule) for rule in GFS_PERIODS), policy.keep_if_changed]
+    if not any(rules):
+        return {timestamp: ["no rules"] for timestamp in newest_first}
+
+    if newest_first:
+        keep(newest_first[0], "latest")
+    for timestamp in newest_first[:policy.keep_last or 0]:
+        keep(timestamp, "last")
+
+    # Newest snapshot of each period, for the N most recent periods that have one
+    for rule, period_of in GFS_PERIODS.items():
+        count = getattr(policy, rule)
+        if not count:
+            continue
+        periods = set()
+        for timestamp in newest_first:
+            when = parse_timestamp(timestamp)
+            if when is None or period_of(when) in periods:
+                continue
+            periods.add(period_of(when))
+            if len(periods) > count:
+                break
+            keep(timestamp, rule.removeprefix("keep_"))
+
+    if policy.keep_if_changed:
+        # A snapshot changed something if one of its files differs from that file's previous copy
+        last_seen: dict[str, str | None] = {}
+        for timestamp in reversed(newest_first):
+            entries = snapshots[timestamp]
+            if any(path not in last_seen or last_seen[path] != sha256 for path, sha256 in entries.items()):
+                keep(timestamp, "changed")
+            last_seen.update(entries)
+    return kept
@@ -1,40 +1,42 @@
 # vwrconf/models/Crontab/crontab.py
 
-from vwrconf.models.SSH_Broker import RemoteCommandProxy, SSH_Broker
-from vwrconf.models.config_model import Config
+from vwrconf.models.SSH_Broker import SSH_Broker, SSHConnectionHandler, run_sync
+from vwrconf.models.config_model import Client, Config
 
 class Crontab:
     """
-    Retrieves crontab entries from a list of configured remote hosts using a proxy.
+    Retrieves crontab entries from a list of configured remote hosts using the broker.
 
-    The RemoteCommandProxy handles connection and command execution, abstracting
-    away SSH logic. Results are returned as a dictionary mapping host IDs to 
-    crontab lines.
+    The SSH_Broker fans the command out to every host in parallel and handles
+    connection setup and teardown, abstracting away SSH logic. Results are
+    returned as a dictionary mapping host IDs to crontab lines.
+
+    `fetch_async` runs on the caller's event loop; `fetch` is a thin blocking
+    wrapper around it for the CLI.
     """
 
     def __init__(self, config: Config):
         self.config = config
 
     def fetch(self) -> dict[str, list[str]]:
+        return run_sync(self.fetch_async())
+
+    async def fetch_async(self) -> dict[str, list[str]]:
         results = {}
         broker = SSH_Broker()
 
-        for cli in self.config.clients:
-            try:
-                broker.register_service(cli.id, cli, self.config.defaults)
-            except ConnectionError as e:
-                print(f"[BROKER ERROR] {e}")
-                continue
-
-            proxy = RemoteCommandProxy(broker, cli.id)
-            stdout, stderr = proxy.execute("crontab -l")
-
-            if stderr.strip():
-                print(f"[CRONTAB ERROR] {cli.id}: {stderr.strip()}")
+        outcomes = await broker.fan_out_async(self.config.clients, self.config.defaults, self._fetch_host)
+        for host_id, outcome in outcomes.items():
+            if not outcome.ok:
+                print(f"[CRONTAB ERROR] {host_id}: {outcome.error}")
                 continue
+            results[host_id] = outcome.value
 
-            results[cli.id] = stdout.strip().splitlines()
-
-        broker.shutdown()
         return results
 
+    @staticmethod
+    async def _fetch_host(ssh: SSHConnectionHandler, client: Client) -> list[str]:
+        stdout, stderr = await ssh.run_async("crontab -l")
+        if stderr.strip():
+            raise RuntimeError(stderr.strip())
+        return stdout.strip().splitlines()
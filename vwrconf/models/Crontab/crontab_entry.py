@@ -16,3 +16,17 @@ class CrontabEntry(BackupEntry):
         # Normalized hash for comparison
         norm = self.normalized().encode("utf-8")
         return hashlib.sha256(norm).hexdigest()
+
+    def fields(self) -> tuple[str, str]:
+        """
+        Split the entry into (schedule, command), whitespace collapsed.
+
+        `@reboot`-style schedules count as one field; environment assignments
+        and other lines without a schedule get an empty one.
+        """
+        parts = self.normalized().split()
+        if parts and parts[0].startswith("@"):
+            return parts[0], " ".join(parts[1:])
+        if len(parts) >= 6 and "=" not in parts[0]:
+            return " ".join(parts[:5]), " ".join(parts[5:])
+        return "", " ".join(parts)
@@ -0,0 +1,79 @@
+# vwrconf/models/SSH_Auth.py
+
+import getpass
+import os
+import threading
+from paramiko import PKey, PasswordRequiredException
+
+DEFAULT_KEY_PATHS = ["~/.ssh/id_ed25519", "~/.ssh/id_ecdsa", "~/.ssh/id_rsa"]
+PASSPHRASE_ENV = "VWRCONF_KEY_PASSPHRASE"
+
+class AuthProvider:
+    """
+    Process-wide source of SSH credentials.
+
+    Private keys are parsed (and decrypted) once per process and shared by
+    every connection, so setting up hundreds of hosts costs one key load plus
+    the handshakes. Key type (RSA, ECDSA, Ed25519) is detected from the file.
+    Passphrases come from VWRCONF_KEY_PASSPHRASE or are asked for once per key.
+    """
+
+    def __init__(self):
+        self.keys: dict[tuple[str, float], PKey] = {}
+        self.lock = threading.Lock()
+
+    def load_key(self, path: str) -> PKey:
+        """
+        Return the parsed private key at `path`, loading it on first use only.
+
+        Raises:
+            FileNotFoundError: If the key file does not exist.
+        """
+        path = os.path.realpath(os.path.expanduser(path))
+        cache_key = (path, os.path.getmtime(path))
+
+        # One lock for all keys: concurrent fan-out workers must not prompt twice
+        with self.lock:
+            if cache_key not in self.keys:
+                self.keys[cache_key] = self._read_key(path)
+            return self.keys[cache_key]
+
+    @staticmethod
+    def _read_key(path: str) -> PKey:
+        try:
+            return PKey.from_path(path)
+        except (PasswordRequiredException, TypeError):
+            # cryptography-backed loaders signal a missing passphrase with TypeError
+            passphrase = os.environ.get(PASSPHRASE_ENV) or getpass.getpass(f"Enter passphrase for key '{path}': ")
+            return PKey.from_path(path, password=passphrase.encode())
+
+    def connect_kwargs(self, method: str | None, key_path: str | None) -> dict:
+        """
+        Build the authentication arguments for `SSHClient.connect`.
+
+        Args:
+            method (str | None): "agent" to authenticate with ssh-agent keys,
+                anything else for a private key file.
+            key_path (str | None): Key file to use; defaults to the first of
+                DEFAULT_KEY_PATHS that exists.
+
+        Returns:
+            dict: `pkey`/`allow_agent`/`look_for_keys` keyword arguments.
+
+        Raises:
+            FileNotFoundError: If no usable key file is found.
+        """
+        if method == "agent":
+            return {"allow_agent": True, "look_for_keys": False}
+
+        if key_path is None:
+            key_path = next(
+                (p for p in DEFAULT_KEY_PATHS if os.path.exists(os.path.expanduser(p))),
+                None
+            )
+        if key_path is None:
+            raise FileNotFoundError(f"No SSH private key found (tried {', '.join(DEFAULT_KEY_PATHS)})")
+
+        return {"pkey": self.load_key(key_path), "allow_agent": False, "look_for_keys": False}
+
+AUTH = AuthProvider()
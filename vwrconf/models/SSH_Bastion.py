@@ -0,0 +1,74 @@
+# vwrconf/models/SSH_Bastion.py
+
+import atexit
+import threading
+from paramiko import Channel
+from vwrconf.models.config_model import Defaults
+
+class BastionPool:
+    """
+    Process-wide pool of authenticated connections to jump hosts.
+
+    Each bastion gets a single SSH transport, opened on first use and kept
+    for the life of the process (or of the session daemon). Every target
+    behind it is reached through a `direct-tcpip` channel multiplexed over
+    that transport, so hundreds of hosts cost one bastion handshake instead
+    of one each, and the bastion sees a single login.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.locks: dict[tuple, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def open_channel(self, name: str, defaults: Defaults, host: str, port: int, timeout: float | None) -> Channel:
+        """
+        Open a tunnel to `host:port` through bastion `name`.
+
+        Args:
+            name (str): Bastion name from `defaults.bastions`.
+            defaults (Defaults): Connection defaults used for the bastion itself.
+            host (str): Target host, resolved by the bastion.
+            port (int): Target SSH port.
+            timeout (float | None): Seconds to wait for the bastion to open the channel.
+
+        Returns:
+            Channel: Socket-like channel to hand to paramiko as `sock`.
+
+        Raises:
+            ConnectionError: If the bastion cannot be reached.
+        """
+        handler = self._bastion(name, defaults)
+        return handler.transport.open_channel("direct-tcpip", (host, port), ("127.0.0.1", 0), timeout=timeout)
+
+    def _bastion(self, name: str, defaults: Defaults):
+        from vwrconf.models.SSH_Broker import SSHConnectionHandler
+
+        jump = defaults.bastions[name]
+        key = (name, jump.host, jump.port, jump.ssh_user, jump.method, jump.key_path, jump.profile, jump.via)
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+
+        # Per-bastion lock: concurrent workers wait for one handshake instead of racing
+        with key_lock:
+            handler = self.handlers.get(key)
+            if handler is not None and handler.is_active():
+                return handler
+            if handler is not None:
+                handler.close()
+
+            handler = SSHConnectionHandler(jump.as_client(name), defaults)
+            if not handler.connect():
+                self.handlers.pop(key, None)
+                raise ConnectionError(f"Failed to connect to bastion '{name}'")
+            self.handlers[key] = handler
+            return handler
+
+    def close_all(self):
+        with self.lock:
+            handlers, self.handlers = list(self.handlers.values()), {}
+        for handler in handlers:
+            handler.close()
+
+BASTIONS = BastionPool()
+atexit.register(BASTIONS.close_all)
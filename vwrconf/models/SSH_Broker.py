@@ -1,10 +1,46 @@
 # vwrconf/models/SSH_Broker.py
 
+import asyncio
 import os
-from paramiko import SSHClient, AutoAddPolicy, RSAKey
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import IO, Any, Awaitable, Callable
+from paramiko import Agent, AuthenticationException, SSHClient, SSHException, AutoAddPolicy, Transport
+from vwrconf.models.SSH_Auth import AUTH
+from vwrconf.models.SSH_Bastion import BASTIONS
 from vwrconf.models.config_model import Client, Defaults
+from vwrconf.models.SSH_Stream import DEFAULT_SPILL_THRESHOLD, StreamResult, drain_channel, spool
+from vwrconf.models.SSH_Sudo import SudoPrompt, SudoSession
+from vwrconf.models.SSH_Transport import CountingSocket, TransferMetrics, open_socket, open_socket_async, print_transfer_stats
 import traceback
 
+DEFAULT_MAX_WORKERS = 16
+CHANNEL_READ_SIZE = 32768
+CHANNEL_POLL_INTERVAL = 0.05
+
+# paramiko only opens channels with a blocking round trip; every handler shares these few threads for it
+CHANNEL_OPEN_POOL = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="vwrconf-ssh-open")
+
+@dataclass
+class HostResult:
+    """
+    Outcome of running a task against a single host during a fleet fan-out.
+
+    Exactly one of `value` or `error` is meaningful: `value` holds whatever the
+    task returned, `error` a human readable reason when the host failed.
+    """
+    host_id: str
+    value: Any = None
+    error: str | None = None
+    timed_out: bool = False
+    metrics: TransferMetrics | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 class RemoteCommandProxy:
     def __init__(self, broker, service_id: str):
         self.broker = broker
@@ -13,21 +49,167 @@ class RemoteCommandProxy:
     def execute(self, command: str) -> tuple[str, str]:
         return self.broker.dispatch(self.service_id, command)
 
+    async def execute_async(self, command: str) -> tuple[str, str]:
+        return await self.broker.dispatch_async(self.service_id, command)
+
 class SSH_Broker:
-    def __init__(self):
+    def __init__(self, max_workers: int | None = None, fleet_timeout: float | None = None):
         self.services = {}
+        self.max_workers = max_workers
+        self.fleet_timeout = fleet_timeout
 
     def register_service(self, service_id: str, client: Client, defaults: Defaults):
-        handler = SSHConnectionHandler(client, defaults)
-        if handler.connect():
+        run_sync(self.register_service_async(service_id, client, defaults))
+
+    async def register_service_async(self, service_id: str, client: Client, defaults: Defaults):
+        handler = open_handler(client, defaults)
+        if await handler.connect_async():
             self.services[service_id] = handler
         else:
             raise ConnectionError(f"Failed to connect to service '{service_id}'")
 
     def dispatch(self, service_id: str, command: str) -> tuple[str, str]:
+        return run_sync(self.dispatch_async(service_id, command))
+
+    async def dispatch_async(self, service_id: str, command: str) -> tuple[str, str]:
         if service_id not in self.services:
             return "", f"Service '{service_id}' not found"
-        return self.services[service_id].run(command)
+        return await self.services[service_id].run_async(command)
+
+    def fan_out(
+        self,
+        clients: list[Client],
+        defaults: Defaults,
+        task: Callable[["SSHConnectionHandler", Client], Any],
+    ) -> dict[str, HostResult]:
+        """
+        Run `task` against every client in parallel, with bounded concurrency.
+
+        Each worker opens its own connection, calls `task(handler, client)` and
+        closes the connection again, so wall time scales with the slowest host
+        instead of the sum of all hosts.
+
+        If the fleet budget (`fleet_timeout`) runs out first, the results
+        gathered so far are returned and every other host is marked as timed
+        out. Connections still in flight are closed so their workers unwind.
+
+        Args:
+            clients (list[Client]): Hosts to run the task on.
+            defaults (Defaults): Connection defaults from the config.
+            task (Callable): Function receiving a connected handler and its client.
+                Raising an exception marks the host as failed.
+
+        Returns:
+            dict[str, HostResult]: One result per client id, in config order.
+        """
+        if not clients:
+            return {}
+
+        workers = self.max_workers or defaults.max_workers or DEFAULT_MAX_WORKERS
+        workers = max(1, min(workers, len(clients)))
+        budget = self._fleet_budget(defaults)
+
+        in_flight = {}
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vwrconf-ssh")
+        try:
+            futures = [pool.submit(self._run_task, client, defaults, task, in_flight) for client in clients]
+            done, _ = wait(futures, timeout=budget)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        results = {r.host_id: r for r in (f.result() for f in done)}
+        if len(results) < len(clients):
+            for handler in list(in_flight.values()):
+                handler.close()
+        return self._collect(clients, defaults, results, budget)
+
+    async def fan_out_async(
+        self,
+        clients: list[Client],
+        defaults: Defaults,
+        task: Callable[["SSHConnectionHandler", Client], Awaitable[Any]],
+    ) -> dict[str, HostResult]:
+        """
+        Asyncio counterpart of `fan_out`: await `task` against every client on the running loop.
+
+        Handshakes and command output are awaited on the loop, so in-flight
+        hosts are multiplexed on it instead of holding a thread each (see
+        `SSHConnectionHandler.connect_async` and `run_async`). At most `max_workers` hosts are in flight at once, and hosts
+        unfinished when the fleet budget runs out are cancelled and marked as
+        timed out.
+
+        Args:
+            clients (list[Client]): Hosts to run the task on.
+            defaults (Defaults): Connection defaults from the config.
+            task (Callable): Coroutine function receiving a connected handler and its client.
+                Raising an exception marks the host as failed.
+
+        Returns:
+            dict[str, HostResult]: One result per client id, in config order.
+        """
+        if not clients:
+            return {}
+
+        workers = self.max_workers or defaults.max_workers or DEFAULT_MAX_WORKERS
+        semaphore = asyncio.Semaphore(max(1, workers))
+        budget = self._fleet_budget(defaults)
+
+        async def run(client: Client) -> HostResult:
+            async with semaphore:
+                handler = open_handler(client, defaults)
+                result = HostResult(client.id, metrics=getattr(handler, "metrics", None))
+                # Inside the try, so a host cancelled mid-handshake is closed as well
+                try:
+                    if not await handler.connect_async():
+                        result.error = f"Failed to connect to service '{client.id}'"
+                    else:
+                        result.value = await task(handler, client)
+                except Exception as e:
+                    result.error = str(e) or e.__class__.__name__
+                finally:
+                    handler.close()
+                return result
+
+        tasks = [asyncio.ensure_future(run(c)) for c in clients]
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+        for pending_task in pending:
+            pending_task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        results = {t.result().host_id: t.result() for t in done}
+        return self._collect(clients, defaults, results, budget)
+
+    def _collect(self, clients: list[Client], defaults: Defaults, results: dict, budget: float | None) -> dict[str, HostResult]:
+        collected = {c.id: results.get(c.id) or self._timed_out(c, budget) for c in clients}
+        if defaults.transfer_stats:
+            print_transfer_stats(collected)
+        return collected
+
+    def _fleet_budget(self, defaults: Defaults) -> float | None:
+        return get_timeout(self.fleet_timeout, defaults.fleet_timeout)
+
+    @staticmethod
+    def _timed_out(client: Client, budget: float | None) -> HostResult:
+        return HostResult(client.id, error=f"Timed out: fleet budget of {budget}s exhausted", timed_out=True)
+
+    @staticmethod
+    def _run_task(client: Client, defaults: Defaults, task: Callable, in_flight: dict | None = None) -> HostResult:
+        handler = open_handler(client, defaults)
+        result = HostResult(client.id, metrics=getattr(handler, "metrics", None))
+        if in_flight is not None:
+            in_flight[client.id] = handler
+        try:
+            if not handler.connect():
+                result.error = f"Failed to connect to service '{client.id}'"
+            else:
+                result.value = task(handler, client)
+        except Exception as e:
+            result.error = str(e) or e.__class__.__name__
+        finally:
+            if in_flight is not None:
+                in_flight.pop(client.id, None)
+            handler.close()
+        return result
 
     def shutdown(self):
         for handler in self.services.values():
@@ -38,42 +220,411 @@ class SSHConnectionHandler:
         self.hostname = client.host
         self.port = get_defaulted(client.port, defaults.port, "port")
         self.username = client.ssh_user or defaults.ssh_user
-        self.key_path = os.path.expanduser("~/.ssh/id_rsa")
+        self.method = client.method or defaults.method
+        self.key_path = client.key_path or defaults.key_path
+        self.connect_timeout = get_timeout(client.connect_timeout, defaults.connect_timeout)
+        self.banner_timeout = get_timeout(client.banner_timeout, defaults.banner_timeout)
+        self.auth_timeout = get_timeout(client.auth_timeout, defaults.auth_timeout)
+        self.command_timeout = get_timeout(client.command_timeout, defaults.command_timeout)
+        self.profile_name = client.profile or defaults.profile or "default"
+        self.profile = defaults.transport_profile(self.profile_name)
+        self.metrics = TransferMetrics(self.profile_name)
+        self.via = client.via
+        self.defaults = defaults
         self.ssh = SSHClient()
         self.ssh.set_missing_host_key_policy(AutoAddPolicy())
+        self.transport = None
+        self.sudo_session = None
+        self.started = None
 
     def connect(self) -> bool:
+        self.started = time.monotonic()
         try:
-            pkey = RSAKey.from_private_key_file(self.key_path)
-            self.ssh.connect(
-                hostname=self.hostname,
-                port=self.port,
-                username=self.username,
-                pkey=pkey
-            )
+            auth = AUTH.connect_kwargs(self.method, self.key_path)
+            sock = CountingSocket(self._open_socket(), self.metrics)
+            try:
+                self.ssh.connect(
+                    hostname=self.hostname,
+                    port=self.port,
+                    username=self.username,
+                    timeout=self.connect_timeout,
+                    banner_timeout=self.banner_timeout,
+                    auth_timeout=self.auth_timeout,
+                    sock=sock,
+                    compress=self.profile.compression,
+                    transport_factory=self._transport_factory,
+                    **auth
+                )
+            except Exception:
+                # paramiko leaves a caller-supplied socket open on failure
+                sock.close()
+                raise
+            self.transport = self.ssh.get_transport()
+            if self.profile.keepalive:
+                self.transport.set_keepalive(self.profile.keepalive)
+            self.metrics.connect_seconds = time.monotonic() - self.started
+            return True
+        except Exception as e:
+            print(f"[SSH ERROR] Connection to {self.hostname} failed: {e}")
+            return False
+
+    def _open_socket(self):
+        if self.via is not None:
+            return BASTIONS.open_channel(self.via, self.defaults, self.hostname, self.port, self.connect_timeout)
+        return open_socket(self.hostname, self.port, self.connect_timeout)
+
+    def _transport_factory(self, sock, **kwargs) -> Transport:
+        # Unset sizes keep paramiko's defaults; paramiko clamps out-of-range values
+        sizes = {}
+        if self.profile.window_size:
+            sizes["default_window_size"] = self.profile.window_size
+        if self.profile.max_packet_size:
+            sizes["default_max_packet_size"] = self.profile.max_packet_size
+        return Transport(sock, **sizes, **kwargs)
+
+    async def connect_async(self) -> bool:
+        """
+        Asyncio counterpart of `connect` that holds no thread while the handshake runs.
+
+        Given an event, paramiko runs the key exchange and each authentication
+        attempt on the transport's own reader thread; the loop polls those
+        events instead of blocking on `SSHClient.connect`. Host keys are
+        accepted, as the AutoAddPolicy of `connect` does.
+        """
+        self.started = time.monotonic()
+        sock = None
+        try:
+            auth = AUTH.connect_kwargs(self.method, self.key_path)
+            sock = CountingSocket(await self._open_socket_async(), self.metrics)
+            transport = self._transport_factory(sock)
+            self.transport = transport
+            transport.use_compression(self.profile.compression)
+            if self.banner_timeout is not None:
+                transport.banner_timeout = self.banner_timeout
+            if self.auth_timeout is not None:
+                transport.auth_timeout = self.auth_timeout
+
+            handshake = threading.Event()
+            transport.start_client(event=handshake)
+            if not await wait_event(handshake, self.connect_timeout):
+                raise SSHException("Timeout during the key exchange")
+            if not transport.is_active():
+                raise transport.get_exception() or SSHException("Negotiation failed.")
+            await self._authenticate_async(transport, auth)
+
+            if self.profile.keepalive:
+                transport.set_keepalive(self.profile.keepalive)
+            self.metrics.connect_seconds = time.monotonic() - self.started
             return True
         except Exception as e:
+            if self.transport is not None:
+                self.transport.close()
+                self.transport = None
+            elif sock is not None:
+                sock.close()
             print(f"[SSH ERROR] Connection to {self.hostname} failed: {e}")
             return False
 
+    async def _open_socket_async(self):
+        if self.via is not None:
+            # The tunnel is a channel of the shared bastion connection
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(CHANNEL_OPEN_POOL, self._open_socket)
+        return await open_socket_async(self.hostname, self.port, self.connect_timeout)
+
+    async def _authenticate_async(self, transport: Transport, auth: dict):
+        agent = Agent() if auth.get("pkey") is None else None
+        try:
+            keys = [auth["pkey"]] if agent is None else agent.get_keys()
+            for key in keys:
+                done = threading.Event()
+                transport.auth_publickey(self.username, key, done)
+                if not await wait_event(done, self.auth_timeout):
+                    raise AuthenticationException("Authentication timeout.")
+                if transport.is_authenticated():
+                    return
+                if not transport.is_active():
+                    break
+        finally:
+            if agent is not None:
+                agent.close()
+        raise AuthenticationException("Authentication failed.")
+
     def run(self, command: str, input_data: str | None = None, use_pty: bool = False) -> tuple[str, str]:
+        out, err = self.run_raw(command, input_data=input_data, use_pty=use_pty)
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    def run_raw(self, command: str, input_data: str | bytes | None = None, use_pty: bool = False) -> tuple[bytes, bytes]:
+        """
+        Same as `run`, but returns stdout and stderr as undecoded bytes.
+
+        Used by callers that parse framed output where byte lengths matter.
+        Without a PTY, stdin is closed after `input_data` is written so
+        commands reading it see EOF.
+        """
+        with self.run_stream(command, input_data=input_data, use_pty=use_pty) as result:
+            return result.stdout.read(), result.stderr.read()
+
+    def run_stream(
+        self,
+        command: str,
+        input_data: str | bytes | None = None,
+        use_pty: bool = False,
+        stdout_sink: IO[bytes] | None = None,
+        spill_threshold: int = DEFAULT_SPILL_THRESHOLD
+    ) -> StreamResult:
+        """
+        Run a command and stream its output with bounded memory.
+
+        stdout and stderr are drained concurrently in chunks. stdout goes to
+        `stdout_sink` when given (e.g. a backup file opened for writing),
+        otherwise both streams go to buffers that spill to a temp file past
+        `spill_threshold` bytes. A command still running after
+        `command_timeout` seconds is abandoned and reported on stderr.
+
+        Returns:
+            StreamResult: Output files rewound to their start, plus exit status.
+        """
+        own_sink = stdout_sink is None
+        stdout = spool(spill_threshold) if own_sink else stdout_sink
+        stderr = spool(spill_threshold)
+        deadline = time.monotonic() + self.command_timeout if self.command_timeout else None
+        channel = None
         try:
-            stdin, stdout, stderr = self.ssh.exec_command(command, get_pty=use_pty)
+            channel = self._open_exec_channel(command, use_pty)
             if input_data:
-                stdin.write(input_data)
-                stdin.flush()
-            out = stdout.read().decode()
-            err = stderr.read().decode()
-            return out, err
+                channel.sendall(input_data.encode() if isinstance(input_data, str) else input_data)
+                if not use_pty:
+                    channel.shutdown_write()
+            out_bytes, err_bytes = drain_channel(channel, stdout, stderr, deadline)
+            exit_status = channel.recv_exit_status()
+            channel.close()
+        except TimeoutError:
+            # Opening the channel itself can time out
+            if channel is not None:
+                channel.close()
+            err_msg = self._timeout_message()
+            stderr.write(err_msg.encode())
+            out_bytes, err_bytes, exit_status = 0, len(err_msg), None
         except Exception as e:
             # Obtener traceback completo
             tb_str = traceback.format_exc()
             err_msg = f"[SSH RUN ERROR] Exception running command:\n{e}\nTraceback:\n{tb_str}"
             print(err_msg)  # Podés cambiar a logging si querés
+            stderr.write(err_msg.encode())
+            out_bytes, err_bytes, exit_status = 0, len(err_msg), None
+
+        if own_sink:
+            stdout.seek(0)
+        stderr.seek(0)
+        return StreamResult(stdout, stderr, exit_status, out_bytes, err_bytes, owns_stdout=own_sink)
+
+    def run_piped(
+        self,
+        command: str,
+        feed: Callable[[Any], None],
+        use_sudo: bool = False,
+        sudo_password: str | None = None
+    ) -> tuple[bytes, bytes]:
+        """
+        Run a command whose stdin is produced incrementally by `feed`.
+
+        `feed` receives the writable stdin file of the channel and may write
+        any amount of data to it; stdin is closed once it returns. Used to
+        stream payloads that are too large for a command line or for memory.
+        Here `command_timeout` bounds each wait for output rather than the
+        whole transfer, so long uploads are not cut off.
+
+        With `use_sudo` the command runs under sudo, and `feed` is only
+        called once sudo is done with stdin (see SudoPrompt).
+        """
+        stdin = None
+        sudo = SudoPrompt(sudo_password) if use_sudo else None
+        try:
+            channel = self._open_exec_channel(sudo.command(command) if sudo else command, False)
+            channel.settimeout(self.command_timeout)
+            stdin, stdout, stderr = channel.makefile_stdin("wb"), channel.makefile("rb"), channel.makefile_stderr("rb")
+            early_stderr = sudo.authenticate(stdin.channel) if sudo else b""
+            feed(stdin)
+            stdin.flush()
+            stdin.channel.shutdown_write()
+            return stdout.read(), early_stderr + stderr.read()
+        except PermissionError as e:
+            stdin.channel.close()
+            return b"", str(e).encode()
+        except TimeoutError:
+            if stdin is not None:
+                stdin.channel.close()
+            return b"", self._timeout_message().encode()
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            err_msg = f"[SSH RUN ERROR] Exception running command:\n{e}\nTraceback:\n{tb_str}"
+            print(err_msg)
+            return b"", err_msg.encode()
+
+    async def run_async(self, command: str, input_data: str | None = None, use_pty: bool = False) -> tuple[str, str]:
+        """
+        Run a command without blocking the event loop.
+
+        Only the channel request round trip runs on CHANNEL_OPEN_POOL. Input
+        is written as the channel window allows, output is awaited through
+        the channel's pollable file descriptor and both stdout and stderr are
+        drained as data arrives. Without a PTY, stdin is closed after
+        `input_data` is written, or right away without one.
+        """
+        loop = asyncio.get_running_loop()
+        channel = None
+        try:
+            channel = await loop.run_in_executor(CHANNEL_OPEN_POOL, self._open_exec_channel, command, use_pty)
+            out, err = await asyncio.wait_for(self._communicate_async(channel, input_data, use_pty), self.command_timeout)
+            return out.decode(errors="replace"), err.decode(errors="replace")
+        except asyncio.TimeoutError:
+            return "", self._timeout_message()
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            err_msg = f"[SSH RUN ERROR] Exception running command:\n{e}\nTraceback:\n{tb_str}"
+            print(err_msg)
             return "", err_msg
+        finally:
+            if channel is not None:
+                channel.close()
+
+    def _timeout_message(self) -> str:
+        return f"[SSH TIMEOUT] Command on {self.hostname} did not finish within {self.command_timeout}s"
+
+    def _open_exec_channel(self, command: str, use_pty: bool):
+        channel = self.transport.open_session(timeout=self.command_timeout)
+        if use_pty:
+            channel.get_pty()
+        channel.exec_command(command)
+        return channel
+
+    async def _communicate_async(self, channel, input_data: str | None, use_pty: bool) -> tuple[bytes, bytes]:
+        if input_data:
+            await self._send_async(channel, input_data.encode())
+        if not use_pty:
+            # EOF on stdin, so commands reading it (e.g. `crontab -`) do not wait forever
+            channel.shutdown_write()
+        return await self._drain_async(channel)
+
+    @staticmethod
+    async def _send_async(channel, data: bytes):
+        sent = 0
+        while sent < len(data):
+            if not channel.send_ready():
+                # The window reopens from the transport thread, there is no fd to wait on
+                await asyncio.sleep(CHANNEL_POLL_INTERVAL)
+                continue
+            # Never blocks: the window has room for at least part of the chunk
+            sent += channel.send(data[sent:sent + CHANNEL_READ_SIZE])
+
+    @staticmethod
+    async def _drain_async(channel) -> tuple[bytes, bytes]:
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        fd = channel.fileno()
+        loop.add_reader(fd, readable.set)
+        out, err = bytearray(), bytearray()
+        try:
+            while True:
+                while channel.recv_ready():
+                    out += channel.recv(CHANNEL_READ_SIZE)
+                while channel.recv_stderr_ready():
+                    err += channel.recv_stderr(CHANNEL_READ_SIZE)
+                if channel.eof_received or channel.closed:
+                    if not channel.recv_ready() and not channel.recv_stderr_ready():
+                        break
+                    continue
+                readable.clear()
+                # stderr data does not wake the fd, so poll for it as well
+                try:
+                    await asyncio.wait_for(readable.wait(), CHANNEL_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            loop.remove_reader(fd)
+            channel.close()
+        return bytes(out), bytes(err)
+
+    def elevated(self, sudo_password: str | None) -> SudoSession:
+        """
+        Return the root shell of this connection, authenticating sudo on first use.
+
+        The session is reused by every later call, so sudo is authenticated
+        once per host connection instead of once per command.
+
+        Raises:
+            PermissionError: If sudo rejects the password.
+        """
+        if self.sudo_session is None or not self.sudo_session.is_open():
+            session = SudoSession(self.transport, sudo_password, self.command_timeout)
+            session.open()
+            self.sudo_session = session
+        return self.sudo_session
+
+    def is_active(self) -> bool:
+        return self.transport is not None and self.transport.is_active()
 
     def close(self):
+        if self.sudo_session is not None:
+            self.sudo_session.close()
+            self.sudo_session = None
+        # connect_async sets up the transport without the SSHClient
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
         self.ssh.close()
+        if self.started is not None and not self.metrics.elapsed:
+            self.metrics.elapsed = time.monotonic() - self.started
+
+def open_handler(client: Client, defaults: Defaults):
+    """
+    Return a connection handler for `client`.
+
+    When the local session daemon (`vwrconf daemon start`) is listening, the
+    handler borrows one of its warm sessions; otherwise a direct
+    SSHConnectionHandler is returned. Set VWRCONF_NO_DAEMON=1 to always
+    connect directly.
+    """
+    if not os.environ.get("VWRCONF_NO_DAEMON"):
+        from vwrconf.models.SSH_Daemon import DaemonConnectionHandler
+        handler = DaemonConnectionHandler(client, defaults)
+        if handler.attach():
+            return handler
+    return SSHConnectionHandler(client, defaults)
+
+def run_sync(coroutine: Awaitable):
+    """
+    Run `coroutine` to completion from blocking code and return its result.
+
+    Called from inside a running loop (e.g. a sync API used by async code),
+    it runs on a fresh loop in a helper thread instead of failing.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+async def wait_event(event: threading.Event, timeout: float | None) -> bool:
+    """
+    Wait for an event set by a paramiko transport thread without holding a thread.
+
+    Returns:
+        bool: True if the event was set, False if `timeout` seconds passed first.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while not event.is_set():
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(CHANNEL_POLL_INTERVAL)
+    return True
+
+def get_timeout(value: float | None, fallback: float | None) -> float | None:
+    """Per-client timeout if set, else the default one; 0 or None means no limit."""
+    timeout = value if value is not None else fallback
+    return timeout or None
 
 def get_defaulted(value, fallback, field):
     if value is not None:
@@ -81,4 +632,3 @@ def get_defaulted(value, fallback, field):
     if fallback is not None:
         return fallback
     raise ValueError(f"Missing required SSH config field: {field}")
-
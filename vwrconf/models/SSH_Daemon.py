@@ -0,0 +1,558 @@
+# vwrconf/models/SSH_Daemon.py
+
+import asyncio
+import base64
+import io
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import IO
+from vwrconf.models.config_model import Client, Defaults
+from vwrconf.models.SSH_Broker import SSHConnectionHandler, get_defaulted
+from vwrconf.models.SSH_Stream import DEFAULT_SPILL_THRESHOLD, STREAM_CHUNK_SIZE, StreamResult, copy_exact, spool
+from vwrconf.models.SSH_Sudo import OneShotSudo
+
+DAEMON_SOCKET_PATH = os.path.expanduser("~/.vwrconf/ssh_daemon.sock")
+DEFAULT_IDLE_TIMEOUT = 600
+
+# Output of a "run" request: frames of (kind, payload length) then the payload
+FRAME_HEADER = struct.Struct(">cI")
+FRAME_STDOUT = b"o"
+FRAME_STDERR = b"e"
+FRAME_END = b"x"  # payload: exit status as JSON
+FRAME_ERROR = b"!"  # payload: error message; ends the reply as well
+# Input of a "run_piped" request, sent by the client after the request line; an empty one closes stdin
+FRAME_STDIN = b"i"
+
+def _write_frame(wfile, kind: bytes, payload: bytes = b""):
+    wfile.write(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+class _FrameSink:
+    """Binary sink sending everything written to it as frames of one kind."""
+
+    def __init__(self, wfile, kind: bytes):
+        self.wfile = wfile
+        self.kind = kind
+
+    def write(self, data: bytes) -> int:
+        if data:
+            _write_frame(self.wfile, self.kind, data)
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+class _StdinFrames:
+    """Stdin frames of a "run_piped" request, read from the client up to the empty one."""
+
+    def __init__(self, rfile):
+        self.rfile = rfile
+        self.done = False
+
+    def __iter__(self):
+        while not self.done:
+            header = self.rfile.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                raise ConnectionError("Client closed the connection mid-input")
+            kind, size = FRAME_HEADER.unpack(header)
+            payload = self.rfile.read(size)
+            if kind != FRAME_STDIN or len(payload) < size:
+                raise ConnectionError("Malformed input frame")
+            if not payload:
+                self.done = True
+                return
+            yield payload
+
+    def drain(self):
+        """Skip the input the command did not read, so the next request starts on a frame boundary."""
+        for _ in self:
+            pass
+
+@dataclass
+class _Session:
+    handler: SSHConnectionHandler | None = None
+    last_used: float = field(default_factory=time.monotonic)
+    in_use: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+class SessionDaemon:
+    """
+    Local ControlMaster-like daemon that keeps authenticated SSH sessions warm.
+
+    CLI invocations attach over a Unix socket and run their commands on a
+    transport that is already connected, so back to back commands skip the
+    key exchange and authentication. Sessions idle for longer than
+    `idle_timeout` seconds are closed.
+
+    Requests are one JSON object per line, command input base64 encoded.
+    Replies are JSON lines too, except for "run": its output streams back as
+    stdout and stderr frames while the command runs, so the daemon never
+    holds a whole output in memory. "run_piped" takes its stdin the same
+    way, as frames following the request line.
+    """
+
+    def __init__(self, socket_path: str = DAEMON_SOCKET_PATH, idle_timeout: int = DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[tuple, _Session] = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def serve_forever(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        # Owner-only from the moment it exists, not just after a chmod
+        umask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, _DaemonRequestHandler)
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+        self.server.session_daemon = self
+
+        threading.Thread(target=self._reap_idle_sessions, daemon=True).start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self._close_all()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def handle(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "status":
+            return {"ok": True, "sessions": self.status()}
+        if op == "stop":
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"ok": True}
+
+        client = Client(**request["client"])
+        defaults = Defaults(**request["defaults"])
+        if op == "connect":
+            try:
+                self._acquire(client, defaults)
+            except ConnectionError as e:
+                return {"ok": False, "error": str(e)}
+            self._release(client, defaults)
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown daemon operation '{op}'"}
+
+    def run(self, request: dict, wfile):
+        """
+        Run the command of a "run" request and stream its output to `wfile` as frames.
+
+        stdout is forwarded chunk by chunk as it is drained from the channel;
+        stderr is spooled (to disk past the spill threshold) and follows it.
+        """
+        client = Client(**request["client"])
+        defaults = Defaults(**request["defaults"])
+        try:
+            handler = self._acquire(client, defaults)
+        except ConnectionError as e:
+            _write_frame(wfile, FRAME_ERROR, str(e).encode())
+            wfile.flush()
+            return
+        input_data = request.get("input_data")
+        try:
+            with handler.run_stream(
+                request["command"],
+                input_data=base64.b64decode(input_data) if input_data else None,
+                use_pty=request.get("use_pty", False),
+                stdout_sink=_FrameSink(wfile, FRAME_STDOUT)
+            ) as result:
+                for chunk in iter(lambda: result.stderr.read(STREAM_CHUNK_SIZE), b""):
+                    _write_frame(wfile, FRAME_STDERR, chunk)
+                exit_status = result.exit_status
+        finally:
+            self._release(client, defaults)
+        _write_frame(wfile, FRAME_END, json.dumps(exit_status).encode())
+        wfile.flush()
+
+    def run_piped(self, request: dict, rfile, wfile):
+        """
+        Run the command of a "run_piped" request, feeding it the stdin frames that follow the request.
+
+        Input is copied to the channel a frame at a time, so a streamed
+        upload (e.g. an /etc restore) never sits in the daemon's memory.
+        With `use_sudo`, the session's own prompt-aware sudo handshake runs
+        before any input reaches the command.
+        """
+        client = Client(**request["client"])
+        defaults = Defaults(**request["defaults"])
+        stdin = _StdinFrames(rfile)
+        try:
+            handler = self._acquire(client, defaults)
+        except ConnectionError as e:
+            stdin.drain()
+            _write_frame(wfile, FRAME_ERROR, str(e).encode())
+            wfile.flush()
+            return
+
+        def feed(channel_stdin):
+            for chunk in stdin:
+                channel_stdin.write(chunk)
+
+        try:
+            out, err = handler.run_piped(
+                request["command"], feed,
+                use_sudo=request.get("use_sudo", False), sudo_password=request.get("sudo_password")
+            )
+        finally:
+            self._release(client, defaults)
+        stdin.drain()
+        for kind, data in ((FRAME_STDOUT, out), (FRAME_STDERR, err)):
+            for start in range(0, len(data), STREAM_CHUNK_SIZE):
+                _write_frame(wfile, kind, data[start:start + STREAM_CHUNK_SIZE])
+        _write_frame(wfile, FRAME_END, json.dumps(None).encode())
+        wfile.flush()
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "host": host,
+                    "port": port,
+                    "user": user,
+                    "idle": int(now - session.last_used),
+                    "active": session.handler is not None and session.handler.is_active(),
+                }
+                for (host, port, user, *_), session in self.sessions.items()
+            ]
+
+    @staticmethod
+    def _session_key(client: Client, defaults: Defaults) -> tuple:
+        port = get_defaulted(client.port, defaults.port, "port")
+        return (
+            client.host, port, client.ssh_user or defaults.ssh_user,
+            client.method or defaults.method, client.key_path or defaults.key_path,
+            client.profile or defaults.profile, client.via
+        )
+
+    def _acquire(self, client: Client, defaults: Defaults) -> SSHConnectionHandler:
+        key = self._session_key(client, defaults)
+        with self.lock:
+            session = self.sessions.setdefault(key, _Session())
+            session.in_use += 1
+            session.last_used = time.monotonic()
+
+        with session.lock:
+            if session.handler is None or not session.handler.is_active():
+                handler = SSHConnectionHandler(client, defaults)
+                if not handler.connect():
+                    with self.lock:
+                        session.in_use -= 1
+                    raise ConnectionError(f"Connection to {client.host} failed")
+                session.handler = handler
+            return session.handler
+
+    def _release(self, client: Client, defaults: Defaults):
+        with self.lock:
+            session = self.sessions[self._session_key(client, defaults)]
+            session.in_use -= 1
+            session.last_used = time.monotonic()
+
+    def _reap_idle_sessions(self):
+        interval = max(1, min(30, self.idle_timeout // 2))
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            expired = []
+            with self.lock:
+                for key, session in list(self.sessions.items()):
+                    if session.in_use == 0 and now - session.last_used > self.idle_timeout:
+                        expired.append(self.sessions.pop(key))
+            for session in expired:
+                if session.handler is not None:
+                    session.handler.close()
+
+    def _close_all(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            if session.handler is not None:
+                session.handler.close()
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = {}
+            if request.get("op") in ("run", "run_piped"):
+                try:
+                    if request["op"] == "run":
+                        self.server.session_daemon.run(request, self.wfile)
+                    else:
+                        self.server.session_daemon.run_piped(request, self.rfile, self.wfile)
+                except Exception as e:
+                    _write_frame(self.wfile, FRAME_ERROR, f"{e}\n{traceback.format_exc()}".encode())
+                    self.wfile.flush()
+                    if request["op"] == "run_piped":
+                        # Unread input frames would be taken for requests
+                        return
+                continue
+            try:
+                reply = self.server.session_daemon.handle(request)
+            except Exception as e:
+                reply = {"ok": False, "error": f"{e}\n{traceback.format_exc()}"}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+def daemon_request(payload: dict, socket_path: str = DAEMON_SOCKET_PATH) -> dict:
+    """Send a single request to the session daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        stream = sock.makefile("rwb")
+        stream.write(json.dumps(payload).encode() + b"\n")
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise ConnectionError("Session daemon closed the connection")
+    return json.loads(line)
+
+def daemon_is_running(socket_path: str = DAEMON_SOCKET_PATH) -> bool:
+    try:
+        return daemon_request({"op": "ping"}, socket_path).get("ok", False)
+    except (OSError, ValueError):
+        return False
+
+class DaemonConnectionHandler:
+    """
+    Connection handler that borrows a warm session from the local SessionDaemon.
+
+    Same interface as SSHConnectionHandler. `close` only drops the Unix socket;
+    the daemon keeps the authenticated transport alive until it goes idle.
+    """
+
+    def __init__(self, client: Client, defaults: Defaults, socket_path: str = DAEMON_SOCKET_PATH):
+        self.hostname = client.host
+        self.client = client
+        self.defaults = defaults
+        self.socket_path = socket_path
+        self.sock = None
+        self.stream = None
+        self.lock = threading.Lock()
+
+    def attach(self) -> bool:
+        """Open the Unix socket to the daemon. Returns False if no daemon is listening."""
+        try:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(self.socket_path)
+            self.stream = self.sock.makefile("rwb")
+            return True
+        except OSError:
+            self.close()
+            return False
+
+    def _encode(self, payload: dict) -> bytes:
+        payload = {
+            **payload,
+            "client": self.client.model_dump(),
+            "defaults": self.defaults.model_dump(),
+        }
+        return json.dumps(payload).encode() + b"\n"
+
+    def _send(self, payload: dict):
+        self.stream.write(self._encode(payload))
+        self.stream.flush()
+
+    def _request(self, payload: dict) -> dict:
+        with self.lock:
+            self._send(payload)
+            line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Session daemon closed the connection")
+        return json.loads(line)
+
+    def connect(self) -> bool:
+        try:
+            reply = self._request({"op": "connect"})
+        except (OSError, ValueError) as e:
+            print(f"[SSH ERROR] Session daemon unreachable for {self.hostname}: {e}")
+            return False
+        if not reply.get("ok"):
+            print(f"[SSH ERROR] Connection to {self.hostname} failed: {reply.get('error')}")
+            return False
+        return True
+
+    async def connect_async(self) -> bool:
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            try:
+                writer.write(self._encode({"op": "connect"}))
+                await writer.drain()
+                line = await reader.readline()
+            finally:
+                writer.close()
+            if not line:
+                raise ConnectionError("Session daemon closed the connection")
+            reply = json.loads(line)
+        except (OSError, ValueError) as e:
+            print(f"[SSH ERROR] Session daemon unreachable for {self.hostname}: {e}")
+            return False
+        if not reply.get("ok"):
+            print(f"[SSH ERROR] Connection to {self.hostname} failed: {reply.get('error')}")
+            return False
+        return True
+
+    def run(self, command: str, input_data: str | None = None, use_pty: bool = False) -> tuple[str, str]:
+        out, err = self.run_raw(command, input_data=input_data, use_pty=use_pty)
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    def run_raw(self, command: str, input_data: str | bytes | None = None, use_pty: bool = False) -> tuple[bytes, bytes]:
+        with self.run_stream(command, input_data=input_data, use_pty=use_pty) as result:
+            return result.stdout.read(), result.stderr.read()
+
+    def run_stream(
+        self,
+        command: str,
+        input_data: str | bytes | None = None,
+        use_pty: bool = False,
+        stdout_sink: IO[bytes] | None = None,
+        spill_threshold: int = DEFAULT_SPILL_THRESHOLD
+    ) -> StreamResult:
+        """Run a command on the daemon's session, copying its output frames to the sinks as they arrive."""
+        if isinstance(input_data, str):
+            input_data = input_data.encode()
+        own_sink = stdout_sink is None
+        stdout = spool(spill_threshold) if own_sink else stdout_sink
+        stderr = spool(spill_threshold)
+        out_len = err_len = 0
+        exit_status = None
+        try:
+            with self.lock:
+                self._send({
+                    "op": "run",
+                    "command": command,
+                    "input_data": base64.b64encode(input_data).decode() if input_data else None,
+                    "use_pty": use_pty,
+                })
+                out_len, err_len, exit_status = self._read_output(stdout, stderr)
+        except (OSError, ValueError) as e:
+            err_msg = f"[SSH RUN ERROR] Session daemon request failed: {e}"
+            print(err_msg)
+            stderr.write(err_msg.encode())
+            err_len += len(err_msg)
+
+        if own_sink:
+            stdout.seek(0)
+        stderr.seek(0)
+        return StreamResult(stdout, stderr, exit_status, out_len, err_len, owns_stdout=own_sink)
+
+    def _read_output(self, stdout: IO[bytes], stderr: IO[bytes]) -> tuple[int, int, int | None]:
+        """Copy the output frames of a reply to the sinks; returns both lengths and the exit status."""
+        out_len = err_len = 0
+        while True:
+            header = self.stream.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                raise ConnectionError("Session daemon closed the connection")
+            kind, size = FRAME_HEADER.unpack(header)
+            if kind in (FRAME_STDOUT, FRAME_STDERR):
+                sink = stdout if kind == FRAME_STDOUT else stderr
+                if copy_exact(self.stream, sink, size) < size:
+                    raise ConnectionError("Session daemon closed the connection mid-output")
+                if kind == FRAME_STDOUT:
+                    out_len += size
+                else:
+                    err_len += size
+                continue
+            payload = self.stream.read(size)
+            if kind == FRAME_END:
+                return out_len, err_len, json.loads(payload)
+            stderr.write(payload)
+            return out_len, err_len + len(payload), None
+
+    def run_piped(self, command: str, feed, use_sudo: bool = False, sudo_password: str | None = None) -> tuple[bytes, bytes]:
+        """
+        Run a command on the daemon's session whose stdin is produced incrementally by `feed`.
+
+        What `feed` writes goes to the daemon as stdin frames right away, so
+        memory stays bounded however large the stream is. See
+        SSHConnectionHandler.run_piped.
+        """
+        stdout, stderr = io.BytesIO(), io.BytesIO()
+        try:
+            with self.lock:
+                self._send({
+                    "op": "run_piped",
+                    "command": command,
+                    "use_sudo": use_sudo,
+                    "sudo_password": sudo_password if use_sudo else None,
+                })
+                try:
+                    feed(_FrameSink(self.stream, FRAME_STDIN))
+                except Exception:
+                    # The daemon is left waiting for the rest of the input, this connection is unusable
+                    self.close()
+                    raise
+                _write_frame(self.stream, FRAME_STDIN)
+                self.stream.flush()
+                self._read_output(stdout, stderr)
+        except (OSError, ValueError) as e:
+            err_msg = f"[SSH RUN ERROR] Session daemon request failed: {e}"
+            print(err_msg)
+            stderr.write(err_msg.encode())
+        return stdout.getvalue(), stderr.getvalue()
+
+    async def run_async(self, command: str, input_data: str | None = None, use_pty: bool = False) -> tuple[str, str]:
+        """
+        Run a command on the daemon's session without blocking the event loop.
+
+        Each call talks to the daemon over its own asyncio Unix connection, so
+        it works on whatever loop awaits it and holds no thread on this side.
+        """
+        out, err = bytearray(), bytearray()
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            try:
+                writer.write(self._encode({
+                    "op": "run",
+                    "command": command,
+                    "input_data": base64.b64encode(input_data.encode()).decode() if input_data else None,
+                    "use_pty": use_pty,
+                }))
+                await writer.drain()
+                while True:
+                    kind, size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                    payload = await reader.readexactly(size)
+                    if kind == FRAME_STDOUT:
+                        out += payload
+                    elif kind == FRAME_STDERR or kind == FRAME_ERROR:
+                        err += payload
+                    if kind in (FRAME_END, FRAME_ERROR):
+                        break
+            finally:
+                writer.close()
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            err_msg = f"[SSH RUN ERROR] Session daemon request failed: {e}"
+            print(err_msg)
+            err += err_msg.encode()
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    def elevated(self, sudo_password: str | None) -> OneShotSudo:
+        return OneShotSudo(self, sudo_password)
+
+    def is_active(self) -> bool:
+        return self.stream is not None
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
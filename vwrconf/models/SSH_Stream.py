@@ -0,0 +1,130 @@
+# vwrconf/models/SSH_Stream.py
+
+import os
+import select
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import IO, Iterator
+
+DEFAULT_SPILL_THRESHOLD = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 32768
+STREAM_POLL_INTERVAL = 0.05
+
+def spool(spill_threshold: int = DEFAULT_SPILL_THRESHOLD) -> IO[bytes]:
+    """In-memory buffer that moves to a temp file once it grows past `spill_threshold` bytes."""
+    return tempfile.SpooledTemporaryFile(max_size=spill_threshold, mode="w+b")
+
+@dataclass
+class StreamResult:
+    """
+    Output of a streamed remote command.
+
+    `stdout` and `stderr` are binary files positioned at their start. Unless
+    the caller passed its own sink, they are spooled buffers that spill to a
+    temp file past the configured threshold, so large outputs never have to
+    sit in memory. Use as a context manager, or call `close`, to release them.
+    """
+    stdout: IO[bytes]
+    stderr: IO[bytes]
+    exit_status: int | None = None
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    owns_stdout: bool = field(default=True, repr=False)
+
+    @classmethod
+    def from_bytes(cls, out: bytes, err: bytes, exit_status: int | None = None) -> "StreamResult":
+        stdout, stderr = spool(), spool()
+        stdout.write(out)
+        stderr.write(err)
+        stdout.seek(0)
+        stderr.seek(0)
+        return cls(stdout, stderr, exit_status, len(out), len(err))
+
+    def iter_stdout(self, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        return iter(lambda: self.stdout.read(chunk_size), b"")
+
+    def stderr_text(self) -> str:
+        self.stderr.seek(0)
+        return self.stderr.read().decode(errors="replace")
+
+    def close(self):
+        if self.owns_stdout:
+            self.stdout.close()
+        self.stderr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def buffered_stream(output: tuple[bytes, bytes], stdout_sink: IO[bytes] | None = None, exit_status: int | None = None) -> StreamResult:
+    """Wrap an already collected (stdout, stderr) pair for handlers that cannot stream."""
+    out, err = output
+    if stdout_sink is None:
+        return StreamResult.from_bytes(out, err, exit_status)
+    stdout_sink.write(out)
+    result = StreamResult.from_bytes(b"", err, exit_status)
+    result.stdout.close()
+    result.stdout, result.stdout_bytes, result.owns_stdout = stdout_sink, len(out), False
+    return result
+
+def drain_channel(channel, stdout_sink: IO[bytes], stderr_sink: IO[bytes], deadline: float | None = None) -> tuple[int, int]:
+    """
+    Copy a channel's stdout and stderr into the sinks until the remote side is done.
+
+    Both streams are drained in the same loop, so a chatty stderr can never
+    fill its window and stall stdout (or the other way round).
+
+    Args:
+        deadline (float | None): `time.monotonic()` value after which to give up.
+
+    Returns:
+        tuple[int, int]: Bytes written to the stdout and stderr sinks.
+
+    Raises:
+        TimeoutError: If the command is still running at `deadline`.
+    """
+    out_bytes = err_bytes = 0
+    while True:
+        progressed = False
+        if channel.recv_ready():
+            chunk = channel.recv(STREAM_CHUNK_SIZE)
+            stdout_sink.write(chunk)
+            out_bytes += len(chunk)
+            progressed = True
+        if channel.recv_stderr_ready():
+            chunk = channel.recv_stderr(STREAM_CHUNK_SIZE)
+            stderr_sink.write(chunk)
+            err_bytes += len(chunk)
+            progressed = True
+        # Checked on every pass, so a host that never stops writing still times out
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError("remote command did not finish before its deadline")
+        if progressed:
+            continue
+        if channel.eof_received or channel.closed:
+            if not channel.recv_ready() and not channel.recv_stderr_ready():
+                return out_bytes, err_bytes
+            continue
+        # The channel fd only signals stdout, so stderr is picked up by the timeout
+        select.select([channel], [], [], STREAM_POLL_INTERVAL)
+
+def copy_exact(src: IO[bytes], dst: IO[bytes], size: int) -> int:
+    """Copy exactly `size` bytes (or until EOF) from `src` to `dst` in bounded chunks."""
+    copied = 0
+    while copied < size:
+        chunk = src.read(min(STREAM_CHUNK_SIZE, size - copied))
+        if not chunk:
+            break
+        dst.write(chunk)
+        copied += len(chunk)
+    return copied
+
+def commit_part_file(part_path: str, final_path: str, keep: bool):
+    """Rename a fully written `.part` file into place, or drop it."""
+    if keep:
+        os.replace(part_path, final_path)
+    elif os.path.exists(part_path):
+        os.remove(part_path)
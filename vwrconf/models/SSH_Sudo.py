@@ -0,0 +1,277 @@
+# vwrconf/models/SSH_Sudo.py
+
+import base64
+import secrets
+import shlex
+import threading
+import time
+from typing import IO
+from vwrconf.models.SSH_Stream import DEFAULT_SPILL_THRESHOLD, StreamResult, buffered_stream, spool
+
+SUDO_AUTH_TIMEOUT = 15
+CHANNEL_READ_SIZE = 32768
+
+class SudoPrompt:
+    """
+    Prompt-aware `sudo -S` handshake for one exec channel.
+
+    sudo is given a random prompt, and the password is sent only once that
+    prompt shows up on stderr. A sudo that does not ask (NOPASSWD rule,
+    cached credentials) therefore never gets the password on its stdin,
+    where the elevated command would read it. The elevated command first
+    writes a random marker to stderr, which tells that sudo is done.
+    """
+
+    def __init__(self, sudo_password: str | None):
+        token = secrets.token_hex(8)
+        self.sudo_password = sudo_password
+        self.prompt = f"[vwrconf-sudo-{token}]"
+        self.ready = f"__VWRCONF_{token}_ELEVATED__"
+
+    def command(self, command: str) -> str:
+        """Wrap `command` to run under sudo; `sudo -n` when there is no password to give."""
+        inner = f"printf '%s\\n' {self.ready} >&2; exec sh -c {shlex.quote(command)}"
+        if self.sudo_password is None:
+            return f"sudo -n sh -c {shlex.quote(inner)}"
+        return f"sudo -S -p {shlex.quote(self.prompt)} sh -c {shlex.quote(inner)}"
+
+    def authenticate(self, channel, timeout: float = SUDO_AUTH_TIMEOUT) -> bytes:
+        """
+        Wait until the command started with `command` runs as root, answering sudo's prompt if it asks.
+
+        Args:
+            channel: Channel the wrapped command was executed on, before anything was sent to it.
+            timeout (float): Seconds to wait for sudo.
+
+        Returns:
+            bytes: stderr the command already wrote after the marker.
+
+        Raises:
+            PermissionError: If sudo rejects the password, needs one it was not given, or never answers.
+        """
+        ready = self.ready.encode() + b"\n"
+        prompt = self.prompt.encode()
+        stderr = bytearray()
+        answered = False
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if channel.recv_stderr_ready():
+                stderr += channel.recv_stderr(CHANNEL_READ_SIZE)
+                if ready in stderr:
+                    return bytes(stderr.partition(ready)[2])
+                if prompt in stderr:
+                    if answered or self.sudo_password is None:
+                        # Asked again: the password was wrong
+                        break
+                    before, _, after = bytes(stderr).partition(prompt)
+                    stderr = bytearray(before + after)
+                    channel.sendall((self.sudo_password + "\n").encode())
+                    answered = True
+                continue
+            if channel.exit_status_ready():
+                break
+            time.sleep(0.01)
+
+        reason = stderr.replace(prompt, b"").decode(errors="replace").strip() or "no response from sudo"
+        raise PermissionError(f"sudo authentication failed: {reason}")
+
+class SudoSession:
+    """
+    Root shell kept open on an SSH connection, authenticated with sudo once.
+
+    Every command is sent to the same elevated `sh` over its stdin, runs in
+    a child `sh -c` with output captured to private temp files, and is
+    answered with a length-prefixed frame. No PTY is involved, so the
+    password is never echoed back and output needs no scrubbing.
+    A `command_timeout` bounds each command; a command that overruns it
+    closes the session.
+    """
+
+    def __init__(self, transport, sudo_password: str | None, command_timeout: float | None = None):
+        self.transport = transport
+        self.sudo_password = sudo_password
+        self.command_timeout = command_timeout
+        self.marker = f"__VWRCONF_{secrets.token_hex(8)}__"
+        self.channel = None
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+        self.last_exit_status = None
+
+    def open(self):
+        """
+        Start the elevated shell and wait until sudo accepted the password.
+
+        Raises:
+            PermissionError: If sudo rejects the password or never answers.
+        """
+        ready = f"{self.marker} READY"
+        # The inner sh reads commands from the channel's stdin until it closes
+        bootstrap = f'd=$(mktemp -d) || exit 1; export d; echo {ready}; sh; rm -rf "$d"'
+        sudo = SudoPrompt(self.sudo_password)
+
+        self.channel = self.transport.open_session()
+        self.channel.exec_command(sudo.command(bootstrap))
+        try:
+            sudo.authenticate(self.channel)
+            self.channel.settimeout(SUDO_AUTH_TIMEOUT)
+            started = self._read_line() == ready
+        except (PermissionError, OSError):
+            self.close()
+            raise
+        if not started:
+            self.close()
+            raise PermissionError("sudo authentication failed: the elevated shell did not start")
+        # The shell now waits on stdin for commands, with $d set
+        self.channel.settimeout(self.command_timeout)
+
+    def run_raw(self, command: str, input_data: str | bytes | None = None) -> tuple[bytes, bytes]:
+        """
+        Run `command` as root in the session and return its stdout and stderr.
+
+        `input_data`, if given, is shipped inside the script as base64 and
+        fed to the command's stdin.
+        """
+        with self.run_stream(command, input_data=input_data) as result:
+            return result.stdout.read(), result.stderr.read()
+
+    def run_stream(
+        self,
+        command: str,
+        input_data: str | bytes | None = None,
+        stdout_sink: IO[bytes] | None = None,
+        spill_threshold: int = DEFAULT_SPILL_THRESHOLD
+    ) -> StreamResult:
+        """
+        Streaming variant of `run_raw`, see SSHConnectionHandler.run_stream.
+
+        The response frame is copied to the sinks in bounded chunks.
+        """
+        own_sink = stdout_sink is None
+        stdout = spool(spill_threshold) if own_sink else stdout_sink
+        stderr = spool(spill_threshold)
+        out_len = err_len = 0
+        with self.lock:
+            try:
+                self.channel.sendall(self._wrap(command, input_data).encode())
+                header = self._read_line()
+                if header is None:
+                    raise ConnectionError("sudo session closed")
+
+                marker, rc, out_len, err_len = header.split(" ")
+                if marker != self.marker:
+                    raise ConnectionError(f"Unexpected sudo session output: {header!r}")
+                self.last_exit_status = int(rc)
+                out_len, err_len = int(out_len), int(err_len)
+                self._copy_exact(stdout, out_len)
+                self._copy_exact(stderr, err_len)
+            except (OSError, ValueError) as e:
+                self.close()
+                self.last_exit_status = None
+                message = f"[SUDO SESSION ERROR] {e}".encode()
+                stderr.write(message)
+                err_len = len(message)
+
+        if own_sink:
+            stdout.seek(0)
+        stderr.seek(0)
+        return StreamResult(stdout, stderr, self.last_exit_status, out_len, err_len, owns_stdout=own_sink)
+
+    def run(self, command: str, input_data: str | None = None) -> tuple[str, str]:
+        out, err = self.run_raw(command, input_data=input_data)
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    def _wrap(self, command: str, input_data: str | bytes | None) -> str:
+        lines = []
+        stdin = "/dev/null"
+        if input_data:
+            if isinstance(input_data, str):
+                input_data = input_data.encode()
+            eof = f"{self.marker}_IN"
+            lines.append(f"base64 -d >\"$d/i\" <<'{eof}'")
+            lines.append(base64.encodebytes(input_data).decode().rstrip("\n"))
+            lines.append(eof)
+            stdin = '"$d/i"'
+
+        lines.append(f'sh -c {shlex.quote(command)} >"$d/o" 2>"$d/e" <{stdin}')
+        lines.append("rc=$?")
+        lines.append(
+            f'printf \'%s %d %d %d\\n\' {self.marker} "$rc" '
+            '"$(($(wc -c <"$d/o")))" "$(($(wc -c <"$d/e")))"'
+        )
+        lines.append('cat "$d/o" "$d/e"; rm -f "$d/i"')
+        return "\n".join(lines) + "\n"
+
+    def _fill(self) -> bool:
+        chunk = self.channel.recv(CHANNEL_READ_SIZE)
+        if not chunk:
+            return False
+        self.buffer += chunk
+        return True
+
+    def _read_line(self) -> str | None:
+        while b"\n" not in self.buffer:
+            if not self._fill():
+                return None
+        line, _, rest = bytes(self.buffer).partition(b"\n")
+        self.buffer = bytearray(rest)
+        return line.decode(errors="replace")
+
+    def _copy_exact(self, sink: IO[bytes], size: int):
+        remaining = size
+        while remaining:
+            if not self.buffer and not self._fill():
+                raise ConnectionError("sudo session closed mid-response")
+            chunk = self.buffer[:remaining]
+            sink.write(chunk)
+            del self.buffer[:len(chunk)]
+            remaining -= len(chunk)
+
+    def is_open(self) -> bool:
+        return self.channel is not None and not self.channel.closed
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+class OneShotSudo:
+    """
+    Fallback for handlers without direct channel access (e.g. the session daemon):
+    each command gets its own `sudo` invocation, still without a PTY.
+
+    Without channel access the prompt cannot be watched, so whether sudo
+    asks for a password is probed once with `sudo -n`. The password is only
+    put in front of the command's stdin when sudo is known to read it.
+    """
+
+    def __init__(self, handler, sudo_password: str | None):
+        self.handler = handler
+        self.sudo_password = sudo_password
+        self.needs_password = None
+
+    def _password_needed(self) -> bool:
+        if self.needs_password is None:
+            with self.handler.run_stream("sudo -n sh -c :") as result:
+                self.needs_password = result.exit_status != 0
+        return self.needs_password
+
+    def run_raw(self, command: str, input_data: str | bytes | None = None) -> tuple[bytes, bytes]:
+        if isinstance(input_data, str):
+            input_data = input_data.encode()
+        if self.sudo_password is None or not self._password_needed():
+            return self.handler.run_raw(f"sudo -n sh -c {shlex.quote(command)}", input_data=input_data)
+        payload = (self.sudo_password + "\n").encode() + (input_data or b"")
+        return self.handler.run_raw(f"sudo -S -p '' sh -c {shlex.quote(command)}", input_data=payload)
+
+    def run(self, command: str, input_data: str | None = None) -> tuple[str, str]:
+        out, err = self.run_raw(command, input_data=input_data)
+        return out.decode(errors="replace"), err.decode(errors="replace")
+
+    def run_stream(self, command: str, input_data: str | bytes | None = None, stdout_sink: IO[bytes] | None = None, **_) -> StreamResult:
+        return buffered_stream(self.run_raw(command, input_data=input_data), stdout_sink)
+
+    def is_open(self) -> bool:
+        return True
+
+    def close(self):
+        pass
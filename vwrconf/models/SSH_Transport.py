@@ -0,0 +1,101 @@
+# vwrconf/models/SSH_Transport.py
+
+import asyncio
+import socket
+import threading
+from dataclasses import dataclass, field
+
+@dataclass
+class TransferMetrics:
+    """
+    Wire-level traffic of one host connection.
+
+    Bytes are counted on the socket under the SSH transport, so they include
+    protocol overhead and reflect compression: comparing two profiles on the
+    same workload shows what each one actually puts on the link.
+    """
+    profile: str
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    connect_seconds: float = 0.0
+    elapsed: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, sent: int = 0, received: int = 0):
+        with self.lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    @property
+    def throughput(self) -> float:
+        """Received bytes per second over the life of the connection."""
+        return self.bytes_received / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"profile={self.profile} sent={format_bytes(self.bytes_sent)} "
+            f"received={format_bytes(self.bytes_received)} connect={self.connect_seconds:.2f}s "
+            f"total={self.elapsed:.2f}s ({format_bytes(self.throughput)}/s)"
+        )
+
+class CountingSocket:
+    """Socket (or socket-like channel) wrapper feeding every byte moved into TransferMetrics."""
+
+    def __init__(self, sock, metrics: TransferMetrics):
+        self.sock = sock
+        self.metrics = metrics
+
+    def send(self, data) -> int:
+        sent = self.sock.send(data)
+        self.metrics.add(sent=sent)
+        return sent
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+        self.metrics.add(sent=len(data))
+
+    def recv(self, size: int) -> bytes:
+        data = self.sock.recv(size)
+        self.metrics.add(received=len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+def open_socket(host: str, port: int, timeout: float | None) -> socket.socket:
+    """TCP connection to the SSH port, trying every address the host resolves to."""
+    return socket.create_connection((host, port), timeout=timeout)
+
+async def open_socket_async(host: str, port: int, timeout: float | None) -> socket.socket:
+    """Same as `open_socket`, awaiting the connection on the running loop."""
+    loop = asyncio.get_running_loop()
+    errors = []
+    for family, type_, proto, _, address in await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        sock = socket.socket(family, type_, proto)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+        except asyncio.TimeoutError:
+            sock.close()
+            errors.append(socket.timeout("timed out"))
+            continue
+        except OSError as e:
+            sock.close()
+            errors.append(e)
+            continue
+        # paramiko drives the socket from its own thread with its own timeouts
+        sock.setblocking(True)
+        return sock
+    raise errors[-1] if errors else OSError(f"No address found for {host}")
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def print_transfer_stats(results: dict):
+    """Print one metrics line per host of a fan-out, for hosts that have metrics."""
+    for host_id, result in results.items():
+        if result.metrics is not None:
+            print(f"[STATS] {host_id}: {result.metrics.summary()}")
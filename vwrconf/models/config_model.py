@@ -1,14 +1,81 @@
 # vwrconf/models/config_model.py
 
-from typing import List, Optional, Literal
-from pydantic import BaseModel
+from typing import Dict, List, Optional, Literal
+from pydantic import BaseModel, model_validator
 import copy
 
+class TransportProfile(BaseModel):
+    compression: bool = False  # zlib compression of the SSH stream
+    window_size: Optional[int] = None  # channel window in bytes, paramiko default (2 MiB) if unset
+    max_packet_size: Optional[int] = None  # max channel packet in bytes, paramiko default (32 KiB) if unset
+    keepalive: Optional[int] = None  # seconds between keepalive packets, none if unset
+
+# Used when a profile name is not defined under `defaults.profiles`
+BUILTIN_PROFILES = {
+    "default": TransportProfile(),
+    "lan": TransportProfile(window_size=4 * 1024 * 1024),
+    "wan": TransportProfile(compression=True, window_size=16 * 1024 * 1024, keepalive=30),
+}
+
+class RetentionPolicy(BaseModel):
+    keep_last: Optional[int] = None  # most recent snapshots
+    keep_daily: Optional[int] = None  # newest snapshot of each of the last N days with backups
+    keep_weekly: Optional[int] = None  # same per ISO week
+    keep_monthly: Optional[int] = None  # same per month
+    keep_yearly: Optional[int] = None  # same per year
+    keep_if_changed: bool = False  # every snapshot that changed a file since the previous one
+
+class JumpHost(BaseModel):
+    host: str
+    port: Optional[int] = None
+    ssh_user: Optional[str] = None
+    method: Optional[Literal["ssh", "agent"]] = None
+    key_path: Optional[str] = None
+    profile: Optional[str] = None
+    via: Optional[str] = None  # another bastion to reach this one through
+
+    def as_client(self, name: str) -> "Client":
+        return Client(
+            id=name, host=self.host, label=name, port=self.port, ssh_user=self.ssh_user,
+            method=self.method, key_path=self.key_path, profile=self.profile, via=self.via
+        )
+
 class Defaults(BaseModel):
     ssh_user: Optional[str] = None
     port: Optional[int] = 22
     method: Optional[Literal["ssh", "agent"]] = "ssh"
+    key_path: Optional[str] = None  # private key file; ~/.ssh/id_ed25519, id_ecdsa, id_rsa if unset
     readonly: bool = False
+    max_workers: Optional[int] = None  # parallel SSH sessions for fleet-wide commands
+    connect_timeout: Optional[float] = 10  # seconds for the TCP connect
+    banner_timeout: Optional[float] = 10  # seconds to wait for the SSH banner
+    auth_timeout: Optional[float] = 10  # seconds for authentication
+    command_timeout: Optional[float] = None  # seconds per remote command, None for no limit
+    fleet_timeout: Optional[float] = None  # wall-clock budget of a fleet-wide run, None for no limit
+    profile: Optional[str] = None  # transport profile name, "default" if unset
+    profiles: Dict[str, TransportProfile] = {}  # custom profiles, may shadow the built-in ones
+    transfer_stats: bool = False  # print per-host transfer metrics after fleet-wide commands
+    bastions: Dict[str, JumpHost] = {}  # jump hosts clients can be reached through with `via`
+    backup_compression: Optional[Literal["gzip", "zstd"]] = None  # format of new backup objects, None for plain
+    backup_packs: bool = False  # write each /etc snapshot as one pack file instead of one object per new file
+    retention: Optional[RetentionPolicy] = None  # snapshots kept by `prune`, hosts without a policy are not pruned
+    retention_tags: Dict[str, RetentionPolicy] = {}  # policies for clients with these tags, over `retention`
+
+    def transport_profile(self, name: Optional[str]) -> TransportProfile:
+        name = name or self.profile or "default"
+        if name in self.profiles:
+            return self.profiles[name]
+        return BUILTIN_PROFILES[name]
+
+    def retention_policy(self, client: Optional["Client"]) -> Optional[RetentionPolicy]:
+        """Policy of a client: its own, else that of its first tag with one, else the default."""
+        if client is not None:
+            if client.retention is not None:
+                return client.retention
+            for tag in client.tags or []:
+                if tag in self.retention_tags:
+                    return self.retention_tags[tag]
+        return self.retention
 
 
 class Client(BaseModel):
@@ -18,7 +85,15 @@ class Client(BaseModel):
     readonly: bool = False
     tags: Optional[List[str]] = []
     port: Optional[int] = None
-    method: Optional[Literal["ssh", "agent"]] = "ssh"
+    method: Optional[Literal["ssh", "agent"]] = None
+    key_path: Optional[str] = None
+    connect_timeout: Optional[float] = None
+    banner_timeout: Optional[float] = None
+    auth_timeout: Optional[float] = None
+    command_timeout: Optional[float] = None
+    profile: Optional[str] = None
+    via: Optional[str] = None
+    retention: Optional[RetentionPolicy] = None
     notes: Optional[str] = None
     ssh_user: Optional[str] = None
 
@@ -27,6 +102,34 @@ class Config(BaseModel):
     defaults: Defaults = Defaults()
     clients: List[Client]
 
+    @model_validator(mode="after")
+    def check_profiles(self):
+        known = set(BUILTIN_PROFILES) | set(self.defaults.profiles)
+        for name in [self.defaults.profile] + [c.profile for c in self.clients]:
+            if name is not None and name not in known:
+                raise ValueError(f"Unknown transport profile '{name}' (known: {', '.join(sorted(known))})")
+        return self
+
+    @model_validator(mode="after")
+    def check_bastions(self):
+        bastions = self.defaults.bastions
+        for name, jump in bastions.items():
+            if jump.profile is not None and jump.profile not in BUILTIN_PROFILES and jump.profile not in self.defaults.profiles:
+                raise ValueError(f"Unknown transport profile '{jump.profile}' for bastion '{name}'")
+            seen = {name}
+            while jump.via is not None:
+                if jump.via not in bastions:
+                    break
+                if jump.via in seen:
+                    raise ValueError(f"Bastion '{name}' is reached through itself via '{jump.via}'")
+                seen.add(jump.via)
+                jump = bastions[jump.via]
+
+        for via in [c.via for c in self.clients] + [j.via for j in bastions.values()]:
+            if via is not None and via not in bastions:
+                raise ValueError(f"Unknown bastion '{via}' (known: {', '.join(sorted(bastions)) or 'none'})")
+        return self
+
     def copy_with_clients(self, clients):
         new_config = copy.copy(self)
         new_config.clients = clients